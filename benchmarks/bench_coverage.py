@@ -0,0 +1,42 @@
+"""Compare emulation throughput without coverage, with a Python set and with Coverage.
+
+Usage: python benchmarks/bench_coverage.py [--cycles 500000]
+"""
+import argparse
+
+from common import make_mpu, report, timed
+from mpu.coverage import Coverage
+
+
+def set_coverage(mpu, cycles):
+    """Collect executed addresses in a set from outside of step()."""
+    executed = set()
+    registers = mpu.registers
+    step = mpu.step
+    target = mpu.elapsed_cycles + cycles
+    while mpu.elapsed_cycles < target:
+        executed.add(registers.PC)
+        step()
+    return executed
+
+
+def main():
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=500_000)
+    args = parser.parse_args()
+
+    mpu = make_mpu()
+    report("no coverage", args.cycles, timed(lambda: mpu.run(args.cycles)), "cycles")
+
+    mpu = make_mpu()
+    report("set of PCs", args.cycles, timed(lambda: set_coverage(mpu, args.cycles)), "cycles")
+
+    mpu = make_mpu()
+    with Coverage(mpu) as coverage:
+        report("coverage maps", args.cycles, timed(lambda: mpu.run(args.cycles)), "cycles")
+    report("coverage report", 1, timed(coverage.report), "reports")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Compare cost per fuzzing case: full boot vs. fork server.
+
+Usage: python benchmarks/bench_forkserver.py [--cases 200] [--boot-cycles 20000]
+"""
+import argparse
+
+from common import PROGRAM_START, make_mpu, report, timed
+from mpu.forkserver import ForkServer
+
+CASE_CYCLES = 200
+
+
+def main():
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", type=int, default=200)
+    parser.add_argument("--boot-cycles", type=int, default=20_000)
+    args = parser.parse_args()
+
+    def full_boot():
+        for case in range(args.cases):
+            mpu = make_mpu()
+            mpu.run(args.boot_cycles)
+            mpu._memory[0x0400] = case & 0xFF
+            mpu.run(CASE_CYCLES)
+
+    report("full boot per case", args.cases, timed(full_boot), "cases")
+
+    mpu = make_mpu()
+    mpu.run(args.boot_cycles)
+    server = ForkServer(mpu, input_address=0x0400)
+    server.warm_up(PROGRAM_START, 100)
+
+    def forked():
+        for case in range(args.cases):
+            server.run(bytes((case & 0xFF,)), CASE_CYCLES)
+
+    report("fork server", args.cases, timed(forked), "cases")
+
+
+if __name__ == "__main__":
+    main()
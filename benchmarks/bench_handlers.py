@@ -0,0 +1,28 @@
+"""Print host nanoseconds per opcode handler and address mode for the benchmark program.
+
+Usage: python benchmarks/bench_handlers.py [--cycles 500000]
+"""
+import argparse
+
+from common import make_mpu, report, timed
+from mpu.profiler import HandlerTimer
+
+
+def main():
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=500_000)
+    args = parser.parse_args()
+
+    mpu = make_mpu()
+    with HandlerTimer(mpu) as timer:
+        report("timed handlers", args.cycles, timed(lambda: mpu.run(args.cycles)), "cycles")
+    print(
+        f"timer overhead {timer.overhead_ns} ns per call, address mode timing"
+        f" {timer.wrapper_overhead_ns} ns per nested call (both subtracted)\n"
+    )
+    print(timer.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Host many MPUs in one process, some of them idle, and report aggregate statistics.
+
+Usage: python benchmarks/bench_host.py [--machines 200] [--idle 100] [--rounds 20]
+"""
+import argparse
+
+from common import make_mpu, report, timed
+from mpu.host import Host
+
+IDLE_LOOP = 0x0600
+
+
+def main():
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--machines", type=int, default=200)
+    parser.add_argument("--idle", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--quantum", type=int, default=1_000)
+    args = parser.parse_args()
+
+    host = Host(quantum_cycles=args.quantum)
+    for index in range(args.machines):
+        mpu = make_mpu()
+        if index < args.idle:
+            # 0600: JMP $0600
+            mpu._memory[IDLE_LOOP : IDLE_LOOP + 3] = (0x4C, IDLE_LOOP & 0xFF, IDLE_LOOP >> 8)
+            mpu.registers.PC = IDLE_LOOP
+        host.add(mpu)
+
+    seconds = timed(lambda: host.run(args.rounds))
+    stats = host.stats()
+    report(f"{args.machines} machines, {args.idle} idle", stats.cycles, seconds, "cycles")
+    print(
+        f"running={stats.running} idle={stats.idle} halted={stats.halted}"
+        f" max_lag={stats.max_lag} mean_lag={stats.mean_lag:.1f} cycles"
+    )
+
+
+if __name__ == "__main__":
+    main()
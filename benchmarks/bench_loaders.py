@@ -0,0 +1,61 @@
+"""Report load throughput of the raw binary, Intel HEX and S-record loaders.
+
+Usage: python benchmarks/bench_loaders.py [--size 32768] [--loads 20]
+"""
+import argparse
+import os
+import tempfile
+
+from common import report
+from mpu.bus import MemoryBus
+from mpu.loaders import load_binary, load_intel_hex, load_srecord
+
+
+def write_files(directory: str, data: bytes, address: int):
+    """Write data as binary, Intel HEX and S-record with 32 byte records."""
+    binary = os.path.join(directory, "rom.bin")
+    with open(binary, "wb") as file:
+        file.write(data)
+
+    hex_lines, srec_lines = [], []
+    for offset in range(0, len(data), 32):
+        chunk = data[offset : offset + 32]
+        at = address + offset
+        record = bytes((len(chunk), at >> 8, at & 0xFF, 0)) + chunk
+        hex_lines.append(":" + (record + bytes(((-sum(record)) & 0xFF,))).hex().upper())
+        record = bytes((len(chunk) + 3, at >> 8, at & 0xFF)) + chunk
+        srec_lines.append("S1" + (record + bytes((~sum(record) & 0xFF,))).hex().upper())
+    hex_lines.append(":00000001FF")
+    intel_hex = os.path.join(directory, "rom.hex")
+    with open(intel_hex, "w") as file:
+        file.write("\n".join(hex_lines) + "\n")
+    srecord = os.path.join(directory, "rom.s19")
+    with open(srecord, "w") as file:
+        file.write("\n".join(srec_lines) + "\n")
+    return binary, intel_hex, srecord
+
+
+def main():
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=0x8000)
+    parser.add_argument("--loads", type=int, default=20)
+    args = parser.parse_args()
+
+    address = 0x10000 - args.size
+    with tempfile.TemporaryDirectory() as directory:
+        binary, intel_hex, srecord = write_files(directory, os.urandom(args.size), address)
+        for memory_label, memory in (("list", [0] * 0x10000), ("bus", MemoryBus())):
+            for label, load in (
+                ("binary", lambda: load_binary(memory, binary, address)),
+                ("Intel HEX", lambda: load_intel_hex(memory, intel_hex)),
+                ("S-record", lambda: load_srecord(memory, srecord)),
+            ):
+                results = [load() for _ in range(args.loads)]
+                loaded = sum(result.bytes_loaded for result in results)
+                seconds = sum(result.seconds for result in results)
+                report(f"{label} into {memory_label}", loaded, seconds, "bytes")
+
+
+if __name__ == "__main__":
+    main()
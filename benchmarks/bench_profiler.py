@@ -0,0 +1,57 @@
+"""Compare emulation throughput without profiling, wrapping step() and with the profilers.
+
+Usage: python benchmarks/bench_profiler.py [--cycles 500000] [--interval 1000]
+"""
+import argparse
+from array import array
+
+from common import make_mpu, report, timed
+from mpu.profiler import CallGraphProfiler, Profiler, SamplingProfiler
+
+
+def wrap_step(mpu):
+    """Count cycles per PC by wrapping step() from outside."""
+    counts = array("Q", [0]) * 0x10000
+    cycles = array("Q", [0]) * 0x10000
+    step = mpu.step
+
+    def profiled_step():
+        pc = mpu.registers.PC
+        start = mpu.elapsed_cycles
+        step()
+        counts[pc] += 1
+        cycles[pc] += mpu.elapsed_cycles - start
+
+    mpu.step = profiled_step
+
+
+def main():
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=500_000)
+    parser.add_argument("--interval", type=int, default=1000)
+    args = parser.parse_args()
+
+    mpu = make_mpu()
+    report("no profiling", args.cycles, timed(lambda: mpu.run(args.cycles)), "cycles")
+
+    mpu = make_mpu()
+    wrap_step(mpu)
+    report("wrapped step()", args.cycles, timed(lambda: mpu.run(args.cycles)), "cycles")
+
+    mpu = make_mpu()
+    with Profiler(mpu):
+        report("flat profiler", args.cycles, timed(lambda: mpu.run(args.cycles)), "cycles")
+
+    mpu = make_mpu()
+    with CallGraphProfiler(mpu):
+        report("call graph profiler", args.cycles, timed(lambda: mpu.run(args.cycles)), "cycles")
+
+    mpu = make_mpu()
+    with SamplingProfiler(mpu, interval_cycles=args.interval):
+        seconds = timed(lambda: mpu.run(args.cycles))
+    report(f"sampling every {args.interval} cycles", args.cycles, seconds, "cycles")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Compare machine resets per second: new MPU vs. reset to a memory template.
+
+Usage: python benchmarks/bench_reset.py [--resets 2000]
+"""
+import argparse
+
+from common import PROGRAM_START, make_memory, report, timed
+from mpu.mpu6502 import MPU
+
+
+def main():
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resets", type=int, default=2000)
+    args = parser.parse_args()
+
+    template = bytes(make_memory())
+
+    def recreate():
+        for _ in range(args.resets):
+            MPU(memory=list(template), pc=PROGRAM_START)
+
+    report("new memory + new MPU", args.resets, timed(recreate), "resets")
+
+    mpu = MPU(memory=list(template), pc=PROGRAM_START)
+
+    def reset():
+        for _ in range(args.resets):
+            mpu.reset(memory_template=template)
+
+    report("reset(memory_template=...), list", args.resets, timed(reset), "resets")
+
+    mpu = MPU(memory=bytearray(template), pc=PROGRAM_START)
+    report("reset(memory_template=...), bytearray", args.resets, timed(reset), "resets")
+
+
+if __name__ == "__main__":
+    main()
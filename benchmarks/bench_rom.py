@@ -0,0 +1,45 @@
+"""Compare ROM load time: read into memory vs. mmap onto the bus.
+
+Usage: python benchmarks/bench_rom.py [--size 32768] [--loads 200]
+"""
+import argparse
+import os
+import tempfile
+
+from common import report, timed
+from mpu.bus import MemoryBus
+
+
+def main():
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=0x8000)
+    parser.add_argument("--loads", type=int, default=200)
+    args = parser.parse_args()
+
+    address = 0x10000 - args.size
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "rom.bin")
+        with open(path, "wb") as file:
+            file.write(os.urandom(args.size))
+
+        memory = [0x00] * 0x10000
+
+        def read_into_list():
+            for _ in range(args.loads):
+                with open(path, "rb") as file:
+                    memory[address:] = file.read()
+
+        report("read into list", args.loads, timed(read_into_list), "loads")
+
+        bus = MemoryBus()
+
+        def map_file():
+            for _ in range(args.loads):
+                bus.map_file(address, path).close()
+
+        report("mmap onto bus", args.loads, timed(map_file), "loads")
+
+
+if __name__ == "__main__":
+    main()
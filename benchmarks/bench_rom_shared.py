@@ -0,0 +1,61 @@
+"""Compare memory and speed of N MPUs running the same ROM, private copies vs. map_rom().
+
+Usage: python benchmarks/bench_rom_shared.py [--mpus 100] [--size 16384] [--steps 2000]
+"""
+import argparse
+import tracemalloc
+from functools import partial
+
+from common import report, timed
+from mpu.bus import MemoryBus
+from mpu.mpu6502 import MPU
+
+
+def build(count, rom, address, shared):
+    """Return count MPUs with rom written to RAM or mapped as shared ROM."""
+    mpus = []
+    for _ in range(count):
+        bus = MemoryBus()
+        if shared:
+            bus.map_rom(address, rom)
+        else:
+            bus[address:] = rom
+        mpus.append(MPU(memory=bus, pc=address))
+    return mpus
+
+
+def run(mpus, steps):
+    """Step every MPU steps times."""
+    for mpu in mpus:
+        for _ in range(steps):
+            mpu.step()
+
+
+def main():
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mpus", type=int, default=100)
+    parser.add_argument("--size", type=int, default=0x4000)
+    parser.add_argument("--steps", type=int, default=2000)
+    args = parser.parse_args()
+
+    address = 0x10000 - args.size
+    # NOPs with a jump back to the start just before the vectors
+    rom = bytearray([0xEA]) * args.size
+    rom[-0x10:-0x0D] = (0x4C, address & 0xFF, address >> 8)
+    rom = bytes(rom)
+
+    for shared in (False, True):
+        label = "map_rom" if shared else "private copy"
+        tracemalloc.start()
+        mpus = build(args.mpus, rom, address, shared)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"{label:<40} {size / args.mpus / 1024:12.1f} KB per MPU")
+        seconds = timed(partial(run, mpus, args.steps))
+        report(label, args.mpus * args.steps, seconds, "instructions")
+        del mpus
+
+
+if __name__ == "__main__":
+    main()
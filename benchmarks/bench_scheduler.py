@@ -0,0 +1,44 @@
+"""Compare a periodic timer device: polled after every step vs. scheduled events.
+
+Usage: python benchmarks/bench_scheduler.py [--cycles 500000] [--period 1000]
+"""
+import argparse
+
+from common import make_mpu, report, timed
+
+
+def main():
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=500_000)
+    parser.add_argument("--period", type=int, default=1000)
+    args = parser.parse_args()
+
+    mpu = make_mpu()
+    report("no device", args.cycles, timed(lambda: mpu.run(args.cycles)), "cycles")
+
+    mpu = make_mpu()
+    expiries = [0]
+
+    def polled():
+        next_expiry = args.period
+        while mpu.elapsed_cycles < args.cycles:
+            mpu.step()
+            if mpu.elapsed_cycles >= next_expiry:
+                expiries[0] += 1
+                next_expiry += args.period
+
+    report("polled after every step", args.cycles, timed(polled), "cycles")
+
+    mpu = make_mpu()
+
+    def expire(cycle):
+        expiries[0] += 1
+        mpu.scheduler.post(cycle + args.period, expire)
+
+    mpu.scheduler.post(args.period, expire)
+    report("scheduled events", args.cycles, timed(lambda: mpu.run(args.cycles)), "cycles")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Run N MPUs on N threads and report aggregate instructions per second.
+
+On a regular CPython build the GIL serializes the threads, so aggregate throughput stays
+flat. On a free-threaded build (e.g. python3.13t) it should scale with the thread count.
+
+Usage: python benchmarks/bench_threads.py [--threads 1 2 4 8] [--instructions 200000]
+"""
+import argparse
+import sys
+import threading
+
+from common import make_mpu, report, timed
+
+
+def run_threads(threads: int, instructions: int) -> float:
+    """Construct and run one MPU per thread, return elapsed seconds."""
+    barrier = threading.Barrier(threads + 1)
+
+    def worker():
+        # Construction happens inside the thread on purpose: it must be race free.
+        mpu = make_mpu()
+        step = mpu.step
+        barrier.wait()
+        for _ in range(instructions):
+            step()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+
+    def wait():
+        barrier.wait()
+        for thread in workers:
+            thread.join()
+
+    return timed(wait)
+
+
+def main():
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--instructions", type=int, default=200_000)
+    args = parser.parse_args()
+
+    gil_enabled = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"Python {sys.version.split()[0]}, GIL {'enabled' if gil_enabled else 'disabled'}")
+    baseline = None
+    for threads in args.threads:
+        seconds = run_threads(threads, args.instructions)
+        _, rate = report(f"{threads} thread(s)", threads * args.instructions, seconds)
+        baseline = baseline or rate
+        print(f"{'':<40} scaling vs. first run: {rate / baseline:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Compare emulation throughput while tracing, in memory and to a trace file.
+
+Usage: python benchmarks/bench_trace.py [--cycles 500000] [--capacity 65536]
+"""
+import argparse
+import os
+import tempfile
+from collections import deque
+
+from common import make_mpu, report, timed
+from mpu.trace import TraceBuffer
+from mpu.tracefile import (
+    BackgroundTraceWriter,
+    COMPRESSION_NONE,
+    COMPRESSION_ZLIB,
+    TraceFileWriter,
+    TraceRecorder,
+)
+
+
+def keep_instructions(mpu, capacity, formatted):
+    """Keep DecodedInstruction objects (or formatted lines) by wrapping step()."""
+    history = deque(maxlen=capacity)
+    decode = mpu.decode
+    step = mpu.step
+
+    def traced_step():
+        instruction = decode(mpu.registers.PC)
+        history.append(f"{instruction} {mpu.registers!r}" if formatted else instruction)
+        step()
+
+    mpu.step = traced_step
+
+
+def main():
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=500_000)
+    parser.add_argument("--capacity", type=int, default=65536)
+    args = parser.parse_args()
+
+    mpu = make_mpu()
+    report("no tracing", args.cycles, timed(lambda: mpu.run(args.cycles)), "cycles")
+
+    for label, formatted in (("DecodedInstruction deque", False), ("formatted lines", True)):
+        mpu = make_mpu()
+        keep_instructions(mpu, args.capacity, formatted)
+        report(label, args.cycles, timed(lambda: mpu.run(args.cycles)), "cycles")
+
+    mpu = make_mpu()
+    with TraceBuffer(mpu, args.capacity):
+        report("binary ring buffer", args.cycles, timed(lambda: mpu.run(args.cycles)), "cycles")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "trace.bin")
+        for label, compression, background in (
+            ("trace file", COMPRESSION_NONE, False),
+            ("trace file, zlib", COMPRESSION_ZLIB, False),
+            ("trace file, background", COMPRESSION_NONE, True),
+            ("trace file, background zlib", COMPRESSION_ZLIB, True),
+        ):
+            mpu = make_mpu()
+            writer = TraceFileWriter(path, args.capacity, compression)
+            if background:
+                writer = BackgroundTraceWriter(writer)
+            recorder = TraceRecorder(mpu, writer, args.capacity).attach()
+
+            def run():
+                mpu.run(args.cycles)
+                recorder.close()
+
+            report(label, args.cycles, timed(run), "cycles")
+            print(f"{'':<40} {os.path.getsize(path):>12,} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Measure streaming trace diff throughput and peak memory on two long binary traces.
+
+Usage: python benchmarks/bench_tracediff.py [--records 1000000] [--chunk 65536]
+"""
+import argparse
+import os
+import tempfile
+import tracemalloc
+
+from common import make_mpu, report, timed
+from mpu.tracediff import diff_traces
+from mpu.tracefile import TraceFileWriter, TraceRecorder
+
+
+def record(path, records, chunk):
+    """Record records steps of the benchmark program."""
+    mpu = make_mpu()
+    with TraceFileWriter(path, chunk) as writer:
+        with TraceRecorder(mpu, writer, chunk):
+            for _ in range(records):
+                mpu.step()
+
+
+def main():
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--chunk", type=int, default=65536)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        left = os.path.join(directory, "left.bin")
+        right = os.path.join(directory, "right.bin")
+        record(left, args.records, args.chunk)
+        record(right, args.records, args.chunk)
+
+        tracemalloc.start()
+        seconds = timed(lambda: diff_traces(left, right, args.chunk))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        report("diff of equal traces", args.records, seconds, "records")
+        print(f"{'':<40} {peak / 1024:12,.0f} KB peak memory")
+
+
+if __name__ == "__main__":
+    main()
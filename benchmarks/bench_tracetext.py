@@ -0,0 +1,38 @@
+"""Compare text trace formatting: DecodedInstruction.print() plus registers vs. TraceFormatter.
+
+Usage: python benchmarks/bench_tracetext.py [--lines 100000]
+"""
+import argparse
+
+from common import make_mpu, report, timed
+from mpu.trace import TraceBuffer
+from mpu.tracetext import TraceFormatter
+
+
+def main():
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=100_000)
+    args = parser.parse_args()
+
+    mpu = make_mpu()
+    with TraceBuffer(mpu, capacity=args.lines) as trace:
+        for _ in range(args.lines):
+            mpu.step()
+    records = trace.records()
+
+    def print_objects():
+        lines = []
+        for record in records:
+            instruction = record.instruction(mpu._instructions)
+            lines.append(f"{instruction.print(True)} {mpu.registers!r}")
+        return lines
+
+    report("DecodedInstruction.print()", args.lines, timed(print_objects), "lines")
+
+    formatter = TraceFormatter()
+    report("TraceFormatter", args.lines, timed(lambda: formatter.lines(trace.buffer)), "lines")
+
+
+if __name__ == "__main__":
+    main()
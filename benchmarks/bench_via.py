@@ -0,0 +1,50 @@
+"""Compare emulation throughput with and without a free running VIA timer.
+
+Usage: python benchmarks/bench_via.py [--cycles 500000] [--period 10000]
+"""
+import argparse
+
+from common import PROGRAM_START, make_memory, report, timed
+from mpu.bus import MemoryBus
+from mpu.mpu6502 import MPU
+from mpu.via import VIA, IRQ_ANY, IRQ_T1
+
+VIA_BASE = 0x6000
+HANDLER = 0x0500
+
+
+def make_mpu(period: int = 0, irq: bool = False) -> MPU:
+    """Create bus backed MPU, optionally with a free running T1."""
+    memory = make_memory()
+    # IRQ handler acknowledging T1: BIT $6004, RTI
+    memory[HANDLER : HANDLER + 4] = (0x2C, 0x04, 0x60, 0x40)
+    memory[MPU.MEM_VECTOR_IRQ_BRK : MPU.MEM_VECTOR_IRQ_BRK + 2] = (HANDLER & 0xFF, HANDLER >> 8)
+    mpu = MPU(memory=MemoryBus(memory), pc=PROGRAM_START)
+    if period:
+        via = VIA(mpu)
+        mpu._memory.map_device(VIA_BASE, via)
+        via[0xB] = 0x40  # T1 free-run
+        if irq:
+            via[0xE] = IRQ_ANY | IRQ_T1
+        via[0x4] = (period - 2) & 0xFF
+        via[0x5] = (period - 2) >> 8
+    return mpu
+
+
+def main():
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=500_000)
+    parser.add_argument("--period", type=int, default=10_000)
+    args = parser.parse_args()
+
+    for label, mpu in (
+        ("no VIA", make_mpu()),
+        ("T1 free-run, IRQ masked", make_mpu(args.period)),
+        ("T1 free-run, IRQ every period", make_mpu(args.period, irq=True)),
+    ):
+        report(label, args.cycles, timed(lambda: mpu.run(args.cycles)), "cycles")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Shared helpers for the benchmark scripts."""
+import os
+import sys
+import time
+from typing import Callable, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from mpu.mpu6502 import MPU  # noqa: E402
+
+# Small busy loop mixing loads, stores, arithmetic and branches.
+#
+#   0200: LDX #$00
+#   0202: INX
+#   0203: STX $0300
+#   0206: CLC
+#   0207: ADC #$01
+#   0209: BNE $0202
+#   020B: JMP $0200
+PROGRAM_START = 0x0200
+PROGRAM = (
+    0xA2, 0x00,
+    0xE8,
+    0x8E, 0x00, 0x03,
+    0x18,
+    0x69, 0x01,
+    0xD0, 0xF7,
+    0x4C, 0x00, 0x02,
+)  # fmt: skip
+
+
+def make_memory() -> List[int]:
+    """Create 64 KB memory with the benchmark program loaded."""
+    memory = [0x00] * (0xFFFF + 1)
+    memory[PROGRAM_START : PROGRAM_START + len(PROGRAM)] = PROGRAM
+    return memory
+
+
+def make_mpu() -> MPU:
+    """Create an MPU ready to execute the benchmark program."""
+    return MPU(memory=make_memory(), pc=PROGRAM_START)
+
+
+def timed(func: Callable[[], None]) -> float:
+    """Return wall clock seconds needed to execute func."""
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def report(label: str, count: int, seconds: float, unit: str = "instructions") -> Tuple[str, float]:
+    """Print a single benchmark result line and return the rate."""
+    rate = count / seconds if seconds > 0 else float("inf")
+    print(f"{label:<40} {count:>12,} {unit} in {seconds:8.3f}s = {rate:14,.0f} {unit}/s")
+    return label, rate
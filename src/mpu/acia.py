@@ -0,0 +1,143 @@
+"""6551 ACIA (Asynchronous Communications Interface Adapter)."""
+import asyncio
+from collections import deque
+from typing import Callable, Deque, Optional
+
+# Register offsets (mirrored every 4 bytes of the mapped page)
+REG_DATA = 0x0
+REG_STATUS = 0x1
+REG_COMMAND = 0x2
+REG_CONTROL = 0x3
+
+# Status bits
+STATUS_IRQ = 0b1000_0000
+STATUS_TDRE = 0b0001_0000
+STATUS_RDRF = 0b0000_1000
+
+# Command bits
+COMMAND_DTR = 0b0000_0001
+COMMAND_RX_IRQ_DISABLED = 0b0000_0010
+
+
+class ACIA:
+    """
+    6551 ACIA with an unbounded receive queue.
+
+    Received bytes are queued by feed() (or by receive_from() from an asyncio stream) and
+    handed to the MPU one by one through the data register. Transmission is instant:
+    written bytes go to on_transmit or are collected for transmitted() and send_to().
+    Baud rates are not emulated.
+    """
+
+    def __init__(self, mpu, on_transmit: Optional[Callable[[int], None]] = None) -> None:
+        """Initialize ACIA raising interrupts on mpu."""
+        self._mpu = mpu
+        self._rx: Deque[int] = deque()
+        self._tx = bytearray()
+        self._tx_ready: Optional[asyncio.Event] = None
+        self._command = 0
+        self._control = 0
+        self.on_transmit = on_transmit
+
+    def clone(self, mpu) -> "ACIA":
+        """
+        Return copy of the ACIA raising interrupts on mpu (a clone of its MPU).
+
+        Queued received bytes are copied. on_transmit is not carried over, the copy collects
+        its transmitted bytes for transmitted().
+        """
+        other = ACIA(mpu)
+        other._rx.extend(self._rx)
+        other._command = self._command
+        other._control = self._control
+        other._update_irq()
+        return other
+
+    def reset(self) -> None:
+        """Clear command and control registers and the receive queue (hardware reset)."""
+        self._rx.clear()
+        self._command = 0
+        self._control = 0
+        self._update_irq()
+
+    def feed(self, data: bytes) -> None:
+        """Queue received bytes."""
+        self._rx.extend(data)
+        self._update_irq()
+
+    def transmitted(self) -> bytes:
+        """Return and clear bytes transmitted so far (if on_transmit is not set)."""
+        data = bytes(self._tx)
+        self._tx.clear()
+        return data
+
+    async def receive_from(self, reader: asyncio.StreamReader) -> None:
+        """Feed data from reader into the receive queue until EOF."""
+        while True:
+            data = await reader.read(256)
+            if not data:
+                break
+            self.feed(data)
+
+    async def send_to(self, writer) -> None:
+        """Send transmitted bytes to writer until cancelled."""
+        self._tx_ready = asyncio.Event()
+        try:
+            while True:
+                await self._tx_ready.wait()
+                self._tx_ready.clear()
+                writer.write(self.transmitted())
+                await writer.drain()
+        finally:
+            self._tx_ready = None
+            if self._tx:
+                writer.write(self.transmitted())
+
+    def _irq_active(self) -> bool:
+        """Return True if receiver interrupt is enabled and data is waiting."""
+        return (
+            bool(self._rx)
+            and self._command & COMMAND_DTR != 0
+            and self._command & COMMAND_RX_IRQ_DISABLED == 0
+        )
+
+    def _update_irq(self) -> None:
+        """Drive MPU IRQ line."""
+        self._mpu.set_irq(self._irq_active(), self)
+
+    def __getitem__(self, offset: int) -> int:
+        """Read register."""
+        register = offset & 0x03
+        if register == REG_DATA:
+            value = self._rx.popleft() if self._rx else 0
+            self._update_irq()
+            return value
+        elif register == REG_STATUS:
+            status = STATUS_TDRE
+            if self._rx:
+                status |= STATUS_RDRF
+            if self._irq_active():
+                status |= STATUS_IRQ
+            return status
+        elif register == REG_COMMAND:
+            return self._command
+        return self._control
+
+    def __setitem__(self, offset: int, value: int) -> None:
+        """Write register."""
+        register = offset & 0x03
+        if register == REG_DATA:
+            if self.on_transmit is not None:
+                self.on_transmit(value)
+            else:
+                self._tx.append(value)
+                if self._tx_ready is not None:
+                    self._tx_ready.set()
+        elif register == REG_STATUS:
+            # Programmed reset
+            self._command &= 0b1110_0000
+        elif register == REG_COMMAND:
+            self._command = value
+        else:
+            self._control = value
+        self._update_irq()
@@ -0,0 +1,265 @@
+"""Page based memory bus."""
+import hashlib
+import mmap
+import os
+import weakref
+from typing import List, Optional, Sequence
+
+PAGE_SIZE = 0x100
+PAGE_COUNT = 0x100
+MEMORY_SIZE = PAGE_SIZE * PAGE_COUNT
+
+# Page modes
+PAGE_RAM = 0  # Private writable page
+PAGE_COW = 1  # Page shared with a clone, copied on first write
+PAGE_DEVICE = 2  # Memory mapped device, accessed by page offset
+PAGE_ROM = 3  # Immutable page, writes are ignored
+PAGE_EXTERNAL = 4  # Writable page backed by a file or shared memory, written in place
+
+# Turns all private RAM pages into shared ones, leaves other pages alone
+_SHARE_PAGES = bytes(PAGE_COW if mode == PAGE_RAM else mode for mode in range(256))
+
+
+class SharedRomPage:
+    """
+    Immutable ROM page shared by all buses mapping the same content.
+
+    Besides the (read-only) bytes it holds the decode cache for the page, so decoded
+    instructions are shared between all MPUs running the same ROM.
+    """
+
+    __slots__ = ("data", "decoded", "__weakref__")
+
+    def __init__(self, data: bytes) -> None:
+        """Initialize page."""
+        self.data = memoryview(data).toreadonly()
+        self.decoded: List = [None] * PAGE_SIZE
+
+
+# Content hash => page, entries vanish once no bus maps the page anymore
+_ROM_PAGES: "weakref.WeakValueDictionary[bytes, SharedRomPage]" = weakref.WeakValueDictionary()
+
+
+def shared_rom_page(data: bytes) -> SharedRomPage:
+    """Return the shared page for data, creating it on first use."""
+    key = hashlib.blake2b(data, digest_size=16).digest()
+    page = _ROM_PAGES.get(key)
+    if page is None or page.data != data:
+        page = SharedRomPage(bytes(data))
+        _ROM_PAGES[key] = page
+    return page
+
+
+class FileRegion:
+    """File mapped onto the bus by MemoryBus.map_file()."""
+
+    def __init__(self, bus: "MemoryBus", first_page: int, mapped: mmap.mmap) -> None:
+        """Initialize region."""
+        self._bus = bus
+        self._first_page = first_page
+        self._mapped = mapped
+        self._view = memoryview(mapped)
+
+    @property
+    def pages(self) -> range:
+        """Property getter for page numbers covered by the region."""
+        return range(self._first_page, self._first_page + len(self._mapped) // PAGE_SIZE)
+
+    def view(self, page: int) -> memoryview:
+        """Return view on a single page of the file."""
+        offset = (page - self._first_page) * PAGE_SIZE
+        return self._view[offset : offset + PAGE_SIZE]
+
+    def flush(self) -> None:
+        """Write dirty pages back now instead of leaving it to the OS."""
+        self._mapped.flush()
+
+    def close(self) -> None:
+        """Unmap file. The covered pages become zeroed RAM. Drop clones of the bus first."""
+        for page in self.pages:
+            if self._bus._modes[page] in (PAGE_ROM, PAGE_EXTERNAL):
+                self._bus._pages[page].release()
+                self._bus._set_page(page, bytearray(PAGE_SIZE), PAGE_RAM)
+        self._view.release()
+        self._mapped.close()
+
+
+class MemoryBus:
+    """
+    64 KB address space split into 256 pages of 256 bytes.
+
+    Behaves like the plain memory list (index and slice access), so it can be passed to
+    the MPU as memory. Pages may be shared between buses: clone() copies the page table
+    only and both sides copy a shared page on their first write to it.
+
+    Devices are mapped onto whole pages. A device implements __getitem__ and __setitem__
+    taking the offset within the page (0x00...0xFF). Slice assignments skip device pages.
+
+    Files are mapped onto pages with mmap, read-only as ROM or writable as NVRAM whose
+    dirty pages are written back lazily by the OS.
+
+    ROM images mapped with map_rom() are deduplicated by content: all buses mapping the same
+    ROM share one copy of each page and its decode cache.
+    """
+
+    def __init__(self, data: Optional[Sequence[int]] = None) -> None:
+        """Initialize bus, optionally with 64 KB of initial content."""
+        self._pages: List = [bytearray(PAGE_SIZE) for _ in range(PAGE_COUNT)]
+        self._modes = bytearray(PAGE_COUNT)
+        self._init_rom_pages()
+        if data is not None:
+            if len(data) != MEMORY_SIZE:
+                raise ValueError(f"Invalid memory size {len(data)}")
+            self[0 : len(data)] = data
+
+    def clone(self) -> "MemoryBus":
+        """
+        Return a bus sharing all pages with this one until either side writes.
+
+        Devices belong to the MPU they raise interrupts on, so a bus with mapped devices is
+        only cloned along with its MPU by MPU.clone().
+        """
+        if PAGE_DEVICE in self._modes:
+            raise TypeError("Bus with mapped devices can only be cloned by MPU.clone()!")
+        return self._clone()
+
+    def _clone(self) -> "MemoryBus":
+        """Return clone of the bus, device pages still map the devices of this bus."""
+        other = MemoryBus.__new__(MemoryBus)
+        self._modes = self._modes.translate(_SHARE_PAGES)
+        other._pages = list(self._pages)
+        other._modes = bytearray(self._modes)
+        other._roms = list(self._roms)
+        other._decoded = list(self._decoded)
+        if PAGE_EXTERNAL in self._modes:
+            # Writes to external pages are visible to everyone mapping them,
+            # so the clone gets a private copy.
+            for page, mode in enumerate(self._modes):
+                if mode == PAGE_EXTERNAL:
+                    other._pages[page] = bytearray(self._pages[page])
+                    other._modes[page] = PAGE_RAM
+        return other
+
+    def _clone_devices(self, mpu) -> None:
+        """Replace every mapped device by its copy for mpu, returned by device.clone(mpu)."""
+        clones = {}
+        for page, mode in enumerate(self._modes):
+            if mode == PAGE_DEVICE:
+                device = self._pages[page]
+                if id(device) not in clones:
+                    if not hasattr(device, "clone"):
+                        raise TypeError(f"Device {type(device).__name__} can not be cloned!")
+                    clones[id(device)] = device.clone(mpu)
+                self._pages[page] = clones[id(device)]
+
+    def _reset_devices(self) -> None:
+        """Call reset() of every mapped device having one (power on)."""
+        devices = {
+            id(self._pages[page]): self._pages[page]
+            for page, mode in enumerate(self._modes)
+            if mode == PAGE_DEVICE
+        }
+        for device in devices.values():
+            if hasattr(device, "reset"):
+                device.reset()
+
+    def _init_rom_pages(self) -> None:
+        """Initialize shared ROM page references and decode caches (none mapped)."""
+        self._roms: List[Optional[SharedRomPage]] = [None] * PAGE_COUNT
+        # Per page decode cache or None, used by MPU.decode()
+        self._decoded: List[Optional[List]] = [None] * PAGE_COUNT
+
+    def _set_page(self, page: int, data, mode: int, rom: Optional[SharedRomPage] = None) -> None:
+        """Replace a page."""
+        self._pages[page] = data
+        self._modes[page] = mode
+        self._roms[page] = rom
+        self._decoded[page] = rom.decoded if rom is not None else None
+
+    def map_device(self, address: int, device, pages: int = 1) -> None:
+        """Map device onto pages starting at address (must be page aligned)."""
+        if address & 0xFF:
+            raise ValueError(f"Device address ${address:04X} not page aligned!")
+        for page in range(address >> 8, (address >> 8) + pages):
+            self._set_page(page, device, PAGE_DEVICE)
+
+    def map_rom(self, address: int, data: bytes) -> None:
+        """Map ROM image onto pages starting at address (page aligned, whole pages)."""
+        if address & 0xFF or len(data) % PAGE_SIZE or address + len(data) > len(self):
+            raise ValueError(f"Invalid ROM size {len(data)} for address ${address:04X}")
+        data = memoryview(data)
+        for index in range(len(data) // PAGE_SIZE):
+            rom = shared_rom_page(data[index * PAGE_SIZE : (index + 1) * PAGE_SIZE])
+            self._set_page((address >> 8) + index, rom.data, PAGE_ROM, rom)
+
+    def map_file(self, address: int, path: str, writable: bool = False) -> FileRegion:
+        """
+        Map file onto pages starting at address (must be page aligned).
+
+        Read-only files act as ROM, writable ones as NVRAM. Nothing is read up front,
+        mapping costs one view per page regardless of the file content.
+        """
+        if address & 0xFF:
+            raise ValueError(f"File address ${address:04X} not page aligned!")
+        with open(path, "r+b" if writable else "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            if size == 0 or size % PAGE_SIZE or address + size > MEMORY_SIZE:
+                raise ValueError(f"Invalid file size {size} for address ${address:04X}")
+            mapped = mmap.mmap(
+                file.fileno(), size, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+            )
+        region = FileRegion(self, address >> 8, mapped)
+        for page in region.pages:
+            self._set_page(page, region.view(page), PAGE_EXTERNAL if writable else PAGE_ROM)
+        return region
+
+    def _write_page(self, page: int):
+        """Return page for writing, copying it first if it is shared."""
+        if self._modes[page] == PAGE_COW:
+            self._pages[page] = bytearray(self._pages[page])
+            self._modes[page] = PAGE_RAM
+        return self._pages[page]
+
+    def peek(self, address: int) -> Optional[int]:
+        """Return byte at address without device side effects, None on device pages."""
+        page = address >> 8
+        if self._modes[page] == PAGE_DEVICE:
+            return None
+        return self._pages[page][address & 0xFF]
+
+    def __len__(self) -> int:
+        """Return size of address space."""
+        return MEMORY_SIZE
+
+    def __getitem__(self, address):
+        """Read byte or slice."""
+        if isinstance(address, slice):
+            return [self[x] for x in range(*address.indices(len(self)))]
+        return self._pages[address >> 8][address & 0xFF]
+
+    def __setitem__(self, address, value):
+        """Write byte or slice."""
+        if isinstance(address, slice):
+            start, stop, step = address.indices(len(self))
+            data = bytes(value)
+            if step != 1 or stop - start != len(data):
+                raise ValueError("Only contiguous slices of same size can be assigned.")
+            # Copy page by page. Like ROM pages, device pages are skipped: a bulk copy (e.g.
+            # a memory template) must not trigger register writes.
+            offset = 0
+            while start < stop:
+                count = min(stop - start, PAGE_SIZE - (start & 0xFF))
+                mode = self._modes[start >> 8]
+                if mode != PAGE_ROM and mode != PAGE_DEVICE:
+                    page = self._write_page(start >> 8)
+                    page[start & 0xFF : (start & 0xFF) + count] = data[offset : offset + count]
+                start += count
+                offset += count
+            return
+        page = address >> 8
+        mode = self._modes[page]
+        if mode != PAGE_RAM:
+            if mode == PAGE_ROM:
+                return
+            self._write_page(page)
+        self._pages[page][address & 0xFF] = value
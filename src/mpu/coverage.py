@@ -0,0 +1,163 @@
+"""Code coverage of executed instructions and conditional branch outcomes."""
+from dataclasses import dataclass
+from typing import List, Optional
+from .bus import MEMORY_SIZE
+from .instrument import Instrument, StepHooks, disassemble
+from .utils import AddressMode
+
+
+@dataclass
+class BranchCoverage:
+    """Outcomes seen for a single conditional branch."""
+
+    address: int
+    instruction: str
+    taken: bool
+    not_taken: bool
+
+    @property
+    def complete(self) -> bool:
+        """Property getter for whether both outcomes were seen."""
+        return self.taken and self.not_taken
+
+
+@dataclass
+class CoverageRange:
+    """Run of executed instructions without gaps in between."""
+
+    start: int
+    end: int  # Last byte of the last instruction
+    lines: List[str]  # Disassembly of the instructions
+
+    def __len__(self) -> int:
+        """Return number of covered bytes."""
+        return self.end - self.start + 1
+
+
+class Coverage(Instrument):
+    """
+    Mark executed instructions and conditional branch outcomes in 64 KB byte maps.
+
+    executed holds the length of the instruction starting at an address once it ran (0
+    otherwise), taken and not_taken are set to 1 at the address of a conditional branch.
+    A branch counts as taken if _modify_pc_for_conditional_branch() charged its extra
+    cycle. Lengths are recorded while running, so ranges() stays right if the code is
+    modified later on.
+    """
+
+    def __init__(self, mpu) -> None:
+        """Initialize coverage for mpu (not attached yet)."""
+        super().__init__(mpu)
+        self.executed = bytearray(MEMORY_SIZE)
+        self.taken = bytearray(MEMORY_SIZE)
+        self.not_taken = bytearray(MEMORY_SIZE)
+
+    def clear(self) -> None:
+        """Reset all maps."""
+        self.executed[:] = bytes(MEMORY_SIZE)
+        self.taken[:] = bytes(MEMORY_SIZE)
+        self.not_taken[:] = bytes(MEMORY_SIZE)
+
+    def merge(self, other: "Coverage") -> None:
+        """
+        Add coverage collected by other (e.g. of another test case).
+
+        The maps are ORed as whole integers. Both record the same length for the same
+        instruction, so this keeps the lengths in executed.
+        """
+        for mine, theirs in (
+            (self.executed, other.executed),
+            (self.taken, other.taken),
+            (self.not_taken, other.not_taken),
+        ):
+            merged = int.from_bytes(mine, "little") | int.from_bytes(theirs, "little")
+            mine[:] = merged.to_bytes(MEMORY_SIZE, "little")
+
+    def _hooks(self) -> StepHooks:
+        """Return hook marking the executed instruction and the branch outcome."""
+        executed, taken, not_taken = self.executed, self.taken, self.not_taken
+        branch = AddressMode.BRANCH
+
+        def after(instruction, cycles: int) -> None:
+            address = instruction.address
+            executed[address] = instruction.bytes
+            if instruction.address_mode is branch:
+                # Only a taken branch costs extra cycles
+                if instruction.extra_cycles:
+                    taken[address] = 1
+                else:
+                    not_taken[address] = 1
+
+        return StepHooks(after=after)
+
+    def addresses(self, start: int = 0, end: int = MEMORY_SIZE - 1) -> List[int]:
+        """Return addresses of executed instructions from start up to end (inclusive)."""
+        executed = self.executed
+        return [address for address in range(start, end + 1) if executed[address]]
+
+    def covered_bytes(self, start: int = 0, end: int = MEMORY_SIZE - 1) -> int:
+        """Return number of bytes from start up to end which belong to executed instructions."""
+        return sum(len(item) for item in self.ranges(start, end, disassemble=False))
+
+    def branches(self, start: int = 0, end: int = MEMORY_SIZE - 1) -> List[BranchCoverage]:
+        """Return executed conditional branches from start up to end, ascending."""
+        taken, not_taken = self.taken, self.not_taken
+        return [
+            BranchCoverage(
+                address,
+                disassemble(self._mpu, address),
+                bool(taken[address]),
+                bool(not_taken[address]),
+            )
+            for address in range(start, end + 1)
+            if taken[address] or not_taken[address]
+        ]
+
+    def ranges(
+        self, start: int = 0, end: int = MEMORY_SIZE - 1, disassemble: bool = True
+    ) -> List[CoverageRange]:
+        """
+        Return covered bytes from start up to end as ranges of executed instructions.
+
+        A range continues as long as the next executed instruction starts right after the
+        previous one. Lines disassemble the current memory, branches are followed by the
+        outcomes seen.
+        """
+        executed = self.executed
+        ranges: List[CoverageRange] = []
+        current: Optional[CoverageRange] = None
+        for address in self.addresses(start, end):
+            last = min(address + executed[address], MEMORY_SIZE) - 1
+            if current is None or address > current.end + 1:
+                current = CoverageRange(address, last, [])
+                ranges.append(current)
+            else:
+                current.end = max(current.end, last)
+            if disassemble:
+                current.lines.append(self._line(address))
+        return ranges
+
+    def _line(self, address: int) -> str:
+        """Return disassembly of an executed instruction."""
+        line = f"{address:04X}: {disassemble(self._mpu, address)}"
+        taken, not_taken = self.taken[address], self.not_taken[address]
+        if taken or not_taken:
+            outcomes = [name for name, seen in (("taken", taken), ("not taken", not_taken)) if seen]
+            line = f"{line:<24} ; {', '.join(outcomes)}"
+        return line
+
+    def report(self, start: int = 0, end: int = MEMORY_SIZE - 1) -> str:
+        """Return summary and covered ranges from start up to end as text."""
+        ranges = self.ranges(start, end)
+        branches = self.branches(start, end)
+        complete = sum(branch.complete for branch in branches)
+        lines = [
+            f"{sum(len(item.lines) for item in ranges)} instructions,"
+            f" {sum(len(item) for item in ranges)} bytes covered in {len(ranges)} ranges,"
+            f" {complete} of {len(branches)} branches both ways"
+        ]
+        for item in ranges:
+            lines.append("")
+            lines.append(f"{item.start:04X}-{item.end:04X} ({len(item)} bytes)")
+            lines.extend(f"  {line}" for line in item.lines)
+        return "\n".join(lines)
@@ -0,0 +1,124 @@
+"""AFL-style fork server.
+
+An MPU is warmed up once (ROM loaded, boot sequence executed up to a chosen PC). Every test
+case is then served by forking the process: the child applies the input bytes to memory,
+runs with a cycle budget and reports stop reason and coverage back to the parent over a
+pipe. The warm machine in the parent is never touched, so the cost per case is roughly the
+cost of a fork.
+"""
+import os
+import struct
+from array import array
+from itertools import compress
+from dataclasses import dataclass, field
+from typing import Optional
+from .bus import MEMORY_SIZE
+from .mpu6502 import MPU
+from .utils import OpcodeNotImplemented, StopReason
+
+# Child -> parent message header: stop reason, elapsed cycles, number of covered addresses
+_HEADER = struct.Struct("<BQI")
+
+
+class _Reached(Exception):
+    """Raised by the warm up step once the target PC is reached."""
+
+
+@dataclass
+class ForkResult:
+    """Outcome of a single test case."""
+
+    stop_reason: Optional[StopReason]
+    elapsed_cycles: int = 0
+    coverage: array = field(default_factory=lambda: array("H"))
+    exit_status: int = 0
+
+    @property
+    def crashed(self) -> bool:
+        """Child died without reporting (uncaught exception or signal)."""
+        return self.stop_reason is None
+
+
+class ForkServer:
+    """Serve test cases from a warmed up MPU."""
+
+    def __init__(self, mpu: MPU, input_address: int) -> None:
+        """Initialize fork server, test case input is written to input_address."""
+        if not hasattr(os, "fork"):
+            raise NotImplementedError("Fork server requires os.fork()!")
+        self._mpu = mpu
+        self._input_address = input_address
+
+    @property
+    def mpu(self) -> MPU:
+        """Property getter for the warm MPU."""
+        return self._mpu
+
+    def warm_up(self, pc: int, max_cycles: int) -> bool:
+        """Run the MPU until it reaches pc. Return False if max_cycles elapsed first."""
+        mpu = self._mpu
+        registers = mpu.registers
+        mpu_step = mpu.step
+
+        def step() -> None:
+            if registers.PC == pc:
+                raise _Reached()
+            mpu_step()
+
+        try:
+            mpu._run_until(mpu.elapsed_cycles + max_cycles, step)
+        except _Reached:
+            return True
+        return registers.PC == pc
+
+    def run(self, data: bytes, cycles: int) -> ForkResult:
+        """Execute a single test case in a forked child."""
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            # Child: never return into the caller's code
+            exit_code = 1
+            try:
+                os.close(read_fd)
+                with os.fdopen(write_fd, "wb") as pipe:
+                    pipe.write(self._execute(data, cycles))
+                exit_code = 0
+            finally:
+                os._exit(exit_code)
+
+        os.close(write_fd)
+        with os.fdopen(read_fd, "rb") as pipe:
+            payload = pipe.read()
+        _, status = os.waitpid(pid, 0)
+        exit_status = os.waitstatus_to_exitcode(status)
+
+        if len(payload) < _HEADER.size:
+            return ForkResult(stop_reason=None, exit_status=exit_status)
+        reason, elapsed_cycles, count = _HEADER.unpack_from(payload)
+        coverage = array("H")
+        coverage.frombytes(payload[_HEADER.size : _HEADER.size + 2 * count])
+        return ForkResult(StopReason(reason), elapsed_cycles, coverage, exit_status)
+
+    def _execute(self, data: bytes, cycles: int) -> bytes:
+        """Apply input, run and encode the result (runs in the child)."""
+        mpu = self._mpu
+        registers = mpu.registers
+        memory = mpu._memory
+        memory[self._input_address : self._input_address + len(data)] = data
+
+        executed = bytearray(MEMORY_SIZE)
+        mpu_step = mpu.step
+
+        def step() -> None:
+            executed[registers.PC] = 1
+            mpu_step()
+
+        reason = StopReason.CYCLES
+        try:
+            # Same loop as MPU.run(), so scheduled device events fire in the child too
+            mpu._run_until(mpu.elapsed_cycles + cycles, step)
+        except OpcodeNotImplemented:
+            reason = StopReason.NOT_IMPLEMENTED
+
+        coverage = array("H", compress(range(MEMORY_SIZE), executed))
+        return _HEADER.pack(reason.value, mpu.elapsed_cycles, len(coverage)) + coverage.tobytes()
@@ -0,0 +1,233 @@
+"""Round-robin scheduler hosting many MPUs in one process."""
+import time
+from dataclasses import dataclass, field
+from enum import Enum, auto
+from typing import List, Optional
+from .utils import StopReason
+
+# Conditional branch opcodes and the flag condition under which they are taken
+_BRANCHES = {
+    0x10: lambda r: not r.NEGATIVE,  # BPL
+    0x30: lambda r: r.NEGATIVE,  # BMI
+    0x50: lambda r: not r.OVERFLOW,  # BVC
+    0x70: lambda r: r.OVERFLOW,  # BVS
+    0x90: lambda r: not r.CARRY,  # BCC
+    0xB0: lambda r: r.CARRY,  # BCS
+    0xD0: lambda r: not r.ZERO,  # BNE
+    0xF0: lambda r: r.ZERO,  # BEQ
+}
+
+
+def idle_loop_cycles(mpu) -> Optional[int]:
+    """
+    Return cycles per iteration if the MPU is spinning on a jump to itself.
+
+    Detects JMP to its own address and conditional branches to themselves which are
+    taken (flags cannot change in such a loop). Returns None otherwise.
+    """
+    pc = mpu.registers.PC
+    opcode = mpu._get_byte_at(pc)
+    if opcode == 0x4C:
+        if mpu._get_word_at((pc + 1) & 0xFFFF) == pc:
+            return 3
+    elif opcode in _BRANCHES:
+        if mpu._get_byte_at((pc + 1) & 0xFFFF) == 0xFE and _BRANCHES[opcode](mpu.registers):
+            return 3
+    return None
+
+
+class MachineState(Enum):
+    """Scheduling state of a hosted machine."""
+
+    RUNNING = auto()
+    IDLE = auto()  # Parked in an idle loop until an interrupt or event
+    HALTED = auto()  # Parked on an unimplemented opcode until woken up
+    FINISHED = auto()  # Cycle budget used up
+
+
+@dataclass
+class Machine:
+    """Hosted MPU with its budget and statistics."""
+
+    mpu: object
+    name: str
+    budget: Optional[int] = None
+    state: MachineState = MachineState.RUNNING
+    stop_reason: Optional[StopReason] = None
+    cycles: int = 0  # Executed cycles
+    skipped_cycles: int = 0  # Cycles fast-forwarded while idle
+    slices: int = 0
+    seconds: float = 0.0  # Host time spent
+    credit: int = 0  # Cycles owed to this machine, negative after overshooting a slice
+
+    @property
+    def remaining(self) -> Optional[int]:
+        """Property getter for budget cycles left, executed or skipped (None if unlimited)."""
+        if self.budget is None:
+            return None
+        return self.budget - self.cycles - self.skipped_cycles
+
+
+@dataclass
+class HostStats:
+    """
+    Aggregate statistics.
+
+    The lag of a running machine is the number of cycles (executed or skipped) it is
+    behind the running machine furthest ahead, e.g. after it was added late or parked for
+    a while. Parked and finished machines have no lag, mean_lag is taken over the running
+    ones.
+    """
+
+    machines: int
+    running: int
+    idle: int
+    halted: int
+    finished: int
+    cycles: int
+    seconds: float
+    max_lag: int
+    mean_lag: float
+    lags: List[int] = field(default_factory=list)  # Per machine, in hosting order
+
+    @property
+    def throughput(self) -> float:
+        """Property getter for executed cycles per host second."""
+        return self.cycles / self.seconds if self.seconds > 0 else 0.0
+
+
+class Host:
+    """
+    Time-slice many MPUs by cycle quanta.
+
+    Every round each running machine is credited quantum_cycles and runs until the credit
+    is used up; overshoot at the last instruction is carried into the next round, so over
+    time all machines get exactly the same number of cycles. Machines spinning in an idle
+    loop are parked: they are fast-forwarded to their next scheduled event or woken when
+    an interrupt becomes serviceable, without running a slice. Machines stopping on an
+    unimplemented opcode are parked until wake() is called.
+    """
+
+    def __init__(self, quantum_cycles: int = 10_000) -> None:
+        """Initialize empty host."""
+        self._quantum_cycles = quantum_cycles
+        self._machines: List[Machine] = []
+        self._seconds = 0.0
+
+    @property
+    def machines(self) -> List[Machine]:
+        """Property getter for hosted machines."""
+        return self._machines
+
+    def add(self, mpu, name: Optional[str] = None, budget: Optional[int] = None) -> Machine:
+        """Host a MPU, optionally limited to budget cycles."""
+        machine = Machine(mpu, name or f"mpu{len(self._machines)}", budget)
+        self._machines.append(machine)
+        return machine
+
+    def remove(self, machine: Machine) -> None:
+        """Stop hosting a machine."""
+        self._machines.remove(machine)
+
+    def wake(self, machine: Machine) -> None:
+        """Put a parked machine back into rotation."""
+        if machine.state in (MachineState.IDLE, MachineState.HALTED):
+            machine.state = MachineState.RUNNING
+            machine.stop_reason = None
+
+    def run(self, rounds: int = 1) -> int:
+        """Run rounds, return number of executed cycles."""
+        cycles = 0
+        for _ in range(rounds):
+            cycles += self.run_round()
+        return cycles
+
+    def run_round(self) -> int:
+        """Give every running machine one quantum, return number of executed cycles."""
+        clock = time.perf_counter
+        round_start = clock()
+        executed = 0
+        for machine in self._machines:
+            if machine.state == MachineState.IDLE:
+                self._check_idle(machine)
+            if machine.state != MachineState.RUNNING:
+                continue
+
+            mpu = machine.mpu
+            machine.credit += self._quantum_cycles
+            if machine.budget is not None:
+                machine.credit = min(machine.credit, machine.remaining)
+            if machine.credit <= 0:
+                continue
+
+            start_cycles = mpu.elapsed_cycles
+            start = clock()
+            reason = mpu.run(machine.credit)
+            machine.seconds += clock() - start
+            cycles = mpu.elapsed_cycles - start_cycles
+            machine.credit -= cycles
+            machine.cycles += cycles
+            machine.slices += 1
+            executed += cycles
+
+            if reason != StopReason.CYCLES:
+                machine.state = MachineState.HALTED
+                machine.stop_reason = reason
+                machine.credit = 0
+            elif machine.budget is not None and machine.remaining <= 0:
+                machine.state = MachineState.FINISHED
+            elif idle_loop_cycles(mpu) is not None:
+                machine.state = MachineState.IDLE
+                machine.credit = 0
+        self._seconds += clock() - round_start
+        return executed
+
+    def _check_idle(self, machine: Machine) -> None:
+        """Wake an idle machine on a serviceable interrupt or fast-forward to its next event."""
+        mpu = machine.mpu
+        pending = mpu._pending_interrupts
+        if pending & mpu.INTERRUPT_NMI or (pending and not mpu.registers.INTERRUPT):
+            machine.state = MachineState.RUNNING
+            return
+        next_cycle = mpu.scheduler.next_cycle
+        period = idle_loop_cycles(mpu)
+        if period is None:
+            # Woken by someone modifying its state
+            machine.state = MachineState.RUNNING
+        elif next_cycle is not None:
+            # Spin the loop in closed form up to the event, run() dispatches it
+            loops = max(0, -(-(next_cycle - mpu.elapsed_cycles) // period))
+            finished = False
+            if machine.budget is not None and loops * period >= machine.remaining:
+                # Budget ends before the event, skipped cycles are charged like executed ones
+                loops = max(0, -(-machine.remaining // period))
+                finished = True
+            mpu._elapsed_cycles += loops * period
+            machine.skipped_cycles += loops * period
+            machine.state = MachineState.FINISHED if finished else MachineState.RUNNING
+
+    def stats(self) -> HostStats:
+        """Return aggregate statistics."""
+        machines = self._machines
+        states = [machine.state for machine in machines]
+        progress = [machine.cycles + machine.skipped_cycles for machine in machines]
+        running = [
+            cycles for cycles, state in zip(progress, states) if state == MachineState.RUNNING
+        ]
+        leader = max(running, default=0)
+        lags = [
+            leader - cycles if state == MachineState.RUNNING else 0
+            for cycles, state in zip(progress, states)
+        ]
+        return HostStats(
+            machines=len(machines),
+            running=states.count(MachineState.RUNNING),
+            idle=states.count(MachineState.IDLE),
+            halted=states.count(MachineState.HALTED),
+            finished=states.count(MachineState.FINISHED),
+            cycles=sum(machine.cycles for machine in machines),
+            seconds=self._seconds,
+            max_lag=max(lags, default=0),
+            mean_lag=sum(leader - cycles for cycles in running) / len(running) if running else 0.0,
+            lags=lags,
+        )
@@ -0,0 +1,184 @@
+"""Instruments observing every step of an MPU through one shared chain of hooks."""
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+from .utils import DecodedInstruction
+
+
+@dataclass
+class StepHooks:
+    """
+    Callbacks of an instrument, None for the ones it does not need.
+
+    before(instruction): decoded but not executed yet, registers hold the state before it.
+    after(instruction, cycles): executed, elapsed cycles are advanced by cycles already.
+    interrupt(nmi, pc, sp, flags, start): NMI or IRQ handler entered, pc, sp and flags are
+    the ones before the entry and start is the cycle it began at.
+    """
+
+    before: Optional[Callable[[DecodedInstruction], None]] = None
+    after: Optional[Callable[[DecodedInstruction, int], None]] = None
+    interrupt: Optional[Callable[[bool, int, int, int, int], None]] = None
+
+
+class Instrument:
+    """
+    Base class of tools observing the steps of a single MPU instance.
+
+    All instruments attached to an MPU share one copy of MPU.step() calling their hooks
+    (see StepHooks), installed on the instance while any is attached. There is no cost
+    while detached, and an instrument attached alone may install a step of its own doing
+    the work inline (see _step()). before hooks run in attach order and after hooks in
+    reverse order, so an instrument attached later is nested within the ones attached
+    before. run() picks up the instrumented step when it is called, attaching from a
+    scheduled event takes effect with the next run().
+    """
+
+    def __init__(self, mpu) -> None:
+        """Initialize instrument for mpu (not attached yet)."""
+        self._mpu = mpu
+        self._step_hooks: Optional[StepHooks] = None
+
+    @property
+    def attached(self) -> bool:
+        """Property getter for whether the hooks are called on every step."""
+        return self in self._mpu._instruments
+
+    def attach(self):
+        """Add hooks to the instrumented step."""
+        mpu = self._mpu
+        if self in mpu._instruments:
+            raise RuntimeError("Instrument is already attached!")
+        if "step" in mpu.__dict__ and not mpu._instruments:
+            raise RuntimeError("MPU step is already replaced!")
+        self._step_hooks = self._hooks()
+        mpu._instruments.append(self)
+        _install(mpu)
+        return self
+
+    def detach(self) -> None:
+        """Remove hooks from the instrumented step, collected data is kept."""
+        if self.attached:
+            self._mpu._instruments.remove(self)
+            _install(self._mpu)
+
+    def __enter__(self):
+        """Attach instrument."""
+        return self.attach()
+
+    def __exit__(self, *args) -> None:
+        """Detach instrument."""
+        self.detach()
+
+    def _hooks(self) -> StepHooks:
+        """Return hooks called by the instrumented step."""
+        raise NotImplementedError()
+
+    def _step(self):
+        """Return specialised step used while attached alone, None to call the hooks."""
+        return None
+
+
+def disassemble(mpu, address: int) -> str:
+    """Return instruction at address as text (memory may have changed since it ran)."""
+    instruction = mpu.decode(address)
+    try:
+        return instruction.mnemonic + instruction._format_operand()
+    except NotImplementedError:
+        return instruction.mnemonic
+
+
+def _install(mpu) -> None:
+    """Install the step calling the hooks of all attached instruments, or the plain one."""
+    instruments = mpu._instruments
+    if not instruments:
+        mpu.__dict__.pop("step", None)
+        return
+    step = instruments[0]._step() if len(instruments) == 1 else None
+    if step is None:
+        step = _instrumented_step(mpu, [item._step_hooks for item in instruments])
+    mpu.step = step
+
+
+def _chain(hooks):
+    """Return single callable calling all hooks in order, None if there are none."""
+    if not hooks:
+        return None
+    if len(hooks) == 1:
+        return hooks[0]
+    hooks = tuple(hooks)
+
+    def chained(*args) -> None:
+        for hook in hooks:
+            hook(*args)
+
+    return chained
+
+
+def _instrumented_step(mpu, hooks: List[StepHooks]):
+    """Return copy of MPU.step() calling hooks, specialised on the hooks present."""
+    decode = mpu.decode
+    nmi = mpu.INTERRUPT_NMI
+    before = _chain([item.before for item in hooks if item.before is not None])
+    after = _chain([item.after for item in reversed(hooks) if item.after is not None])
+    interrupt = _chain([item.interrupt for item in hooks if item.interrupt is not None])
+
+    def enter_interrupt(registers) -> bool:
+        pending = mpu._pending_interrupts
+        pc, sp, flags, start = registers.PC, registers.SP, registers.FLAGS, mpu._elapsed_cycles
+        if not mpu._service_interrupt():
+            return False
+        if interrupt is not None:
+            interrupt(bool(pending & nmi), pc, sp, flags, start)
+        return True
+
+    if before is None and after is None:
+
+        def step() -> None:
+            registers = mpu._registers
+            if mpu._pending_interrupts and enter_interrupt(registers):
+                return
+            instruction = decode(registers.PC)
+            registers.PC += instruction.bytes
+            instruction.exec(mpu, instruction)
+            mpu._elapsed_cycles += instruction.cycles + instruction.extra_cycles
+
+    elif before is None:
+
+        def step() -> None:
+            registers = mpu._registers
+            if mpu._pending_interrupts and enter_interrupt(registers):
+                return
+            instruction = decode(registers.PC)
+            registers.PC += instruction.bytes
+            instruction.exec(mpu, instruction)
+            cycles = instruction.cycles + instruction.extra_cycles
+            mpu._elapsed_cycles += cycles
+            after(instruction, cycles)
+
+    elif after is None:
+
+        def step() -> None:
+            registers = mpu._registers
+            if mpu._pending_interrupts and enter_interrupt(registers):
+                return
+            instruction = decode(registers.PC)
+            before(instruction)
+            registers.PC += instruction.bytes
+            instruction.exec(mpu, instruction)
+            mpu._elapsed_cycles += instruction.cycles + instruction.extra_cycles
+
+    else:
+
+        def step() -> None:
+            registers = mpu._registers
+            if mpu._pending_interrupts and enter_interrupt(registers):
+                return
+            instruction = decode(registers.PC)
+            before(instruction)
+            registers.PC += instruction.bytes
+            instruction.exec(mpu, instruction)
+            cycles = instruction.cycles + instruction.extra_cycles
+            mpu._elapsed_cycles += cycles
+            after(instruction, cycles)
+
+    return step
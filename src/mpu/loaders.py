@@ -0,0 +1,174 @@
+"""Program loaders for raw binary, Intel HEX and Motorola S-record files."""
+import os
+import time
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional, Tuple
+from .bus import MEMORY_SIZE
+
+# Contiguous data is collected up to this size before it is written with one slice copy
+_RUN_LIMIT = 0x4000
+
+
+@dataclass
+class LoadResult:
+    """Summary of a loaded file."""
+
+    start_address: Optional[int]
+    bytes_loaded: int
+    runs: int  # Number of contiguous runs written
+    seconds: float
+
+    @property
+    def throughput(self) -> float:
+        """Property getter for loaded bytes per second."""
+        return self.bytes_loaded / self.seconds if self.seconds > 0 else float("inf")
+
+
+class _RunWriter:
+    """Merge consecutive data records into runs written with a single slice copy each."""
+
+    def __init__(self, memory) -> None:
+        self._memory = memory
+        self._address = 0
+        self._data = bytearray()
+        self.bytes_loaded = 0
+        self.runs = 0
+
+    def write(self, address: int, data: bytes) -> None:
+        if address + len(data) > MEMORY_SIZE:
+            raise ValueError(f"Data at ${address:04X} exceeds address space!")
+        if self._data and (
+            address != self._address + len(self._data) or len(self._data) >= _RUN_LIMIT
+        ):
+            self.flush()
+        if not self._data:
+            self._address = address
+        self._data += data
+
+    def flush(self) -> None:
+        if self._data:
+            self._memory[self._address : self._address + len(self._data)] = self._data
+            self.bytes_loaded += len(self._data)
+            self.runs += 1
+            self._data = bytearray()
+
+
+def _records(lines: Iterable[str], path: str, marker: str) -> Iterator[Tuple[int, str]]:
+    """Yield (line number, record) for all non-empty lines, checking the start marker."""
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        if not line.startswith(marker):
+            raise ValueError(f"{path}:{number}: Record does not start with '{marker}'")
+        yield number, line
+
+
+def load_binary(memory, path: str, address: int, chunk_size: int = _RUN_LIMIT) -> LoadResult:
+    """Load raw binary file at address, reading it in chunks."""
+    start = time.perf_counter()
+    if address + os.path.getsize(path) > MEMORY_SIZE:
+        raise ValueError(f"{path} at ${address:04X} exceeds address space!")
+    writer = _RunWriter(memory)
+    with open(path, "rb") as file:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            writer.write(address + writer.bytes_loaded, chunk)
+            writer.flush()
+    return LoadResult(None, writer.bytes_loaded, writer.runs, time.perf_counter() - start)
+
+
+def load_intel_hex(memory, path: str) -> LoadResult:
+    """Load Intel HEX file. Start address is taken from a type 03 or 05 record."""
+    start = time.perf_counter()
+    writer = _RunWriter(memory)
+    base = 0
+    start_address = None
+    with open(path, "r") as file:
+        for number, line in _records(file, path, ":"):
+            record = bytes.fromhex(line[1:])
+            if len(record) < 5 or len(record) != record[0] + 5:
+                raise ValueError(f"{path}:{number}: Invalid record length")
+            if sum(record) & 0xFF:
+                raise ValueError(f"{path}:{number}: Checksum error")
+            count, record_type = record[0], record[3]
+            data = record[4 : 4 + count]
+            if record_type == 0x00:
+                writer.write(base + ((record[1] << 8) | record[2]), data)
+            elif record_type == 0x01:
+                break
+            elif record_type == 0x02:
+                base = int.from_bytes(data, "big") << 4
+            elif record_type == 0x03:
+                segment, offset = int.from_bytes(data[:2], "big"), int.from_bytes(data[2:], "big")
+                start_address = ((segment << 4) + offset) & 0xFFFF
+            elif record_type == 0x04:
+                base = int.from_bytes(data, "big") << 16
+            elif record_type == 0x05:
+                start_address = int.from_bytes(data, "big") & 0xFFFF
+            else:
+                raise ValueError(f"{path}:{number}: Unknown record type {record_type:02X}")
+    writer.flush()
+    return LoadResult(start_address, writer.bytes_loaded, writer.runs, time.perf_counter() - start)
+
+
+# S-record type => address size in bytes
+_SRECORD_ADDRESS_SIZE = {"0": 2, "1": 2, "2": 3, "3": 4, "5": 2, "6": 3, "7": 4, "8": 3, "9": 2}
+
+
+def load_srecord(memory, path: str) -> LoadResult:
+    """Load Motorola S-record file. Start address is taken from an S7, S8 or S9 record."""
+    start = time.perf_counter()
+    writer = _RunWriter(memory)
+    start_address = None
+    with open(path, "r") as file:
+        for number, line in _records(file, path, "S"):
+            record_type = line[1]
+            if record_type not in _SRECORD_ADDRESS_SIZE:
+                raise ValueError(f"{path}:{number}: Unknown record type S{record_type}")
+            record = bytes.fromhex(line[2:])
+            if not record or len(record) != record[0] + 1:
+                raise ValueError(f"{path}:{number}: Invalid record length")
+            if sum(record) & 0xFF != 0xFF:
+                raise ValueError(f"{path}:{number}: Checksum error")
+            size = _SRECORD_ADDRESS_SIZE[record_type]
+            address = int.from_bytes(record[1 : 1 + size], "big")
+            if record_type in "123":
+                writer.write(address, record[1 + size : -1])
+            elif record_type in "789":
+                start_address = address & 0xFFFF
+    writer.flush()
+    return LoadResult(start_address, writer.bytes_loaded, writer.runs, time.perf_counter() - start)
+
+
+def load_program(
+    mpu, path: str, address: Optional[int] = None, set_reset_vector: bool = False
+) -> LoadResult:
+    """
+    Load file into MPU memory, format chosen by extension (.hex/.ihx, .s19/.s28/.s37/.srec).
+
+    Other files are raw binaries loaded at address. A start address from the file (or
+    address for binaries) becomes the MPU start PC and, if requested, the reset vector.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".hex", ".ihx"):
+        result = load_intel_hex(mpu._memory, path)
+    elif extension in (".s19", ".s28", ".s37", ".srec", ".mot"):
+        result = load_srecord(mpu._memory, path)
+    else:
+        if address is None:
+            raise ValueError(f"Load address required for binary file {path}!")
+        result = load_binary(mpu._memory, path, address)
+        result.start_address = address
+
+    if result.start_address is not None:
+        mpu._start_pc = result.start_address
+        if set_reset_vector:
+            vector = mpu.MEM_VECTOR_RESET
+            mpu._memory[vector : vector + 2] = (
+                result.start_address & 0xFF,
+                result.start_address >> 8,
+            )
+    return result
@@ -1,17 +1,30 @@
 """6502 MPU."""
-from typing import List, Optional
+import asyncio
+from dataclasses import replace
+from typing import List, Optional, Sequence, Tuple
+from .bus import MemoryBus
+from .scheduler import Scheduler
+from .transaction import Transaction
 from .utils import (
     Instruction,
     DecodedInstruction,
     Opcode,
+    OpcodeNotImplemented,
     dec_to_two_complement,
     make_instruction_decorator,
     Registers,
+    StopReason,
     Flag,
     AddressMode,
     two_complement_to_dec,
 )
 
+# Decode cache table for memory without ROM pages
+_NO_DECODE_CACHE = (None,) * 0x100
+
+# Bit 5 of the status register, always pushed as 1 (Flag.UNUSED does not hold this bit)
+_UNUSED_FLAG_BIT = 0b0010_0000
+
 
 class MPU:
     """MPU definition."""
@@ -22,50 +35,218 @@ class MPU:
     MEM_VECTOR_RESET = 0xFFFC
     MEM_VECTOR_IRQ_BRK = 0xFFFE
 
-    _instructions: List[Instruction] = [None] * (0xFF + 1)
+    # Pending interrupt bits
+    INTERRUPT_NMI = 0b01
+    INTERRUPT_IRQ = 0b10
+    INTERRUPT_CYCLES = 7
+
+    # Filled by the instruction decorator while the class body executes and frozen
+    # into a tuple right after (see _freeze_instructions). Never mutated afterwards,
+    # so MPUs may be created and run concurrently from several threads.
+    _instructions: Sequence[Instruction] = [None] * (0xFF + 1)
     InstructionDecorator = make_instruction_decorator(_instructions)
 
     def __init__(self, memory, pc: int = 0x0000) -> None:
         """Initialize MPU (performs a reset too!)."""
-        self._enrich_instructions()
         self._registers = Registers(A=0, X=0, Y=0, FLAGS=0, PC=0, SP=0)
         self._start_pc = pc
         self._elapsed_cycles = 0
+        self._template_cache = None
+        self._scheduler = Scheduler()
+        # Checked once per instruction, non-zero only if an interrupt needs attention
+        self._pending_interrupts = 0
+        self._irq_sources = set()
+        # Instruments sharing the instrumented step, see instrument.py
+        self._instruments: List = []
+        # Undo journal of the running transaction, see transaction()
+        self._journal: Optional[List[Tuple[int, int]]] = None
 
         self._memory = memory
+        # Reads old bytes for the journal, device pages (None) are not journaled
+        self._peek = memory.peek if isinstance(memory, MemoryBus) else memory.__getitem__
+        # Decode caches of immutable (ROM) pages, shared by all MPUs mapping the same ROM
+        self._decode_cache = memory._decoded if isinstance(memory, MemoryBus) else _NO_DECODE_CACHE
         self.reset()
 
-    def _enrich_instructions(self):
-        """Map all unmapped opcodes to ??? function."""
+    @classmethod
+    def _freeze_instructions(cls):
+        """Map all unmapped opcodes to ??? function and make the table immutable."""
+        instructions: List[Instruction] = list(cls._instructions)
         for opcode in range(0xFF + 1):
-            if not isinstance(self._instructions[opcode], Instruction):
-                self._instructions[opcode] = Instruction(
-                    opcode, 0, 1, "???", AddressMode.NONE, self.inst_not_implemented
+            if not isinstance(instructions[opcode], Instruction):
+                instructions[opcode] = Instruction(
+                    opcode, 0, 1, "???", AddressMode.NONE, cls.inst_not_implemented
                 )
+        cls._instructions = tuple(instructions)
+
+    def reset(self, memory_template: Optional[bytes] = None):
+        """
+        Perform MPU reset.
 
-    def reset(self):
-        """Perform MPU reset."""
+        If a memory template is given, memory is restored from it with a single buffer copy
+        and flags and elapsed cycles are cleared too (like a power on). Scheduled events and
+        pending interrupts are dropped and mapped devices are reset, so events posted by
+        others (e.g. SamplingProfiler) have to be started again.
+        """
+        if memory_template is not None:
+            if len(memory_template) != len(self._memory):
+                raise ValueError(
+                    f"Memory template size {len(memory_template)}"
+                    f" != memory size {len(self._memory)}"
+                )
+            if isinstance(self._memory, list) and isinstance(memory_template, bytes):
+                # Copying list <- list is a plain pointer copy, list <- bytes converts
+                # every byte. Convert the template once and reuse it for later resets.
+                # Only immutable bytes are cached, a bytearray may change in place.
+                if self._template_cache is None or self._template_cache[0] is not memory_template:
+                    self._template_cache = (memory_template, list(memory_template))
+                memory_template = self._template_cache[1]
+            self._memory[:] = memory_template
+            self._registers.FLAGS = 0
+            self._elapsed_cycles = 0
+            self._scheduler.clear()
+            self._pending_interrupts = 0
+            self._irq_sources.clear()
+            if isinstance(self._memory, MemoryBus):
+                self._memory._reset_devices()
         self._registers.PC = self._start_pc
         self._registers.SP = 0xFF
         self._registers.A = 0
         self._registers.X = 0
         self._registers.Y = 0
 
+    def clone(self) -> "MPU":
+        """
+        Return an independent copy of this MPU.
+
+        Memory must be a MemoryBus: its pages are shared with the clone and copied on the
+        first write of either side, so cloning does not copy 64 KB. Mapped devices are
+        replaced by their copies returned by device.clone(other), which schedule their own
+        events on the clone. Other scheduled events are not cloned.
+        """
+        if not isinstance(self._memory, MemoryBus):
+            raise TypeError("clone() requires a MemoryBus as memory!")
+        memory = self._memory._clone()
+        other = type(self)(memory=memory, pc=self._start_pc)
+        other._registers = replace(self._registers)
+        other._elapsed_cycles = self._elapsed_cycles
+        other._pending_interrupts = self._pending_interrupts & self.INTERRUPT_NMI
+        memory._clone_devices(other)
+        return other
+
+    def transaction(self) -> Transaction:
+        """Start recording memory writes, see Transaction."""
+        return Transaction(self)
+
     def decode(self, address: int) -> DecodedInstruction:
         """Decode instruction at particular address."""
+        page_cache = self._decode_cache[address >> 8]
+        if page_cache is not None:
+            cached = page_cache[address & 0xFF]
+            if cached is not None:
+                template, operand = cached
+                instruction = DecodedInstruction(**template.__dict__)
+                instruction.address = address
+                instruction.operand = operand
+                return instruction
+
         instruction_opcode = self._get_byte_at(address)
-        instruction = DecodedInstruction(**self._instructions[instruction_opcode].__dict__)
+        template = self._instructions[instruction_opcode]
+        instruction = DecodedInstruction(**template.__dict__)
         instruction.address = address
         instruction.operand = self._fetch_operands(instruction)
+        if page_cache is not None and (address & 0xFF) + instruction.bytes <= 0x100:
+            page_cache[address & 0xFF] = (template, instruction.operand)
         return instruction
 
     def step(self):
-        """Execute instruction at PC."""
+        """Execute instruction at PC (or enter a pending interrupt handler)."""
+        if self._pending_interrupts and self._service_interrupt():
+            return
         instruction = self.decode(self._registers.PC)
         self._registers.PC += instruction.bytes
         instruction.exec(self, instruction)
         self._elapsed_cycles += instruction.cycles + instruction.extra_cycles
 
+    def run(self, cycles: int) -> StopReason:
+        """
+        Execute instructions until at least `cycles` more cycles have elapsed.
+
+        Scheduled events are dispatched at the first instruction boundary at or after their
+        cycle. In between, instructions execute without any further checks. An unmapped
+        opcode stops the run with PC pointing at it.
+        """
+        try:
+            self._run_until(self._elapsed_cycles + cycles, self.step)
+        except OpcodeNotImplemented as error:
+            self._registers.PC = error.address
+            return StopReason.NOT_IMPLEMENTED
+        return StopReason.CYCLES
+
+    def _run_until(self, target: int, step) -> None:
+        """Call step until elapsed cycles reach target, dispatching scheduled events."""
+        scheduler = self._scheduler
+        while self._elapsed_cycles < target:
+            deadline = scheduler.next_cycle
+            if deadline is None or deadline > target:
+                deadline = target
+            while self._elapsed_cycles < deadline:
+                step()
+            scheduler.dispatch(self._elapsed_cycles)
+
+    async def run_async(self, cycles: int, slice_cycles: int = 10_000) -> StopReason:
+        """
+        Execute like run() but yield to the asyncio event loop every slice_cycles.
+
+        Peripherals fed by asyncio streams get their data between slices, so nothing is
+        awaited per instruction.
+        """
+        target = self._elapsed_cycles + cycles
+        while self._elapsed_cycles < target:
+            reason = self.run(min(slice_cycles, target - self._elapsed_cycles))
+            if reason != StopReason.CYCLES:
+                return reason
+            await asyncio.sleep(0)
+        return StopReason.CYCLES
+
+    def set_irq(self, asserted: bool, source=None) -> None:
+        """
+        Assert or release the IRQ line for a source.
+
+        The line is level triggered and wired-OR: it stays active as long as any source
+        asserts it and is serviced whenever the I flag is clear.
+        """
+        if asserted:
+            self._irq_sources.add(source)
+        else:
+            self._irq_sources.discard(source)
+        if self._irq_sources:
+            self._pending_interrupts |= self.INTERRUPT_IRQ
+        else:
+            self._pending_interrupts &= ~self.INTERRUPT_IRQ
+
+    def nmi(self) -> None:
+        """Signal an NMI edge. Serviced before the next instruction regardless of I flag."""
+        self._pending_interrupts |= self.INTERRUPT_NMI
+
+    def _service_interrupt(self) -> bool:
+        """Enter NMI or IRQ handler if one is pending and not masked."""
+        if self._pending_interrupts & self.INTERRUPT_NMI:
+            self._pending_interrupts &= ~self.INTERRUPT_NMI
+            vector = self.MEM_VECTOR_NMI
+        elif not self._registers.INTERRUPT:
+            vector = self.MEM_VECTOR_IRQ_BRK
+        else:
+            return False
+
+        # Same as BRK but with B flag cleared on the stack
+        self._push_word(self._registers.PC)
+        self._push((self._registers.FLAGS & ~Flag.BREAK.value) | _UNUSED_FLAG_BIT)
+        self._registers.set_flag(Flag.INTERRUPT)
+        self._registers.PC = self._get_word_at(vector)
+        self._elapsed_cycles += self.INTERRUPT_CYCLES
+        return True
+
     def _fetch_operands(self, instruction: DecodedInstruction) -> Optional[int]:
         """Fetch instructions operands."""
         if instruction.bytes == 1:
@@ -82,6 +263,10 @@ class MPU:
 
     def _set_byte_at(self, address: int, value: int) -> None:
         """Write byte to memory."""
+        if self._journal is not None:
+            old = self._peek(address)
+            if old is not None:
+                self._journal.append((address, old))
         self._memory[address] = value & 0xFF
 
     def _get_word_at(self, address: int, allow_page_overflow=True) -> int:
@@ -122,14 +307,19 @@ class MPU:
         """Property getter for registers."""
         return self._registers
 
+    @property
+    def scheduler(self) -> Scheduler:
+        """Property getter for event scheduler."""
+        return self._scheduler
+
     @property
     def elapsed_cycles(self) -> int:
         """Property getter for elapsed cycles since power on."""
         return self._elapsed_cycles
 
-    def inst_not_implemented(*args, **kwargs):
+    def inst_not_implemented(self, instruction: DecodedInstruction):
         """Do nothing. Just a dummy for unmapped opcodes."""
-        raise NotImplementedError("Opcode not implementen!")
+        raise OpcodeNotImplemented(instruction.opcode, instruction.address)
 
     def _get_effective_address(self, instruction: DecodedInstruction) -> Optional[int]:
         """
@@ -913,3 +1103,6 @@ class MPU:
         """TYA (Transfer Y to A)."""
         self.registers.A = self.registers.Y
         self.registers.modify_nz_flags(self.registers.A)
+
+
+MPU._freeze_instructions()
@@ -0,0 +1,78 @@
+"""Real-time clock throttling."""
+import time
+from typing import Callable, Optional
+from .utils import StopReason
+
+
+class ClockPacer:
+    """
+    Run an MPU at a target clock rate.
+
+    Execution happens in quanta of cycles through MPU.run(). After each quantum the pacer
+    compares the emulated time (elapsed cycles / frequency) with a monotonic clock and
+    sleeps once if the emulator is ahead. Deadlines are computed from a fixed origin, so
+    oversleeping in one quantum is made up in the next ones instead of accumulating.
+    If the emulator falls behind by more than max_lag seconds the origin is moved,
+    i.e. the lost time is given up instead of running flat out to catch up.
+    """
+
+    def __init__(
+        self,
+        mpu,
+        frequency: float = 1_000_000,
+        quantum_cycles: int = 10_000,
+        max_lag: float = 0.25,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        """Initialize pacer for mpu running at frequency Hz."""
+        self._mpu = mpu
+        self._frequency = frequency
+        self._quantum_cycles = quantum_cycles
+        self._max_lag = max_lag
+        self._clock = clock
+        self._sleep = sleep
+        self._origin_time: Optional[float] = None
+        self._origin_cycles = 0
+        self._lag = 0.0
+        self._slept = 0.0
+
+    @property
+    def lag(self) -> float:
+        """Property getter for seconds behind real time at last quantum (< 0: ahead)."""
+        return self._lag
+
+    @property
+    def slept(self) -> float:
+        """Property getter for total seconds slept."""
+        return self._slept
+
+    def reset(self) -> None:
+        """Restart pacing from now, e.g. after the emulation has been paused."""
+        self._origin_time = None
+
+    def run(self, cycles: int) -> StopReason:
+        """Execute at least cycles cycles in real time."""
+        mpu = self._mpu
+        if self._origin_time is None:
+            self._origin_time = self._clock()
+            self._origin_cycles = mpu.elapsed_cycles
+        target = mpu.elapsed_cycles + cycles
+        while mpu.elapsed_cycles < target:
+            reason = mpu.run(min(self._quantum_cycles, target - mpu.elapsed_cycles))
+            if reason != StopReason.CYCLES:
+                return reason
+            self._pace()
+        return StopReason.CYCLES
+
+    def _pace(self) -> None:
+        """Sleep until real time catches up with emulated time."""
+        due = self._origin_time + (self._mpu.elapsed_cycles - self._origin_cycles) / self._frequency
+        now = self._clock()
+        self._lag = now - due
+        if self._lag < 0:
+            self._sleep(-self._lag)
+            self._slept -= self._lag
+        elif self._lag > self._max_lag:
+            # Give up on catching up, continue relative to now
+            self._origin_time += self._lag
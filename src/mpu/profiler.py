@@ -0,0 +1,625 @@
+"""Profilers for emulated code (instructions, cycles, calls) and for the emulator itself."""
+import csv
+import json
+import time
+from array import array
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+from .bus import MEMORY_SIZE
+from .instrument import Instrument, StepHooks, disassemble
+from .utils import AddressMode, DecodedInstruction
+
+
+@dataclass
+class ProfileEntry:
+    """Executions and cycles attributed to a single instruction address."""
+
+    address: int
+    instruction: str
+    count: int
+    cycles: int
+    share: float  # Fraction of all attributed cycles
+
+
+@dataclass
+class Sample:
+    """State of the MPU at a sampling point."""
+
+    cycle: int
+    pc: int
+    sp: int
+    stack: Tuple[int, ...]  # Subroutine entry addresses, outermost first
+
+
+@dataclass
+class CallGraphEntry:
+    """Calls and cycles attributed to a subroutine entry address."""
+
+    address: int
+    name: str
+    calls: int
+    inclusive: int  # Cycles spent in the subroutine and everything it called
+    exclusive: int  # Cycles spent in the subroutine itself
+
+
+class Profiler(Instrument):
+    """
+    Count executions and cycles (base plus extra cycles) per PC.
+
+    Cycles spent entering interrupt handlers are counted separately.
+    """
+
+    def __init__(self, mpu) -> None:
+        """Initialize profiler for mpu (not attached yet)."""
+        super().__init__(mpu)
+        self.counts = array("Q", [0]) * MEMORY_SIZE
+        self.cycles = array("Q", [0]) * MEMORY_SIZE
+        self.interrupts = 0
+        self.interrupt_cycles = 0
+
+    def clear(self) -> None:
+        """Reset all counters."""
+        self.counts[:] = array("Q", [0]) * MEMORY_SIZE
+        self.cycles[:] = array("Q", [0]) * MEMORY_SIZE
+        self.interrupts = 0
+        self.interrupt_cycles = 0
+
+    def _hooks(self) -> StepHooks:
+        """Return hooks counting the executed instruction."""
+        counts, cycles = self.counts, self.cycles
+        interrupt_cycles = self._mpu.INTERRUPT_CYCLES
+
+        def after(instruction, elapsed: int) -> None:
+            address = instruction.address
+            counts[address] += 1
+            cycles[address] += elapsed
+
+        def interrupt(nmi: bool, pc: int, sp: int, flags: int, start: int) -> None:
+            self.interrupts += 1
+            self.interrupt_cycles += interrupt_cycles
+
+        return StepHooks(after=after, interrupt=interrupt)
+
+    def _step(self):
+        """Return copy of MPU.step() counting inline, used while attached alone."""
+        mpu = self._mpu
+        decode = mpu.decode
+        counts, cycles = self.counts, self.cycles
+        interrupt_cycles = mpu.INTERRUPT_CYCLES
+
+        def step() -> None:
+            if mpu._pending_interrupts and mpu._service_interrupt():
+                self.interrupts += 1
+                self.interrupt_cycles += interrupt_cycles
+                return
+            registers = mpu._registers
+            pc = registers.PC
+            instruction = decode(pc)
+            registers.PC += instruction.bytes
+            instruction.exec(mpu, instruction)
+            elapsed = instruction.cycles + instruction.extra_cycles
+            mpu._elapsed_cycles += elapsed
+            counts[pc] += 1
+            cycles[pc] += elapsed
+
+        return step
+
+    @property
+    def total_cycles(self) -> int:
+        """Property getter for all attributed cycles including interrupt entries."""
+        return sum(self.cycles) + self.interrupt_cycles
+
+    def entries(self) -> List[ProfileEntry]:
+        """Return executed addresses, most cycles first."""
+        total = self.total_cycles or 1
+        counts, cycles = self.counts, self.cycles
+        executed = [address for address in range(MEMORY_SIZE) if counts[address]]
+        executed.sort(key=lambda address: (-cycles[address], address))
+        return [
+            ProfileEntry(
+                address,
+                disassemble(self._mpu, address),
+                counts[address],
+                cycles[address],
+                cycles[address] / total,
+            )
+            for address in executed
+        ]
+
+    def to_json(self, path: str) -> None:
+        """Write profile as JSON, most cycles first."""
+        with open(path, "w") as file:
+            json.dump(
+                {
+                    "total_cycles": self.total_cycles,
+                    "interrupts": self.interrupts,
+                    "interrupt_cycles": self.interrupt_cycles,
+                    "entries": [asdict(entry) for entry in self.entries()],
+                },
+                file,
+                indent=1,
+            )
+
+    def to_csv(self, path: str) -> None:
+        """Write profile as CSV, most cycles first."""
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["address", "instruction", "count", "cycles", "share"])
+            for entry in self.entries():
+                writer.writerow(
+                    [
+                        f"{entry.address:04X}",
+                        entry.instruction,
+                        entry.count,
+                        entry.cycles,
+                        f"{entry.share:.6f}",
+                    ]
+                )
+
+
+# Opcodes entering a subroutine or handler: JSR, BRK
+_CALL_OPCODES = (0x20, 0x00)
+
+# Shadow stack frame: [entry address, SP inside the frame, start cycle, exclusive cycles, path]
+_ADDRESS, _SP, _START, _EXCLUSIVE, _PATH = range(5)
+
+
+class CallGraphProfiler(Instrument):
+    """
+    Attribute inclusive and exclusive cycles to subroutines using a shadow call stack.
+
+    JSR, BRK and interrupt entries push a frame remembering SP after the return address
+    was pushed. Returns are not decoded: a frame ends as soon as SP rises above its value,
+    which covers RTS and RTI as well as manual stack pops or resetting SP with TXS. Pushing
+    an address and "returning" to it (RTS as jump) stays within the current frame.
+
+    The frame active when attaching is the root, named after the PC at that time. Names
+    are taken from symbols (entry address => name) if given.
+    """
+
+    def __init__(self, mpu, symbols: Optional[Dict[int, str]] = None) -> None:
+        """Initialize profiler for mpu (not attached yet)."""
+        super().__init__(mpu)
+        self.symbols = symbols or {}
+        self._stack: List[list] = []
+        self.clear()
+
+    def clear(self) -> None:
+        """Reset all data, the current PC becomes the new root."""
+        root = self._mpu.registers.PC
+        # Root SP is above any real SP, so the root frame is never left
+        self._stack[:] = [[root, 0x100, self._mpu.elapsed_cycles, 0, (root,)]]
+        self._active = {root: 1}
+        self._calls: Dict[int, int] = {root: 1}
+        self._inclusive: Dict[int, int] = {}
+        self._exclusive: Dict[int, int] = {}
+        self._folded: Dict[Tuple[int, ...], int] = {}
+
+    @property
+    def depth(self) -> int:
+        """Property getter for number of active frames below the root."""
+        return len(self._stack) - 1
+
+    def _call(self, address: int, sp: int, start: int) -> None:
+        """Push frame."""
+        self._stack.append([address, sp, start, 0, self._stack[-1][_PATH] + (address,)])
+        self._active[address] = self._active.get(address, 0) + 1
+        self._calls[address] = self._calls.get(address, 0) + 1
+
+    def _return(self, sp: int) -> None:
+        """Pop all frames left by raising SP to sp."""
+        stack = self._stack
+        now = self._mpu.elapsed_cycles
+        while len(stack) > 1 and sp > stack[-1][_SP]:
+            address, _, start, exclusive, path = stack.pop()
+            self._exclusive[address] = self._exclusive.get(address, 0) + exclusive
+            self._folded[path] = self._folded.get(path, 0) + exclusive
+            self._active[address] -= 1
+            if not self._active[address]:
+                # Outermost activation, recursive ones are included already
+                self._inclusive[address] = self._inclusive.get(address, 0) + now - start
+
+    def _hooks(self) -> StepHooks:
+        """Return hooks maintaining the shadow call stack."""
+        mpu = self._mpu
+        stack = self._stack
+        interrupt_cycles = mpu.INTERRUPT_CYCLES
+
+        def after(instruction, elapsed: int) -> None:
+            registers = mpu._registers
+            frame = stack[-1]
+            frame[_EXCLUSIVE] += elapsed
+            if registers.SP > frame[_SP]:
+                self._return(registers.SP)
+            elif instruction.opcode in _CALL_OPCODES:
+                self._call(registers.PC, registers.SP, mpu._elapsed_cycles)
+
+        def interrupt(nmi: bool, pc: int, sp: int, flags: int, start: int) -> None:
+            self._call(mpu._registers.PC, mpu._registers.SP, start)
+            stack[-1][_EXCLUSIVE] += interrupt_cycles
+
+        return StepHooks(after=after, interrupt=interrupt)
+
+    def name(self, address: int) -> str:
+        """Return symbol name of address or its hex notation."""
+        return self.symbols.get(address, f"${address:04X}")
+
+    def _totals(self):
+        """Return inclusive, exclusive and folded cycles including active frames."""
+        inclusive = dict(self._inclusive)
+        exclusive = dict(self._exclusive)
+        folded = dict(self._folded)
+        now = self._mpu.elapsed_cycles
+        outermost = set()
+        for address, _, start, cycles, path in self._stack:
+            exclusive[address] = exclusive.get(address, 0) + cycles
+            folded[path] = folded.get(path, 0) + cycles
+            if address not in outermost:
+                outermost.add(address)
+                inclusive[address] = inclusive.get(address, 0) + now - start
+        return inclusive, exclusive, folded
+
+    def entries(self) -> List[CallGraphEntry]:
+        """Return subroutines, most inclusive cycles first."""
+        inclusive, exclusive, _ = self._totals()
+        entries = [
+            CallGraphEntry(
+                address,
+                self.name(address),
+                calls,
+                inclusive.get(address, 0),
+                exclusive.get(address, 0),
+            )
+            for address, calls in self._calls.items()
+        ]
+        entries.sort(key=lambda entry: (-entry.inclusive, entry.address))
+        return entries
+
+    def folded(self) -> List[str]:
+        """Return folded stacks ("root;caller;callee cycles") as used by flame graph tools."""
+        _, _, folded = self._totals()
+        return [
+            ";".join(self.name(address) for address in path) + f" {cycles}"
+            for path, cycles in sorted(folded.items())
+            if cycles
+        ]
+
+    def write_folded(self, path: str) -> None:
+        """Write folded stacks to a file."""
+        with open(path, "w") as file:
+            for line in self.folded():
+                file.write(line + "\n")
+
+
+def unwind_stack(mpu, max_depth: int = 32) -> List[int]:
+    """
+    Return subroutine entry addresses found on the hardware stack, outermost first.
+
+    Scans from SP upwards for return addresses pointing right behind a JSR and takes the
+    JSR target as entry address. Data on the stack may occasionally look like a return
+    address, so the result is a heuristic.
+    """
+    memory = mpu._memory
+    entries: List[int] = []
+    address = mpu.MEM_STACK + mpu.registers.SP + 1
+    end = mpu.MEM_STACK + 0xFF
+    while address < end and len(entries) < max_depth:
+        jsr = ((memory[address] | (memory[address + 1] << 8)) - 2) & 0xFFFF
+        if memory[jsr] == 0x20:
+            entries.append(memory[(jsr + 1) & 0xFFFF] | (memory[(jsr + 2) & 0xFFFF] << 8))
+            address += 2
+        else:
+            address += 1
+    entries.reverse()
+    return entries
+
+
+class SamplingProfiler:
+    """
+    Record PC, SP and call stack every interval cycles into a fixed size ring buffer.
+
+    Samples are taken by a scheduler event, so nothing is added to the instruction loop.
+    The call stack is taken from a CallGraphProfiler if one is given (exact, but that one
+    instruments every step), otherwise it is unwound from the hardware stack (see
+    unwind_stack()). Stacks deeper than max_depth keep their innermost frames.
+    """
+
+    def __init__(
+        self,
+        mpu,
+        interval_cycles: int = 1000,
+        capacity: int = 65536,
+        max_depth: int = 32,
+        call_graph: Optional[CallGraphProfiler] = None,
+    ) -> None:
+        """Initialize profiler for mpu (not attached yet)."""
+        if interval_cycles <= 0 or capacity <= 0 or not 0 < max_depth < 0x100:
+            raise ValueError("Invalid sampling parameters!")
+        self._mpu = mpu
+        self.interval_cycles = interval_cycles
+        self.capacity = capacity
+        self.max_depth = max_depth
+        self._call_graph = call_graph
+        self._event = None
+        self._cycles = array("Q", [0]) * capacity
+        self._pcs = array("H", [0]) * capacity
+        self._sps = array("B", [0]) * capacity
+        self._depths = array("B", [0]) * capacity
+        self._stacks = array("H", [0]) * (capacity * max_depth)
+        self.count = 0  # Samples taken, including the ones overwritten
+
+    @property
+    def attached(self) -> bool:
+        """Property getter for whether sampling is scheduled."""
+        return self._event is not None
+
+    def attach(self) -> "SamplingProfiler":
+        """Start sampling, first sample after interval cycles."""
+        if self._event is not None:
+            raise RuntimeError("Sampling profiler is already attached!")
+        self._event = self._mpu.scheduler.post(
+            self._mpu.elapsed_cycles + self.interval_cycles, self._sample
+        )
+        return self
+
+    def detach(self) -> None:
+        """Stop sampling, samples are kept."""
+        if self._event is not None:
+            self._mpu.scheduler.cancel(self._event)
+            self._event = None
+
+    def __enter__(self) -> "SamplingProfiler":
+        """Attach profiler."""
+        return self.attach()
+
+    def __exit__(self, *args) -> None:
+        """Detach profiler."""
+        self.detach()
+
+    def _sample(self, cycle: int) -> None:
+        """Record sample and schedule the next one (without drift)."""
+        self.record()
+        self._event = self._mpu.scheduler.post(cycle + self.interval_cycles, self._sample)
+
+    def _current_stack(self) -> Sequence[int]:
+        """Return call stack, outermost first."""
+        if self._call_graph is not None:
+            return self._call_graph._stack[-1][_PATH][-self.max_depth :]
+        return unwind_stack(self._mpu, self.max_depth)
+
+    def record(self) -> None:
+        """Record a sample now."""
+        mpu = self._mpu
+        index = self.count % self.capacity
+        stack = self._current_stack()
+        self._cycles[index] = mpu.elapsed_cycles
+        self._pcs[index] = mpu.registers.PC
+        self._sps[index] = mpu.registers.SP
+        self._depths[index] = len(stack)
+        offset = index * self.max_depth
+        self._stacks[offset : offset + len(stack)] = array("H", stack)
+        self.count += 1
+
+    def __len__(self) -> int:
+        """Return number of samples held."""
+        return min(self.count, self.capacity)
+
+    def samples(self) -> List[Sample]:
+        """Return samples held, oldest first."""
+        first = self.count - len(self)
+        samples = []
+        for number in range(first, self.count):
+            index = number % self.capacity
+            offset = index * self.max_depth
+            samples.append(
+                Sample(
+                    self._cycles[index],
+                    self._pcs[index],
+                    self._sps[index],
+                    tuple(self._stacks[offset : offset + self._depths[index]]),
+                )
+            )
+        return samples
+
+    def histogram(self) -> Dict[int, int]:
+        """Return samples per PC."""
+        histogram: Dict[int, int] = {}
+        for pc in self._pcs[: len(self)]:
+            histogram[pc] = histogram.get(pc, 0) + 1
+        return histogram
+
+    def folded(self, symbols: Optional[Dict[int, str]] = None) -> List[str]:
+        """Return folded stacks with sample counts, samples outside any subroutine as root."""
+        symbols = symbols or {}
+        counts: Dict[Tuple[int, ...], int] = {}
+        for sample in self.samples():
+            counts[sample.stack] = counts.get(sample.stack, 0) + 1
+        return [
+            (";".join(symbols.get(address, f"${address:04X}") for address in stack) or "root")
+            + f" {count}"
+            for stack, count in sorted(counts.items())
+        ]
+
+
+@dataclass
+class HandlerTiming:
+    """Host time spent in an opcode handler or in effective address calculation."""
+
+    name: str
+    count: int
+    nanoseconds: int
+    share: float  # Fraction of all handler time, i.e. weighted by the opcode mix
+
+    @property
+    def ns_per_call(self) -> float:
+        """Property getter for mean nanoseconds per call."""
+        return self.nanoseconds / self.count if self.count else 0.0
+
+
+def _timer_overhead_ns(samples: int = 10_000) -> int:
+    """Return mean nanoseconds of an empty perf_counter_ns() pair."""
+    clock = time.perf_counter_ns
+    start = clock()
+    for _ in range(samples):
+        clock()
+        clock()
+    return (clock() - start) // samples
+
+
+def _timed_address_calculation(get_effective_address, mpu, counts, nanoseconds):
+    """Return get_effective_address(mpu, instruction) timed per address mode."""
+    clock = time.perf_counter_ns
+
+    def timed(instruction):
+        start = clock()
+        address = get_effective_address(mpu, instruction)
+        elapsed = clock() - start
+        mode = instruction.address_mode
+        counts[mode] += 1
+        nanoseconds[mode] += elapsed
+        return address
+
+    return timed
+
+
+def _wrapper_overhead_ns(samples: int = 10_000) -> int:
+    """Return mean nanoseconds the address mode timing adds to a call."""
+    instruction = DecodedInstruction(0, 0, 1, "NOP", AddressMode.IMPLIED, None)
+    counts = {mode: 0 for mode in AddressMode}
+    nanoseconds = dict(counts)
+    timed = _timed_address_calculation(lambda mpu, instruction: None, None, counts, nanoseconds)
+
+    def plain(instruction):
+        return None
+
+    clock = time.perf_counter_ns
+    start = clock()
+    for _ in range(samples):
+        plain(instruction)
+    direct = clock() - start
+    start = clock()
+    for _ in range(samples):
+        timed(instruction)
+    return max(0, (clock() - start - direct) // samples)
+
+
+class HandlerTimer(Instrument):
+    """
+    Measure host nanoseconds spent per opcode handler and per address mode.
+
+    Handlers (inst_ADC, ...) are timed between the before and after hooks of the step,
+    which includes effective address calculation. Attach it after other instruments, so
+    their hooks are not timed too. _get_effective_address() is wrapped on the
+    instance and timed per AddressMode. The mean cost of the timer calls themselves and,
+    for every address calculation within a handler, of the wrapper are measured on attach
+    and subtracted.
+    """
+
+    def __init__(self, mpu) -> None:
+        """Initialize timer for mpu (not attached yet)."""
+        super().__init__(mpu)
+        self.counts = array("Q", [0]) * 0x100
+        self.nanoseconds = array("Q", [0]) * 0x100
+        self.mode_counts: Dict[AddressMode, int] = {mode: 0 for mode in AddressMode}
+        self.mode_nanoseconds: Dict[AddressMode, int] = {mode: 0 for mode in AddressMode}
+        # Address calculations timed within the handlers of an opcode
+        self.nested_calls = array("Q", [0]) * 0x100
+        self.overhead_ns = 0
+        self.wrapper_overhead_ns = 0
+
+    def attach(self) -> "HandlerTimer":
+        """Start timing."""
+        if "_get_effective_address" in self._mpu.__dict__:
+            raise RuntimeError("MPU address calculation is already instrumented!")
+        super().attach()
+        self.overhead_ns = _timer_overhead_ns()
+        self.wrapper_overhead_ns = _wrapper_overhead_ns()
+        self._mpu._get_effective_address = _timed_address_calculation(
+            type(self._mpu)._get_effective_address,
+            self._mpu,
+            self.mode_counts,
+            self.mode_nanoseconds,
+        )
+        return self
+
+    def detach(self) -> None:
+        """Stop timing, measurements are kept."""
+        if self.attached:
+            del self._mpu._get_effective_address
+        super().detach()
+
+    def _hooks(self) -> StepHooks:
+        """Return hooks timing the instruction handler."""
+        counts, nanoseconds, nested_calls = self.counts, self.nanoseconds, self.nested_calls
+        mode_counts = self.mode_counts
+        clock = time.perf_counter_ns
+        start = calls = 0
+
+        def before(instruction) -> None:
+            nonlocal start, calls
+            calls = mode_counts[instruction.address_mode]
+            start = clock()
+
+        def after(instruction, cycles: int) -> None:
+            elapsed = clock() - start
+            opcode = instruction.opcode
+            counts[opcode] += 1
+            nanoseconds[opcode] += elapsed
+            nested_calls[opcode] += mode_counts[instruction.address_mode] - calls
+
+        return StepHooks(before=before, after=after)
+
+    def clear(self) -> None:
+        """Reset all measurements."""
+        self.counts[:] = array("Q", [0]) * 0x100
+        self.nanoseconds[:] = array("Q", [0]) * 0x100
+        self.nested_calls[:] = array("Q", [0]) * 0x100
+        for mode in AddressMode:
+            self.mode_counts[mode] = self.mode_nanoseconds[mode] = 0
+
+    def _timings(self, items) -> List[HandlerTiming]:
+        """Return timings (name, count, raw ns, overhead ns) corrected, most time first."""
+        timings = [
+            HandlerTiming(name, count, max(0, raw - count * self.overhead_ns - overhead), 0.0)
+            for name, count, raw, overhead in items
+            if count
+        ]
+        total = sum(timing.nanoseconds for timing in timings) or 1
+        for timing in timings:
+            timing.share = timing.nanoseconds / total
+        timings.sort(key=lambda timing: (-timing.nanoseconds, timing.name))
+        return timings
+
+    def opcodes(self) -> List[HandlerTiming]:
+        """Return timings per executed opcode, most total time first."""
+        instructions = self._mpu._instructions
+        return self._timings(
+            (
+                f"{opcode:02X} {instructions[opcode].mnemonic} "
+                f"{instructions[opcode].address_mode.name}",
+                self.counts[opcode],
+                self.nanoseconds[opcode],
+                self.nested_calls[opcode] * self.wrapper_overhead_ns,
+            )
+            for opcode in range(0x100)
+        )
+
+    def address_modes(self) -> List[HandlerTiming]:
+        """Return effective address calculation timings per address mode."""
+        return self._timings(
+            (mode.name, self.mode_counts[mode], self.mode_nanoseconds[mode], 0)
+            for mode in AddressMode
+        )
+
+    def report(self) -> str:
+        """Return table of ns per call by opcode and by address mode."""
+        lines = []
+        for title, timings in (("opcode", self.opcodes()), ("address mode", self.address_modes())):
+            lines.append(f"{title:<24} {'calls':>12} {'ns/call':>10} {'share':>7}")
+            for timing in timings:
+                lines.append(
+                    f"{timing.name:<24} {timing.count:>12,} {timing.ns_per_call:>10.0f} "
+                    f"{timing.share:>7.1%}"
+                )
+            lines.append("")
+        return "\n".join(lines)
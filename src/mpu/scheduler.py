@@ -0,0 +1,85 @@
+"""Cycle scheduled event queue."""
+import heapq
+from itertools import count
+from typing import Callable, List, Optional, Tuple
+
+
+class Event:
+    """Single scheduled event, returned by Scheduler.post() for cancellation."""
+
+    __slots__ = ("cycle", "callback", "cancelled")
+
+    def __init__(self, cycle: int, callback: Callable[[int], None]) -> None:
+        """Initialize event."""
+        self.cycle = cycle
+        self.callback = callback
+        self.cancelled = False
+
+    def __repr__(self) -> str:
+        """Return string representation."""
+        return f"Event(cycle={self.cycle}, callback={self.callback!r}, cancelled={self.cancelled})"
+
+
+class Scheduler:
+    """
+    Heap of future events keyed on elapsed cycles.
+
+    Devices post events (timer expiry, IRQ assertion, ...) for a future cycle. The MPU run
+    loop executes uninterrupted until the next event is due and dispatches it at that
+    instruction boundary, so the cost scales with the number of events, not with the
+    number of instructions.
+    """
+
+    def __init__(self) -> None:
+        """Initialize empty queue."""
+        self._queue: List[Tuple[int, int, Event]] = []
+        self._sequence = count()
+
+    def __len__(self) -> int:
+        """Return number of queued events (incl. cancelled ones not yet dropped)."""
+        return len(self._queue)
+
+    @property
+    def next_cycle(self) -> Optional[int]:
+        """Property getter for cycle of next due event, None if queue is empty."""
+        queue = self._queue
+        while queue and queue[0][2].cancelled:
+            heapq.heappop(queue)
+        return queue[0][0] if queue else None
+
+    def post(self, cycle: int, callback: Callable[[int], None]) -> Event:
+        """Schedule callback(cycle) to be called once cycle has been reached."""
+        event = Event(cycle, callback)
+        # Sequence number keeps events of the same cycle in posting order
+        heapq.heappush(self._queue, (cycle, next(self._sequence), event))
+        return event
+
+    def cancel(self, event: Event) -> None:
+        """Cancel a posted event. It is dropped lazily."""
+        event.cancelled = True
+
+    def dispatch(self, cycle: int) -> int:
+        """Call all events due at or before cycle, return number of events called."""
+        queue = self._queue
+        dispatched = 0
+        while queue and queue[0][0] <= cycle:
+            _, _, event = heapq.heappop(queue)
+            if not event.cancelled:
+                event.callback(event.cycle)
+                dispatched += 1
+        return dispatched
+
+    def snapshot(self) -> List[Tuple[Tuple[int, int, Event], bool]]:
+        """Return queued events and their cancellation state for restore()."""
+        return [(entry, entry[2].cancelled) for entry in self._queue]
+
+    def restore(self, snapshot: List[Tuple[Tuple[int, int, Event], bool]]) -> None:
+        """Return queue to a snapshot, events dispatched since are queued again."""
+        # The snapshot keeps the heap order of the queue it was taken from
+        self._queue[:] = [entry for entry, _ in snapshot]
+        for entry, cancelled in snapshot:
+            entry[2].cancelled = cancelled
+
+    def clear(self) -> None:
+        """Drop all events."""
+        self._queue.clear()
@@ -0,0 +1,172 @@
+"""MPU memory in shared memory for zero-copy observers in other processes."""
+import os
+import struct
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional, Set, Tuple
+from .bus import MemoryBus, MEMORY_SIZE, PAGE_COUNT, PAGE_SIZE, PAGE_RAM, PAGE_EXTERNAL
+from .scheduler import Event
+from .utils import Registers
+
+# Shared block layout: header followed by 64 KB of memory
+#
+# Header: magic, sequence, elapsed cycles, PC, A, X, Y, SP, FLAGS. The sequence is odd
+# while the header is being written (seqlock), readers retry until they see the same even
+# value before and after reading.
+_MAGIC = b"M65S"
+_HEADER = struct.Struct("<4sIQHBBBBB")
+_SEQUENCE = struct.Struct("<I")
+HEADER_SIZE = 64
+
+
+# Names of blocks created by this process (or its forked parent), tracked by their creator
+_CREATED: Set[str] = set()
+
+
+def _open(name: str) -> shared_memory.SharedMemory:
+    """Attach to an existing block without handing it to this process' resource tracker."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13
+        shm = shared_memory.SharedMemory(name=name)
+    # Attaching registered the block, the tracker would unlink it when this process exits.
+    # Blocks created here share the registration of their creator and must keep it.
+    if os.name == "posix" and shm.name not in _CREATED:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+class SharedMemoryBus(MemoryBus):
+    """
+    Memory bus whose RAM pages live in a multiprocessing.shared_memory block.
+
+    Other processes attach with SharedMemoryView(name) and read memory without copying.
+    Clones get private copies of all shared pages.
+    Registers and elapsed cycles are published to the header by publish(), either
+    explicitly or every interval cycles via start_publishing().
+    """
+
+    def __init__(self, name: Optional[str] = None, data=None) -> None:
+        """Create shared block (named or anonymous), optionally with initial content."""
+        self._shm = shared_memory.SharedMemory(
+            name=name, create=True, size=HEADER_SIZE + MEMORY_SIZE
+        )
+        _CREATED.add(self._shm.name)
+        buffer = self._shm.buf
+        buffer[:HEADER_SIZE] = bytes(HEADER_SIZE)
+        _HEADER.pack_into(buffer, 0, _MAGIC, 0, 0, 0, 0, 0, 0, 0, 0)
+        self._pages = [
+            buffer[HEADER_SIZE + page * PAGE_SIZE : HEADER_SIZE + (page + 1) * PAGE_SIZE]
+            for page in range(PAGE_COUNT)
+        ]
+        self._modes = bytearray([PAGE_EXTERNAL]) * PAGE_COUNT
+        self._init_rom_pages()
+        self._sequence = 0
+        # Callback of start_publishing() and its MPU and next event, see stop_publishing()
+        self._publisher = None
+        self._publish_event: Optional[Tuple[object, Event]] = None
+        if data is not None:
+            if len(data) != MEMORY_SIZE:
+                raise ValueError(f"Invalid memory size {len(data)}")
+            buffer[HEADER_SIZE:] = bytes(data)
+
+    @property
+    def name(self) -> str:
+        """Property getter for name of the shared block."""
+        return self._shm.name
+
+    def publish(self, mpu) -> None:
+        """Write registers and elapsed cycles of mpu to the header."""
+        registers = mpu.registers
+        buffer = self._shm.buf
+        self._sequence += 1
+        _SEQUENCE.pack_into(buffer, 4, self._sequence & 0xFFFFFFFF)
+        _HEADER.pack_into(
+            buffer,
+            0,
+            _MAGIC,
+            self._sequence & 0xFFFFFFFF,
+            mpu.elapsed_cycles,
+            registers.PC,
+            registers.A,
+            registers.X,
+            registers.Y,
+            registers.SP,
+            registers.FLAGS & 0xFF,
+        )
+        self._sequence += 1
+        _SEQUENCE.pack_into(buffer, 4, self._sequence & 0xFFFFFFFF)
+
+    def start_publishing(self, mpu, interval_cycles: int = 10_000) -> None:
+        """Publish now and then every interval_cycles through the MPU scheduler."""
+        self.stop_publishing()
+
+        def publish(cycle: int) -> None:
+            # Events restored by a transaction rollback may outlive stop_publishing()
+            if self._publisher is not publish:
+                return
+            self.publish(mpu)
+            self._publish_event = (mpu, mpu.scheduler.post(cycle + interval_cycles, publish))
+
+        self._publisher = publish
+        publish(mpu.elapsed_cycles)
+
+    def stop_publishing(self) -> None:
+        """Stop publishing started by start_publishing()."""
+        if self._publish_event is not None:
+            mpu, event = self._publish_event
+            mpu.scheduler.cancel(event)
+        self._publisher = None
+        self._publish_event = None
+
+    def close(self, unlink: bool = True) -> None:
+        """Stop publishing and release the shared block (and remove it unless unlink is False)."""
+        self.stop_publishing()
+        for page in self._pages:
+            if isinstance(page, memoryview):
+                page.release()
+        for page in range(PAGE_COUNT):
+            self._set_page(page, bytearray(PAGE_SIZE), PAGE_RAM)
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
+
+
+class SharedMemoryView:
+    """Read-only observer of a SharedMemoryBus, usually in another process."""
+
+    def __init__(self, name: str) -> None:
+        """Attach to shared block by name."""
+        self._shm = _open(name)
+        if bytes(self._shm.buf[:4]) != _MAGIC:
+            self._shm.close()
+            raise ValueError(f"{name} is not a shared MPU memory block!")
+        self._memory = self._shm.buf[HEADER_SIZE : HEADER_SIZE + MEMORY_SIZE].toreadonly()
+
+    @property
+    def memory(self) -> memoryview:
+        """Property getter for read-only view on the 64 KB memory."""
+        return self._memory
+
+    def numpy(self):
+        """Return read-only NumPy uint8 array on memory (requires numpy)."""
+        import numpy
+
+        array = numpy.frombuffer(self._memory, dtype=numpy.uint8)
+        array.flags.writeable = False
+        return array
+
+    def registers(self) -> Tuple[Registers, int]:
+        """Return consistent snapshot of last published registers and elapsed cycles."""
+        buffer = self._shm.buf
+        while True:
+            before = _SEQUENCE.unpack_from(buffer, 4)[0]
+            if before & 1:
+                continue
+            _, _, cycles, pc, a, x, y, sp, flags = _HEADER.unpack_from(buffer, 0)
+            if _SEQUENCE.unpack_from(buffer, 4)[0] == before:
+                return Registers(A=a, X=x, Y=y, FLAGS=flags, PC=pc, SP=sp), cycles
+
+    def close(self) -> None:
+        """Detach from shared block."""
+        self._memory.release()
+        self._shm.close()
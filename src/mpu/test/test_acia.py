@@ -0,0 +1,127 @@
+"""Test 6551 ACIA and asyncio execution."""
+import asyncio
+import pytest
+from mpu.acia import ACIA, STATUS_RDRF, STATUS_TDRE
+from mpu.bus import MemoryBus
+from mpu.utils import StopReason
+from utils import write_memory
+from mpu.mpu6502 import MPU
+
+ACIA_BASE = 0x6000
+
+
+class Writer:
+    """Minimal asyncio stream writer collecting data."""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+
+@pytest.fixture
+def echo_mpu() -> MPU:
+    """MPU polling the ACIA at $6000 and echoing every received byte."""
+    mpu = MPU(memory=MemoryBus(), pc=0x1000)
+    mpu.acia = ACIA(mpu)
+    mpu._memory.map_device(ACIA_BASE, mpu.acia)
+    write_memory(
+        mpu._memory,
+        0x1000,
+        (
+            0xAD, 0x01, 0x60,   # 1000: LDA $6001
+            0x29, 0x08,         # 1003: AND #$08
+            0xF0, 0xF9,         # 1005: BEQ -$07
+            0xAD, 0x00, 0x60,   # 1007: LDA $6000
+            0x8D, 0x00, 0x60,   # 100A: STA $6000
+            0x4C, 0x00, 0x10,   # 100D: JMP $1000
+        ),
+    )  # fmt: skip
+    return mpu
+
+
+def test_registers(echo_mpu: MPU):
+    """Test status and data registers."""
+    memory = echo_mpu._memory
+    assert memory[ACIA_BASE + 1] == STATUS_TDRE
+    echo_mpu.acia.feed(b"A")
+    assert memory[ACIA_BASE + 1] == STATUS_TDRE | STATUS_RDRF
+    assert memory[ACIA_BASE] == ord("A")
+    assert memory[ACIA_BASE + 1] == STATUS_TDRE
+
+
+def test_receive_irq(echo_mpu: MPU):
+    """Test receiver interrupt follows command register and queue."""
+    memory = echo_mpu._memory
+    echo_mpu.acia.feed(b"AB")
+    assert echo_mpu._pending_interrupts == 0, "IRQ while DTR off."
+    memory[ACIA_BASE + 2] = 0x01  # DTR on, receiver IRQ enabled
+    assert echo_mpu._pending_interrupts == MPU.INTERRUPT_IRQ
+    memory[ACIA_BASE]
+    memory[ACIA_BASE]
+    assert echo_mpu._pending_interrupts == 0
+
+
+def test_echo(echo_mpu: MPU):
+    """Test echo program run synchronously."""
+    echo_mpu.acia.feed(b"hello")
+    echo_mpu.run(500)
+    assert echo_mpu.acia.transmitted() == b"hello"
+
+
+def test_run_async_echo(echo_mpu: MPU):
+    """Test async run with ACIA connected to asyncio streams."""
+
+    async def main():
+        reader = asyncio.StreamReader()
+        writer = Writer()
+        reader.feed_data(b"hi ")
+        receiver = asyncio.create_task(echo_mpu.acia.receive_from(reader))
+        sender = asyncio.create_task(echo_mpu.acia.send_to(writer))
+        await echo_mpu.run_async(cycles=2_000, slice_cycles=100)
+        assert writer.data == b"hi "
+        reader.feed_data(b"there")
+        reader.feed_eof()
+        reason = await echo_mpu.run_async(cycles=2_000, slice_cycles=100)
+        await receiver
+        sender.cancel()
+        await asyncio.gather(sender, return_exceptions=True)
+        return reason, bytes(writer.data)
+
+    reason, data = asyncio.run(main())
+    assert reason == StopReason.CYCLES
+    assert data == b"hi there"
+
+
+def test_run_async_yields(echo_mpu: MPU):
+    """Test async run yields to other tasks between slices."""
+
+    async def main():
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(echo_mpu.elapsed_cycles)
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(ticker())
+        await echo_mpu.run_async(cycles=1_000, slice_cycles=100)
+        task.cancel()
+        return ticks
+
+    assert len(asyncio.run(main())) >= 9
+
+
+def test_clone(echo_mpu: MPU):
+    """Test a cloned MPU gets its own ACIA with a copy of the receive queue."""
+    echo_mpu.acia.feed(b"AB")
+    other = echo_mpu.clone()
+    other.run(200)
+    assert other._memory._pages[ACIA_BASE >> 8].transmitted() == b"AB"
+    assert echo_mpu.acia.transmitted() == b""
+    echo_mpu.run(200)
+    assert echo_mpu.acia.transmitted() == b"AB"
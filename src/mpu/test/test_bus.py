@@ -0,0 +1,197 @@
+"""Test memory bus."""
+import pytest
+from mpu.bus import MemoryBus
+from utils import write_memory
+from mpu.mpu6502 import MPU
+
+
+@pytest.fixture
+def bus_mpu() -> MPU:
+    """MPU with a memory bus."""
+    return MPU(memory=MemoryBus(), pc=0)
+
+
+def test_bus_read_write():
+    """Test byte and slice access."""
+    bus = MemoryBus()
+    assert len(bus) == 0x10000
+    bus[0x1234] = 0x56
+    assert bus[0x1234] == 0x56
+    # Slice across page boundary
+    write_memory(bus, 0x10FE, (0x01, 0x02, 0x03, 0x04))
+    assert bus[0x10FD:0x1103] == [0x00, 0x01, 0x02, 0x03, 0x04, 0x00]
+
+
+def test_bus_initial_data():
+    """Test initialization from 64 KB of data."""
+    data = bytearray(0x10000)
+    data[0xFFFC] = 0x12
+    assert MemoryBus(data)[0xFFFC] == 0x12
+    with pytest.raises(ValueError):
+        MemoryBus(bytes(0x100))
+
+
+def test_bus_clone_copy_on_write():
+    """Test cloned buses share pages until written."""
+    bus = MemoryBus()
+    bus[0x1000] = 0x11
+    other = bus.clone()
+    assert other._pages[0x10] is bus._pages[0x10]
+
+    other[0x1000] = 0x22
+    assert bus[0x1000] == 0x11, "Write leaked into parent."
+    assert other[0x1000] == 0x22
+    assert other._pages[0x10] is not bus._pages[0x10]
+    assert other._pages[0x11] is bus._pages[0x11], "Untouched page copied."
+
+    bus[0x1100] = 0x33
+    assert other[0x1100] == 0x00, "Write leaked into clone."
+
+
+def test_mpu_clone(bus_mpu: MPU):
+    """Test MPU clone runs independently."""
+    write_memory(bus_mpu._memory, 0x1000, (0xE8, 0x8E, 0x00, 0x20))  # INX, STX $2000
+    bus_mpu.registers.PC = 0x1000
+    bus_mpu.step()
+    other = bus_mpu.clone()
+    assert other.registers == bus_mpu.registers
+    assert other.registers is not bus_mpu.registers
+    assert other.elapsed_cycles == 2
+
+    other.registers.X = 0x41
+    other.step()
+    assert other._memory[0x2000] == 0x41
+    assert bus_mpu._memory[0x2000] == 0x00
+    bus_mpu.step()
+    assert bus_mpu._memory[0x2000] == 0x01
+    assert other._memory[0x2000] == 0x41
+
+
+def test_mpu_clone_requires_bus():
+    """Test clone of list backed MPU."""
+    with pytest.raises(TypeError):
+        MPU(memory=[0x00] * 0x10000).clone()
+
+
+@pytest.fixture
+def rom_file(tmp_path):
+    """32 KB ROM image with reset vector $8000."""
+    data = bytearray(0x8000)
+    data[0x0000:0x0002] = (0xA9, 0x42)  # 8000: LDA #$42
+    data[0x7FFC:0x7FFE] = (0x00, 0x80)
+    path = tmp_path / "rom.bin"
+    path.write_bytes(bytes(data))
+    return path
+
+
+def test_map_rom_file(rom_file):
+    """Test ROM mapping is read-only."""
+    bus = MemoryBus()
+    region = bus.map_file(0x8000, str(rom_file))
+    assert list(region.pages) == list(range(0x80, 0x100))
+    assert bus[0xFFFC] == 0x00 and bus[0xFFFD] == 0x80
+    bus[0x8000] = 0x00
+    write_memory(bus, 0x7FFF, (0x11, 0x22))
+    assert bus[0x8000] == 0xA9, "ROM written."
+    assert bus[0x7FFF] == 0x11
+    mpu = MPU(memory=bus, pc=0x8000)
+    mpu.step()
+    assert mpu.registers.A == 0x42
+    region.close()
+    assert bus[0x8000] == 0x00
+    assert rom_file.read_bytes()[0] == 0xA9
+
+
+def test_map_nvram_file(tmp_path):
+    """Test NVRAM writes end up in the file."""
+    path = tmp_path / "nvram.bin"
+    path.write_bytes(bytes(0x200))
+    bus = MemoryBus()
+    region = bus.map_file(0x6000, str(path), writable=True)
+    bus[0x6001] = 0x55
+    write_memory(bus, 0x60FF, (0x66, 0x77))
+    other = bus.clone()
+    other[0x6001] = 0x99
+    assert bus[0x6001] == 0x55, "Clone wrote to NVRAM."
+    bus[0x6002] = 0x88
+    assert other[0x6002] == 0x00, "Clone sees NVRAM writes."
+    region.flush()
+    assert path.read_bytes()[0:3] == bytes((0x00, 0x55, 0x88))
+    region.close()
+    assert path.read_bytes()[0xFF:0x101] == bytes((0x66, 0x77))
+
+
+def test_map_file_invalid(tmp_path):
+    """Test size and alignment checks."""
+    path = tmp_path / "odd.bin"
+    path.write_bytes(bytes(0x101))
+    with pytest.raises(ValueError):
+        MemoryBus().map_file(0x8000, str(path))
+    with pytest.raises(ValueError):
+        MemoryBus().map_file(0x8001, str(path))
+
+
+def test_map_rom_shared():
+    """Test identical ROM pages are shared between buses."""
+    rom = bytes(range(256)) * 2 + bytes(256)
+    first, second = MemoryBus(), MemoryBus()
+    first.map_rom(0xE000, rom)
+    second.map_rom(0xF000, rom)
+    assert first._pages[0xE0] is second._pages[0xF0]
+    assert first._pages[0xE1] is not first._pages[0xE2]
+    assert first._decoded[0xE0] is second._decoded[0xF0]
+    assert first[0xE0FF] == 0xFF
+    first[0xE000] = 0x12
+    assert first[0xE000] == 0x00, "ROM written."
+    assert first.clone()._pages[0xE0] is first._pages[0xE0]
+    with pytest.raises(ValueError):
+        first.map_rom(0xE000, bytes(0x80))
+
+
+def test_map_rom_released():
+    """Test ROM pages vanish once no bus maps them."""
+    from mpu.bus import _ROM_PAGES
+
+    rom = bytes([0x5A]) * 256
+    bus = MemoryBus()
+    bus.map_rom(0xF000, rom)
+    assert any(page.data == rom for page in _ROM_PAGES.values())
+    bus.map_device(0xF000, bytearray(256))
+    del bus
+    assert not any(page.data == rom for page in _ROM_PAGES.values())
+
+
+def test_rom_decode_cache_shared():
+    """Test decoded ROM instructions are cached once for all MPUs."""
+    rom = bytearray(256)
+    rom[0x00:0x02] = (0xA9, 0x42)  # F000: LDA #$42
+    rom[0xFE:0x100] = (0xA9, 0x43)  # F0FE: LDA #$43 (fits into page)
+    first = MPU(memory=MemoryBus(), pc=0xF000)
+    second = MPU(memory=MemoryBus(), pc=0xF000)
+    first._memory.map_rom(0xF000, bytes(rom))
+    second._memory.map_rom(0xF000, bytes(rom))
+    first.step()
+    cache = second._memory._decoded[0xF0]
+    assert cache[0x00] is not None, "Decode not cached."
+    second.step()
+    assert second.registers.A == 0x42
+    assert str(second.decode(0xF0FE)) == "F0FE: LDA #$43"
+    assert cache[0xFE] is not None
+    # RAM is never cached
+    write_memory(first._memory, 0x1000, (0xA9, 0x01))
+    first.registers.PC = 0x1000
+    first.step()
+    write_memory(first._memory, 0x1000, (0xA9, 0x02))
+    first.registers.PC = 0x1000
+    first.step()
+    assert first.registers.A == 0x02
+
+
+def test_clone_devices():
+    """Test devices without clone() can not be cloned with their bus."""
+    mpu = MPU(memory=MemoryBus(), pc=0)
+    mpu._memory.map_device(0xF000, bytearray(256))
+    with pytest.raises(TypeError):
+        mpu._memory.clone()
+    with pytest.raises(TypeError):
+        mpu.clone()
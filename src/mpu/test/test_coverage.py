@@ -0,0 +1,100 @@
+"""Test code coverage."""
+import pytest
+from fixtures import *  # noqa
+from mpu.coverage import Coverage
+from utils import write_memory
+from mpu.mpu6502 import MPU
+
+# 1000: LDX #$03
+# 1002: DEX
+# 1003: BNE $1002
+# 1005: BEQ $1009
+# 1007: NOP
+# 1008: NOP
+# 1009: JMP $1009
+LOOP = (0xA2, 0x03, 0xCA, 0xD0, 0xFD, 0xF0, 0x02, 0xEA, 0xEA, 0x4C, 0x09, 0x10)
+
+
+def make_mpu() -> MPU:
+    """Create MPU with LOOP at $1000."""
+    mpu = MPU(memory=[0x00] * (0xFFFF + 1), pc=0x1000)
+    write_memory(mpu._memory, 0x1000, LOOP)
+    return mpu
+
+
+def test_executed_and_branches():
+    """Test instruction lengths and branch outcomes are marked."""
+    mpu = make_mpu()
+    with Coverage(mpu) as coverage:
+        assert coverage.attached
+        for _ in range(1 + 3 + 3 + 1 + 2):
+            mpu.step()
+    assert "step" not in mpu.__dict__
+    assert mpu.registers.PC == 0x1009
+    assert coverage.addresses() == [0x1000, 0x1002, 0x1003, 0x1005, 0x1009]
+    assert coverage.executed[0x1000] == 2
+    assert coverage.executed[0x1002] == 1
+    assert coverage.executed[0x1009] == 3
+    branches = coverage.branches()
+    assert [branch.address for branch in branches] == [0x1003, 0x1005]
+    assert branches[0].instruction == "BNE -$03"
+    assert branches[0].taken and branches[0].not_taken and branches[0].complete
+    assert branches[1].taken and not branches[1].not_taken and not branches[1].complete
+
+
+def test_ranges_and_report():
+    """Test covered bytes are mapped to disassembly ranges."""
+    mpu = make_mpu()
+    with Coverage(mpu) as coverage:
+        for _ in range(10):
+            mpu.step()
+    ranges = coverage.ranges()
+    assert [(item.start, item.end) for item in ranges] == [(0x1000, 0x1006), (0x1009, 0x100B)]
+    assert ranges[0].lines[0] == "1000: LDX #$03"
+    assert ranges[0].lines[2].startswith("1003: BNE -$03")
+    assert ranges[0].lines[2].endswith("; taken, not taken")
+    assert ranges[0].lines[3].endswith("; taken")
+    assert coverage.covered_bytes() == 10
+    assert coverage.covered_bytes(0x1003, 0x1005) == 4
+    assert [(item.start, item.end) for item in coverage.ranges(0x1009, 0xFFFF)] == [
+        (0x1009, 0x100B)
+    ]
+    report = coverage.report().splitlines()
+    assert report[0] == "5 instructions, 10 bytes covered in 2 ranges, 1 of 2 branches both ways"
+    assert "1000-1006 (7 bytes)" in report
+    assert "  1009: JMP $1009" in report
+    # Lengths come from execution, the report disassembles current memory
+    mpu._memory[0x1000] = 0xEA
+    assert coverage.covered_bytes() == 10
+
+
+def test_run_interrupts_and_merge():
+    """Test coverage via run(), interrupt entries and merging of test cases."""
+    mpu = make_mpu()
+    write_memory(mpu._memory, mpu.MEM_VECTOR_IRQ_BRK, (0x07, 0x10))
+    coverage = Coverage(mpu).attach()
+    mpu.set_irq(True)
+    mpu.run(20)
+    coverage.detach()
+    assert coverage.addresses() == [0x1007, 0x1008, 0x1009]
+    assert not any(coverage.taken) and not any(coverage.not_taken)
+
+    other = Coverage(make_mpu())
+    with other:
+        for _ in range(5):
+            other._mpu.step()
+    coverage.merge(other)
+    assert coverage.addresses() == [0x1000, 0x1002, 0x1003, 0x1007, 0x1008, 0x1009]
+    assert coverage.executed[0x1000] == other.executed[0x1000] == 2
+    assert coverage.taken[0x1003] and not coverage.not_taken[0x1003]
+    coverage.clear()
+    assert coverage.addresses() == []
+
+
+def test_attach_twice():
+    """Test coverage is attached once."""
+    mpu = make_mpu()
+    with Coverage(mpu) as coverage:
+        with pytest.raises(RuntimeError):
+            coverage.attach()
+    assert "step" not in mpu.__dict__
@@ -0,0 +1,83 @@
+"""Test fork server."""
+import os
+import pytest
+from mpu.bus import MemoryBus
+from mpu.forkserver import ForkServer
+from mpu.via import VIA
+from mpu.utils import StopReason
+from utils import write_memory
+from fixtures import *  # noqa
+from mpu.mpu6502 import MPU
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="Requires os.fork()")
+
+
+@pytest.fixture
+def server(mpu: MPU) -> ForkServer:
+    """Fork server warmed up to $1004."""
+    write_memory(
+        mpu._memory,
+        0x1000,
+        (
+            0xA2, 0x05,         # 1000: LDX #$05
+            0xCA,               # 1002: DEX
+            0xEA,               # 1003: NOP
+            0xAD, 0x00, 0x20,   # 1004: LDA $2000
+            0xF0, 0x01,         # 1007: BEQ $01
+            0xFF,               # 1009: ???
+            0x4C, 0x0A, 0x10,   # 100A: JMP $100A
+        ),
+    )  # fmt: skip
+    mpu.registers.PC = 0x1000
+    server = ForkServer(mpu, input_address=0x2000)
+    assert server.warm_up(0x1004, 100)
+    return server
+
+
+def test_warm_up_budget(mpu: MPU):
+    """Test warm up gives up after max_cycles."""
+    write_memory(mpu._memory, 0x1000, (0x4C, 0x00, 0x10))  # 1000: JMP $1000
+    mpu.registers.PC = 0x1000
+    assert not ForkServer(mpu, 0x2000).warm_up(0x2000, 30)
+
+
+def test_run_cases(server: ForkServer):
+    """Test different inputs reach different outcomes."""
+    result = server.run(b"\x00", 100)
+    assert result.stop_reason == StopReason.CYCLES
+    assert list(result.coverage) == [0x1004, 0x1007, 0x100A]
+
+    result = server.run(b"\x01", 100)
+    assert result.stop_reason == StopReason.NOT_IMPLEMENTED
+    assert list(result.coverage) == [0x1004, 0x1007, 0x1009]
+    assert not result.crashed
+
+
+def test_parent_untouched(server: ForkServer):
+    """Test cases do not modify the warm MPU."""
+    cycles = server.mpu.elapsed_cycles
+    server.run(b"\x01", 100)
+    assert server.mpu._memory[0x2000] == 0x00
+    assert server.mpu.registers.PC == 0x1004
+    assert server.mpu.elapsed_cycles == cycles
+
+
+def test_scheduled_events():
+    """Test device events (VIA T1 IRQ) fire during warm up and test cases."""
+    mpu = MPU(memory=MemoryBus(), pc=0x1000)
+    via = VIA(mpu)
+    mpu._memory.map_device(0x6000, via)
+    write_memory(mpu._memory, MPU.MEM_VECTOR_IRQ_BRK, (0x00, 0x30))
+    write_memory(mpu._memory, 0x1000, (0x4C, 0x00, 0x10))  # 1000: JMP $1000
+    write_memory(mpu._memory, 0x3000, (0x4C, 0x00, 0x30))  # 3000: JMP $3000
+    mpu._memory[0x600E] = 0xC0  # IER: enable T1
+    mpu._memory[0x6004] = 50
+    mpu._memory[0x6005] = 0  # T1 = 50, starts
+    server = ForkServer(mpu, input_address=0x2000)
+
+    result = server.run(b"\x00", 200)
+    assert result.stop_reason == StopReason.CYCLES
+    assert list(result.coverage) == [0x1000, 0x3000]
+
+    assert server.warm_up(0x3000, 200)
+    assert mpu.elapsed_cycles > 50
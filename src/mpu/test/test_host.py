@@ -0,0 +1,125 @@
+"""Test round-robin multi-instance host."""
+from mpu.host import Host, MachineState, idle_loop_cycles
+from mpu.utils import Flag, StopReason
+from utils import write_memory
+from mpu.mpu6502 import MPU
+
+
+def make_mpu(program) -> MPU:
+    """Create MPU with program at $1000."""
+    mpu = MPU(memory=[0x00] * (0xFFFF + 1), pc=0x1000)
+    write_memory(mpu._memory, 0x1000, program)
+    return mpu
+
+
+BUSY = (0xE8, 0x4C, 0x00, 0x10)  # 1000: INX, 1001: JMP $1000
+IDLE = (0x4C, 0x00, 0x10)  # 1000: JMP $1000
+HALT = (0xEA, 0xFF)  # 1000: NOP, 1001: ???
+
+
+def test_idle_loop_detection():
+    """Test JMP and taken branches to themselves."""
+    assert idle_loop_cycles(make_mpu(IDLE)) == 3
+    assert idle_loop_cycles(make_mpu(BUSY)) is None
+    mpu = make_mpu((0xD0, 0xFE))  # 1000: BNE $1000
+    assert idle_loop_cycles(mpu) == 3
+    mpu.registers.set_flag(Flag.ZERO)
+    assert idle_loop_cycles(mpu) is None, "Branch not taken is no loop."
+
+
+def test_fair_share():
+    """Test machines get the same cycles despite different instruction lengths."""
+    host = Host(quantum_cycles=100)
+    first = host.add(make_mpu(BUSY))
+    second = host.add(make_mpu((0xEA, 0xEA, 0xE8, 0x4C, 0x00, 0x10)))
+    host.run(50)
+    assert abs(first.cycles - 5000) < 5
+    assert abs(second.cycles - 5000) < 5
+    assert first.slices == second.slices == 50
+    stats = host.stats()
+    assert stats.cycles == first.cycles + second.cycles
+    assert stats.max_lag < 5, "Overshoot is no lag."
+
+
+def test_lag():
+    """Test a machine added late lags behind the others."""
+    host = Host(quantum_cycles=100)
+    first = host.add(make_mpu(BUSY))
+    host.run(10)
+    second = host.add(make_mpu(BUSY))
+    parked = host.add(make_mpu(IDLE))
+    host.run(10)
+    stats = host.stats()
+    assert parked.state == MachineState.IDLE
+    assert stats.lags[0] == 0
+    assert stats.lags[1] == first.cycles - second.cycles
+    assert 995 <= stats.max_lag <= 1005
+    assert stats.lags[2] == 0, "Parked machine lags."
+    assert stats.mean_lag == stats.max_lag / 2
+
+
+def test_budget():
+    """Test cycle budget finishes a machine."""
+    host = Host(quantum_cycles=100)
+    machine = host.add(make_mpu(BUSY), budget=250)
+    host.run(5)
+    assert machine.state == MachineState.FINISHED
+    assert 250 <= machine.cycles < 255
+    assert machine.slices == 3
+
+
+def test_budget_idle():
+    """Test cycles fast-forwarded while idle are charged against the budget."""
+    host = Host(quantum_cycles=100)
+    machine = host.add(make_mpu(IDLE), budget=1000)
+    mpu = machine.mpu
+    host.run(1)
+    assert machine.state == MachineState.IDLE
+    mpu.scheduler.post(600, lambda cycle: None)
+    host.run(1)
+    assert machine.skipped_cycles > 0
+    assert machine.cycles + machine.skipped_cycles <= 1000
+    mpu.scheduler.post(100_000, lambda cycle: None)
+    host.run(5)
+    assert machine.state == MachineState.FINISHED
+    assert 1000 <= mpu.elapsed_cycles < 1003
+    assert machine.remaining <= 0
+
+
+def test_park_halted():
+    """Test halted machines park until woken."""
+    host = Host(quantum_cycles=100)
+    machine = host.add(make_mpu(HALT))
+    host.run(3)
+    assert machine.state == MachineState.HALTED
+    assert machine.stop_reason == StopReason.NOT_IMPLEMENTED
+    assert machine.slices == 1
+    machine.mpu.registers.PC = 0x1000
+    host.wake(machine)
+    host.run(1)
+    assert machine.slices == 2
+
+
+def test_park_idle():
+    """Test idle machines skip slices and wake on interrupts and events."""
+    host = Host(quantum_cycles=100)
+    machine = host.add(make_mpu(IDLE))
+    mpu = machine.mpu
+    write_memory(mpu._memory, MPU.MEM_VECTOR_IRQ_BRK, (0x00, 0x20))
+    host.run(5)
+    assert machine.state == MachineState.IDLE
+    assert machine.slices == 1
+    assert host.stats().idle == 1
+
+    # Event far ahead: fast-forward instead of spinning
+    fired = []
+    mpu.scheduler.post(100_000, fired.append)
+    host.run(1)
+    assert fired == [100_000]
+    assert machine.skipped_cycles >= 99_000
+    assert machine.slices == 2
+
+    mpu.set_irq(True)
+    host.run(1)
+    assert machine.state == MachineState.RUNNING
+    assert mpu.registers.PC != 0x1000
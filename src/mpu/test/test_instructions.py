@@ -0,0 +1,37 @@
+"""Test instruction table."""
+import threading
+import pytest
+from fixtures import *  # noqa
+from mpu.mpu6502 import MPU
+
+
+def test_instruction_table_immutable():
+    """Test instruction table is frozen after import."""
+    assert isinstance(MPU._instructions, tuple)
+    assert len(MPU._instructions) == 0xFF + 1
+    assert all(instruction.opcode == opcode for opcode, instruction in enumerate(MPU._instructions))
+
+
+def test_not_implemented(mpu: MPU):
+    """Test unmapped opcodes."""
+    mpu._memory[0x1000] = 0xFF
+    mpu.registers.PC = 0x1000
+    assert mpu.decode(0x1000).mnemonic == "???"
+    with pytest.raises(NotImplementedError):
+        mpu.step()
+
+
+def test_concurrent_construction():
+    """Test MPUs can be created concurrently."""
+    tables = []
+
+    def worker():
+        MPU(memory=[0x00] * (0xFFFF + 1))
+        tables.append(MPU._instructions)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(table is MPU._instructions for table in tables)
@@ -0,0 +1,104 @@
+"""Test instruments sharing the instrumented step."""
+from fixtures import *  # noqa
+from mpu.coverage import Coverage
+from mpu.profiler import CallGraphProfiler, Profiler
+from mpu.trace import TraceBuffer
+from utils import write_memory
+from mpu.mpu6502 import MPU
+
+# 1000: LDX #$03
+# 1002: JSR $1010
+# 1005: DEX
+# 1006: BNE $1002
+# 1008: JMP $1008
+# 1010: RTS
+PROGRAM = {
+    0x1000: (0xA2, 0x03, 0x20, 0x10, 0x10, 0xCA, 0xD0, 0xFA, 0x4C, 0x08, 0x10),
+    0x1010: (0x60,),
+    0x2000: (0x40,),  # 2000: RTI
+}
+STEPS = 1 + 3 * 4 + 3
+
+
+def make_mpu() -> MPU:
+    """Create MPU with PROGRAM and an IRQ handler at $2000."""
+    mpu = MPU(memory=[0x00] * (0xFFFF + 1), pc=0x1000)
+    for address, code in PROGRAM.items():
+        write_memory(mpu._memory, address, code)
+    write_memory(mpu._memory, mpu.MEM_VECTOR_IRQ_BRK, (0x00, 0x20))
+    return mpu
+
+
+def run(mpu: MPU) -> None:
+    """Run PROGRAM with an IRQ after the first step."""
+    mpu.step()
+    mpu.set_irq(True)
+    mpu.step()
+    mpu.set_irq(False)
+    for _ in range(STEPS):
+        mpu.step()
+
+
+def results(profiler, call_graph, trace, coverage):
+    """Return what each instrument collected."""
+    return [
+        (list(profiler.counts), list(profiler.cycles), profiler.interrupts),
+        call_graph.entries(),
+        trace.records(),
+        (bytes(coverage.executed), bytes(coverage.taken), bytes(coverage.not_taken)),
+    ]
+
+
+def test_combined():
+    """Test instruments attached together collect the same as attached alone."""
+    alone = []
+    for index in range(4):
+        mpu = make_mpu()
+        instruments = [Profiler(mpu), CallGraphProfiler(mpu), TraceBuffer(mpu), Coverage(mpu)]
+        with instruments[index]:
+            run(mpu)
+        alone.append(results(*instruments)[index])
+
+    mpu = make_mpu()
+    instruments = [Profiler(mpu), CallGraphProfiler(mpu), TraceBuffer(mpu), Coverage(mpu)]
+    for instrument in instruments:
+        instrument.attach()
+    assert all(instrument.attached for instrument in instruments)
+    run(mpu)
+    combined = results(*instruments)
+    assert combined == alone
+    assert instruments[2].records()[1].kind == 1, "IRQ entry not traced."
+    assert instruments[0].interrupts == 1
+
+
+def test_detach_order():
+    """Test detaching one instrument keeps the others recording."""
+    mpu = make_mpu()
+    profiler = Profiler(mpu).attach()
+    trace = TraceBuffer(mpu).attach()
+    mpu.step()
+    profiler.detach()
+    assert trace.attached and not profiler.attached
+    mpu.step()
+    assert profiler.counts[0x1000] == 1
+    assert sum(profiler.counts) == 1
+    assert trace.count == 2
+    trace.detach()
+    assert "step" not in mpu.__dict__
+    mpu.step()
+    assert trace.count == 2
+
+
+def test_specialised_step():
+    """Test the profiler counts inline while alone and through its hooks otherwise."""
+    mpu = make_mpu()
+    profiler = Profiler(mpu).attach()
+    assert mpu.step.__qualname__.startswith("Profiler._step")
+    coverage = Coverage(mpu).attach()
+    assert mpu.step.__qualname__.startswith("_instrumented_step")
+    mpu.step()
+    coverage.detach()
+    assert mpu.step.__qualname__.startswith("Profiler._step")
+    mpu.step()
+    assert profiler.counts[0x1000] == profiler.counts[0x1002] == 1
+    assert coverage.addresses() == [0x1000]
@@ -0,0 +1,94 @@
+"""Test IRQ and NMI handling."""
+import pytest
+from mpu.utils import Flag
+from utils import write_memory
+from fixtures import *  # noqa
+from mpu.mpu6502 import MPU
+
+
+@pytest.fixture
+def irq_mpu(mpu: MPU) -> MPU:
+    """MPU looping at $1000 with IRQ handler at $2000 and NMI handler at $3000."""
+    write_memory(mpu._memory, MPU.MEM_VECTOR_IRQ_BRK, (0x00, 0x20))
+    write_memory(mpu._memory, MPU.MEM_VECTOR_NMI, (0x00, 0x30))
+    write_memory(mpu._memory, 0x1000, (0x4C, 0x00, 0x10))  # 1000: JMP $1000
+    write_memory(mpu._memory, 0x2000, (0x40,))  # 2000: RTI
+    write_memory(mpu._memory, 0x3000, (0x40,))  # 3000: RTI
+    mpu.registers.PC = 0x1000
+    return mpu
+
+
+def test_irq(irq_mpu: MPU):
+    """Test IRQ entry."""
+    irq_mpu.registers.set_flag(Flag.CARRY)
+    irq_mpu.set_irq(True)
+    irq_mpu.step()
+    assert irq_mpu.registers.PC == 0x2000, "PC not pointing to IRQ vector address."
+    assert irq_mpu.registers.INTERRUPT, "I flag not set."
+    assert irq_mpu.elapsed_cycles == 7
+    # Analyse stack
+    assert irq_mpu.registers.SP == 0xFC, "Stack not grown by 3 byte."
+    assert irq_mpu._memory[0x01FF] == 0x10, "Return address HSB not on stack."
+    assert irq_mpu._memory[0x01FE] == 0x00, "Return address LSB not on stack."
+    assert irq_mpu._memory[0x01FD] & 0b0010_0000, "Bit 5 not set on the stack."
+    assert (
+        irq_mpu._memory[0x01FD] & ~0b0010_0000 == Flag.CARRY.value
+    ), "B flag pushed or flags wrong."
+
+
+def test_irq_masked(irq_mpu: MPU):
+    """Test IRQ is ignored while I flag is set and level triggered."""
+    irq_mpu.registers.set_flag(Flag.INTERRUPT)
+    irq_mpu.set_irq(True)
+    irq_mpu.step()
+    assert irq_mpu.registers.PC == 0x1000
+    irq_mpu.registers.reset_flag(Flag.INTERRUPT)
+    irq_mpu.step()
+    assert irq_mpu.registers.PC == 0x2000
+    irq_mpu.step()  # RTI, line still asserted
+    assert irq_mpu.registers.PC == 0x1000
+    irq_mpu.step()
+    assert irq_mpu.registers.PC == 0x2000, "Level triggered IRQ not serviced again."
+
+
+def test_irq_sources(irq_mpu: MPU):
+    """Test IRQ line stays active until all sources released."""
+    irq_mpu.set_irq(True, "via")
+    irq_mpu.set_irq(True, "acia")
+    irq_mpu.set_irq(False, "via")
+    assert irq_mpu._pending_interrupts == MPU.INTERRUPT_IRQ
+    irq_mpu.set_irq(False, "acia")
+    assert irq_mpu._pending_interrupts == 0
+    irq_mpu.step()
+    assert irq_mpu.registers.PC == 0x1000
+
+
+def test_nmi(irq_mpu: MPU):
+    """Test NMI is edge triggered and not maskable."""
+    irq_mpu.registers.set_flag(Flag.INTERRUPT)
+    irq_mpu.nmi()
+    irq_mpu.step()
+    assert irq_mpu.registers.PC == 0x3000, "PC not pointing to NMI vector address."
+    assert irq_mpu._memory[0x01FD] == Flag.INTERRUPT.value | 0b0010_0000
+    irq_mpu.step()  # RTI
+    assert irq_mpu.registers.PC == 0x1000
+    irq_mpu.step()
+    assert irq_mpu.registers.PC == 0x1000, "NMI serviced twice."
+
+
+def test_nmi_before_irq(irq_mpu: MPU):
+    """Test NMI has priority over IRQ."""
+    irq_mpu.set_irq(True)
+    irq_mpu.nmi()
+    irq_mpu.step()
+    assert irq_mpu.registers.PC == 0x3000
+
+
+def test_irq_from_event(irq_mpu: MPU):
+    """Test IRQ asserted by a scheduled event is serviced at the event boundary."""
+    irq_mpu.scheduler.post(30, lambda cycle: irq_mpu.set_irq(True))
+    irq_mpu.run(30)
+    assert irq_mpu.registers.PC == 0x1000
+    irq_mpu.run(1)
+    assert irq_mpu.registers.PC == 0x2000
+    assert irq_mpu.elapsed_cycles == 30 + 7
@@ -0,0 +1,92 @@
+"""Test program loaders."""
+import pytest
+from mpu.loaders import load_binary, load_intel_hex, load_program, load_srecord
+from fixtures import *  # noqa
+from mpu.mpu6502 import MPU
+
+
+def ihex(address: int, record_type: int, data: bytes) -> str:
+    """Build Intel HEX record."""
+    record = bytes((len(data), address >> 8, address & 0xFF, record_type)) + data
+    return ":" + (record + bytes(((-sum(record)) & 0xFF,))).hex().upper()
+
+
+def srec(record_type: str, address: int, data: bytes = b"") -> str:
+    """Build S-record with 16 bit address."""
+    record = bytes((len(data) + 3, address >> 8, address & 0xFF)) + data
+    return f"S{record_type}" + (record + bytes((~sum(record) & 0xFF,))).hex().upper()
+
+
+def test_load_binary(tmp_path, mpu: MPU):
+    """Test raw binary loaded in chunks."""
+    path = tmp_path / "prog.bin"
+    path.write_bytes(bytes(range(256)) * 4)
+    result = load_binary(mpu._memory, str(path), 0x2000, chunk_size=300)
+    assert result.bytes_loaded == 1024
+    assert result.runs == 4
+    assert mpu._memory[0x2000:0x2400] == list(range(256)) * 4
+    with pytest.raises(ValueError):
+        load_binary(mpu._memory, str(path), 0xFF00)
+
+
+def test_load_intel_hex(tmp_path, mpu: MPU):
+    """Test Intel HEX with contiguous runs and start address."""
+    path = tmp_path / "prog.hex"
+    lines = [
+        ihex(0x1000, 0x00, bytes((0xA9, 0x01))),
+        ihex(0x1002, 0x00, bytes((0x8D, 0x00, 0x20))),
+        ihex(0x3000, 0x00, bytes((0xEA,))),
+        ihex(0x0000, 0x05, (0x1000).to_bytes(4, "big")),
+        ihex(0x0000, 0x01, b""),
+    ]
+    path.write_text("\n".join(lines) + "\n")
+    result = load_intel_hex(mpu._memory, str(path))
+    assert result.start_address == 0x1000
+    assert result.bytes_loaded == 6
+    assert result.runs == 2, "Contiguous records not merged."
+    assert mpu._memory[0x1000:0x1005] == [0xA9, 0x01, 0x8D, 0x00, 0x20]
+    assert mpu._memory[0x3000] == 0xEA
+
+
+def test_load_intel_hex_checksum(tmp_path, mpu: MPU):
+    """Test Intel HEX checksum error."""
+    path = tmp_path / "bad.hex"
+    path.write_text(ihex(0x1000, 0x00, b"\x01")[:-2] + "00\n")
+    with pytest.raises(ValueError, match="Checksum"):
+        load_intel_hex(mpu._memory, str(path))
+
+
+def test_load_srecord(tmp_path, mpu: MPU):
+    """Test S-record with start address."""
+    path = tmp_path / "prog.s19"
+    lines = [
+        srec("0", 0x0000, b"HDR"),
+        srec("1", 0x1000, bytes((0xA9, 0x01))),
+        srec("1", 0x1002, bytes((0x00,))),
+        srec("9", 0x1000),
+    ]
+    path.write_text("\n".join(lines) + "\n")
+    result = load_srecord(mpu._memory, str(path))
+    assert result.start_address == 0x1000
+    assert result.bytes_loaded == 3
+    assert result.runs == 1
+    assert mpu._memory[0x1000:0x1003] == [0xA9, 0x01, 0x00]
+
+
+def test_load_program(tmp_path, mpu: MPU):
+    """Test loading into MPU sets start PC and reset vector."""
+    path = tmp_path / "prog.s19"
+    path.write_text(srec("1", 0x1000, bytes((0xA9, 0x42))) + "\n" + srec("9", 0x1000) + "\n")
+    load_program(mpu, str(path), set_reset_vector=True)
+    assert mpu._memory[MPU.MEM_VECTOR_RESET : MPU.MEM_VECTOR_RESET + 2] == [0x00, 0x10]
+    mpu.reset()
+    mpu.step()
+    assert mpu.registers.A == 0x42
+
+    binary = tmp_path / "prog.bin"
+    binary.write_bytes(bytes((0xEA,)))
+    with pytest.raises(ValueError):
+        load_program(mpu, str(binary))
+    load_program(mpu, str(binary), address=0x4000)
+    mpu.reset()
+    assert mpu.registers.PC == 0x4000
@@ -0,0 +1,67 @@
+"""Test real-time clock pacing."""
+import pytest
+from mpu.pacing import ClockPacer
+from utils import write_memory
+from fixtures import *  # noqa
+from mpu.mpu6502 import MPU
+
+
+class FakeClock:
+    """Clock advanced by sleeping and by simulated host work."""
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def loop_mpu(mpu: MPU) -> MPU:
+    """MPU in an endless loop."""
+    write_memory(mpu._memory, 0x1000, (0x4C, 0x00, 0x10))  # 1000: JMP $1000
+    mpu.registers.PC = 0x1000
+    return mpu
+
+
+def test_sleeps_once_per_quantum(loop_mpu: MPU):
+    """Test a fast emulator sleeps once per quantum up to emulated time."""
+    fake = FakeClock()
+    pacer = ClockPacer(loop_mpu, 1_000, quantum_cycles=99, clock=fake.clock, sleep=fake.sleep)
+    pacer.run(990)
+    assert len(fake.sleeps) == 10
+    assert fake.now - 100.0 == pytest.approx(0.99)
+    assert pacer.lag == pytest.approx(-0.099)
+
+
+def test_drift_correction(loop_mpu: MPU):
+    """Test oversleeping is made up in later quanta."""
+    fake = FakeClock()
+
+    def oversleep(seconds):
+        fake.sleep(seconds + (0.05 if not fake.sleeps else 0))
+
+    pacer = ClockPacer(loop_mpu, 1_000, quantum_cycles=99, clock=fake.clock, sleep=oversleep)
+    pacer.run(297)
+    assert fake.now - 100.0 == pytest.approx(0.297)
+
+
+def test_behind(loop_mpu: MPU):
+    """Test lag reported and origin moved when too slow."""
+    fake = FakeClock()
+
+    def clock():
+        fake.now += 1.0  # Host needs a second per quantum
+        return fake.now
+
+    pacer = ClockPacer(loop_mpu, 1_000, quantum_cycles=99, max_lag=0.5, clock=clock)
+    pacer.run(99)
+    assert pacer.lag == pytest.approx(1.0 - 0.099)
+    pacer.run(99)
+    assert pacer.lag == pytest.approx(1.0 - 0.099), "Lag accumulates past max_lag."
+    assert pacer.slept == 0
@@ -0,0 +1,326 @@
+"""Test execution profilers."""
+import csv
+import json
+import pytest
+from fixtures import *  # noqa
+from mpu.profiler import (
+    CallGraphProfiler,
+    HandlerTimer,
+    Profiler,
+    SamplingProfiler,
+    unwind_stack,
+)
+from mpu.utils import AddressMode
+from utils import write_memory
+from mpu.mpu6502 import MPU
+
+# 1000: LDX #$05
+# 1002: DEX
+# 1003: BNE $1002
+# 1005: JMP $1005
+LOOP = (0xA2, 0x05, 0xCA, 0xD0, 0xFD, 0x4C, 0x05, 0x10)
+
+
+def make_mpu(program=LOOP) -> MPU:
+    """Create MPU with program at $1000."""
+    mpu = MPU(memory=[0x00] * (0xFFFF + 1), pc=0x1000)
+    write_memory(mpu._memory, 0x1000, program)
+    return mpu
+
+
+def test_flat_profile():
+    """Test executions and cycles per PC including branch extra cycles."""
+    mpu = make_mpu()
+    with Profiler(mpu) as profiler:
+        assert profiler.attached
+        for _ in range(1 + 5 + 5 + 2):
+            mpu.step()
+    assert not profiler.attached
+    assert "step" not in mpu.__dict__
+    assert profiler.counts[0x1000] == 1
+    assert profiler.counts[0x1002] == 5
+    assert profiler.counts[0x1003] == 5
+    assert profiler.counts[0x1005] == 2
+    assert profiler.cycles[0x1003] == 4 * 3 + 2, "Taken branches cost an extra cycle."
+    assert profiler.total_cycles == mpu.elapsed_cycles
+    entries = profiler.entries()
+    assert [entry.address for entry in entries] == [0x1003, 0x1002, 0x1005, 0x1000]
+    assert entries[0].instruction == "BNE -$03"
+    assert abs(sum(entry.share for entry in entries) - 1.0) < 1e-9
+
+
+def test_profile_run_and_interrupts():
+    """Test profiling through run() and interrupt entry accounting."""
+    mpu = make_mpu()
+    write_memory(mpu._memory, mpu.MEM_VECTOR_IRQ_BRK, (0x05, 0x10))
+    profiler = Profiler(mpu).attach()
+    mpu.run(100)
+    mpu.set_irq(True)
+    mpu.run(20)
+    profiler.detach()
+    mpu.run(100)
+    assert profiler.interrupts == 1
+    assert profiler.interrupt_cycles == 7
+    assert profiler.total_cycles < mpu.elapsed_cycles
+    profiler.clear()
+    assert profiler.total_cycles == 0
+
+
+def test_attach_twice():
+    """Test a profiler is attached once and does not override other step replacements."""
+    mpu = make_mpu()
+    profiler = Profiler(mpu).attach()
+    with pytest.raises(RuntimeError):
+        profiler.attach()
+    profiler.detach()
+    mpu.step = lambda: None
+    with pytest.raises(RuntimeError):
+        Profiler(mpu).attach()
+
+
+def test_export(tmp_path):
+    """Test JSON and CSV export sorted by cycle share."""
+    mpu = make_mpu()
+    with Profiler(mpu) as profiler:
+        mpu.run(50)
+    profiler.to_json(str(tmp_path / "profile.json"))
+    profiler.to_csv(str(tmp_path / "profile.csv"))
+    with open(tmp_path / "profile.json") as file:
+        data = json.load(file)
+    assert data["total_cycles"] == profiler.total_cycles
+    assert data["entries"][0]["address"] == 0x1005
+    with open(tmp_path / "profile.csv", newline="") as file:
+        rows = list(csv.DictReader(file))
+    assert rows[0]["address"] == "1005"
+    assert rows[0]["instruction"] == "JMP $1005"
+    assert len(rows) == len(data["entries"]) == 4
+
+
+# 1000: JSR $1100
+# 1003: JSR $1200
+# 1006: JMP $1006
+# 1100: JSR $1200
+# 1103: RTS
+# 1200: NOP
+# 1201: RTS
+CALLS = {
+    0x1000: (0x20, 0x00, 0x11, 0x20, 0x00, 0x12, 0x4C, 0x06, 0x10),
+    0x1100: (0x20, 0x00, 0x12, 0x60),
+    0x1200: (0xEA, 0x60),
+}
+
+
+def make_call_mpu(programs=CALLS) -> MPU:
+    """Create MPU with programs at their addresses."""
+    mpu = make_mpu(())
+    for address, program in programs.items():
+        write_memory(mpu._memory, address, program)
+    return mpu
+
+
+def test_call_graph():
+    """Test inclusive and exclusive cycles of nested calls."""
+    mpu = make_call_mpu()
+    with CallGraphProfiler(mpu, symbols={0x1100: "outer"}) as profiler:
+        for _ in range(3):
+            mpu.step()
+        assert profiler.depth == 2
+        for _ in range(5):
+            mpu.step()
+    assert profiler.depth == 0
+    entries = {entry.address: entry for entry in profiler.entries()}
+    inner, outer = entries[0x1200], entries[0x1100]
+    assert (inner.calls, inner.inclusive, inner.exclusive) == (2, 16, 16)
+    assert (outer.calls, outer.inclusive, outer.exclusive) == (1, 20, 12)
+    assert entries[0x1000].inclusive == mpu.elapsed_cycles == 40
+    assert entries[0x1000].exclusive == 12
+    assert entries[0x1100].name == "outer"
+    assert profiler.folded() == [
+        "$1000 12",
+        "$1000;outer 12",
+        "$1000;outer;$1200 8",
+        "$1000;$1200 8",
+    ]
+
+
+def test_call_graph_active_frames(tmp_path):
+    """Test frames still running are included in results."""
+    mpu = make_call_mpu()
+    with CallGraphProfiler(mpu) as profiler:
+        for _ in range(3):
+            mpu.step()
+    entries = {entry.address: entry for entry in profiler.entries()}
+    assert entries[0x1200].inclusive == entries[0x1200].exclusive == 2
+    assert entries[0x1100].inclusive == 8
+    profiler.write_folded(str(tmp_path / "stacks.folded"))
+    with open(tmp_path / "stacks.folded") as file:
+        assert file.read().splitlines() == ["$1000 6", "$1000;$1100 6", "$1000;$1100;$1200 2"]
+
+
+def test_call_graph_recursion():
+    """Test recursive calls count inclusive cycles once."""
+    # 1000: JSR $1100, 1003: JMP $1003
+    # 1100: DEX, BEQ $1106, JSR $1100, 1106: RTS
+    mpu = make_call_mpu(
+        {
+            0x1000: (0x20, 0x00, 0x11, 0x4C, 0x03, 0x10),
+            0x1100: (0xCA, 0xF0, 0x03, 0x20, 0x00, 0x11, 0x60),
+        }
+    )
+    mpu.registers.X = 3
+    with CallGraphProfiler(mpu) as profiler:
+        while mpu.registers.PC != 0x1003:
+            mpu.step()
+    assert profiler.depth == 0
+    entry = {entry.address: entry for entry in profiler.entries()}[0x1100]
+    assert entry.calls == 3
+    assert entry.inclusive == entry.exclusive == mpu.elapsed_cycles - 6
+
+
+def test_call_graph_stack_tricks():
+    """Test frames follow SP on manual pops and RTS used as jump."""
+    # 1000: JSR $1100, 1003: NOP
+    # 1100: PLA, PLA, JMP $1003 (drop return address)
+    # 1200: LDA #$12, PHA, LDA #$FF, PHA, RTS (jump to $1300), 1300: NOP
+    mpu = make_call_mpu(
+        {
+            0x1000: (0x20, 0x00, 0x11, 0xEA),
+            0x1100: (0x68, 0x68, 0x4C, 0x03, 0x10),
+            0x1200: (0xA9, 0x12, 0x48, 0xA9, 0xFF, 0x48, 0x60),
+            0x1300: (0xEA,),
+        }
+    )
+    with CallGraphProfiler(mpu) as profiler:
+        mpu.step()
+        assert profiler.depth == 1
+        mpu.step()
+        assert profiler.depth == 0, "Frame left by pulling return address."
+        for _ in range(3):
+            mpu.step()
+        mpu.registers.PC = 0x1200
+        for _ in range(5):
+            mpu.step()
+        assert mpu.registers.PC == 0x1300
+        assert profiler.depth == 0, "RTS as jump is no return."
+    assert [entry.address for entry in profiler.entries()] == [0x1000, 0x1100]
+
+
+def test_call_graph_interrupts():
+    """Test interrupt handlers get frames including the entry cycles."""
+    mpu = make_call_mpu({0x1000: (0xEA, 0x4C, 0x00, 0x10), 0x1500: (0x40,)})
+    write_memory(mpu._memory, mpu.MEM_VECTOR_IRQ_BRK, (0x00, 0x15))
+    with CallGraphProfiler(mpu) as profiler:
+        mpu.step()
+        mpu.set_irq(True)
+        mpu.step()
+        mpu.set_irq(False)
+        assert profiler.depth == 1
+        mpu.step()
+        assert profiler.depth == 0
+    handler = {entry.address: entry for entry in profiler.entries()}[0x1500]
+    assert (handler.calls, handler.inclusive, handler.exclusive) == (1, 13, 13)
+
+
+def test_unwind_stack():
+    """Test call stack recovered from return addresses on the hardware stack."""
+    mpu = make_call_mpu()
+    for _ in range(2):
+        mpu.step()
+    assert mpu.registers.PC == 0x1200
+    assert unwind_stack(mpu) == [0x1100, 0x1200]
+    assert unwind_stack(mpu, max_depth=1) == [0x1200]
+    mpu._memory[0x1000] = 0xEA
+    assert unwind_stack(mpu) == [0x1200], "Return address not behind a JSR."
+
+
+def test_sampling():
+    """Test samples are taken every interval cycles into the ring buffer."""
+    mpu = make_call_mpu()
+    with SamplingProfiler(mpu, interval_cycles=10, capacity=4) as profiler:
+        assert profiler.attached
+        mpu.run(25)
+    assert not profiler.attached
+    mpu.run(100)
+    assert profiler.count == len(profiler) == 2
+    first, second = profiler.samples()
+    assert 10 <= first.cycle < 16
+    assert 20 <= second.cycle < 26
+    assert first.stack == (0x1100, 0x1200)
+    assert first.pc == 0x1200
+    assert first.sp == 0xFB
+    assert profiler.histogram() == {0x1200: 1, second.pc: 1}
+
+    with profiler:
+        mpu.run(100)
+    assert profiler.count == 12
+    assert len(profiler) == 4
+    samples = profiler.samples()
+    assert [sample.cycle for sample in samples] == sorted(sample.cycle for sample in samples)
+    assert samples[-1].cycle > mpu.elapsed_cycles - 16
+    assert profiler.folded() == ["root 4"]
+
+
+def test_sampling_call_graph():
+    """Test samples take the shadow stack of a call graph profiler."""
+    mpu = make_call_mpu()
+    with CallGraphProfiler(mpu) as call_graph:
+        with SamplingProfiler(mpu, interval_cycles=10, call_graph=call_graph) as profiler:
+            mpu.run(12)
+    (sample,) = profiler.samples()
+    assert sample.stack == (0x1000, 0x1100, 0x1200)
+    assert profiler.folded({0x1100: "outer"}) == ["$1000;outer;$1200 1"]
+
+
+def test_sampling_invalid():
+    """Test invalid sampling parameters."""
+    mpu = make_mpu()
+    with pytest.raises(ValueError):
+        SamplingProfiler(mpu, interval_cycles=0)
+    with pytest.raises(ValueError):
+        SamplingProfiler(mpu, max_depth=256)
+
+
+def test_handler_timer():
+    """Test host time is collected per opcode and address mode."""
+    # 1000: LDA $2000,X, 1003: DEX, 1004: JMP $1000
+    mpu = make_mpu((0xBD, 0x00, 0x20, 0xCA, 0x4C, 0x00, 0x10))
+    with HandlerTimer(mpu) as timer:
+        assert "_get_effective_address" in mpu.__dict__
+        for _ in range(30):
+            mpu.step()
+        assert timer.overhead_ns >= 0
+    assert "_get_effective_address" not in mpu.__dict__
+    assert "step" not in mpu.__dict__
+    loops = 10
+    assert timer.counts[0xBD] == timer.counts[0xCA] == timer.counts[0x4C] == loops
+    assert timer.counts[0xEA] == 0
+    assert timer.mode_counts[AddressMode.ABSOLUTE_X] == loops
+    assert timer.mode_counts[AddressMode.ABSOLUTE] == loops
+    assert timer.mode_counts[AddressMode.IMPLIED] == 0
+    assert timer.nested_calls[0xBD] == timer.nested_calls[0x4C] == loops
+    assert timer.nested_calls[0xCA] == 0
+    assert timer.wrapper_overhead_ns >= 0
+    opcodes = {timing.name: timing for timing in timer.opcodes()}
+    assert set(opcodes) == {"BD LDA ABSOLUTE_X", "CA DEX IMPLIED", "4C JMP ABSOLUTE"}
+    assert abs(sum(timing.share for timing in opcodes.values()) - 1.0) < 1e-9 or not any(
+        timing.nanoseconds for timing in opcodes.values()
+    )
+    assert [timing.name for timing in timer.address_modes()] in (
+        ["ABSOLUTE", "ABSOLUTE_X"],
+        ["ABSOLUTE_X", "ABSOLUTE"],
+    )
+    report = timer.report()
+    assert "BD LDA ABSOLUTE_X" in report
+    assert "address mode" in report
+    timer.clear()
+    assert not timer.opcodes()
+    assert not timer.address_modes()
+
+
+def test_handler_timer_attach_twice():
+    """Test timers do not stack on the same MPU."""
+    mpu = make_mpu()
+    mpu._get_effective_address = lambda instruction: None
+    with pytest.raises(RuntimeError):
+        HandlerTimer(mpu).attach()
+    assert "step" not in mpu.__dict__
@@ -0,0 +1,77 @@
+"""Test MPU reset."""
+import pytest
+from utils import write_memory
+from fixtures import *  # noqa
+from mpu.mpu6502 import MPU
+
+
+def test_reset(mpu: MPU):
+    """Test reset keeps memory and cycles."""
+    write_memory(mpu._memory, 0x1000, (0xA9, 0x12))  # 1000: LDA #$12
+    mpu.registers.PC = 0x1000
+    mpu.step()
+    mpu.reset()
+    assert mpu.registers.PC == 0x0000
+    assert mpu.registers.A == 0x00
+    assert mpu.registers.SP == 0xFF
+    assert mpu._memory[0x1000] == 0xA9
+    assert mpu.elapsed_cycles == 2
+
+
+def test_reset_memory_template(mpu: MPU):
+    """Test reset restores memory from template."""
+    template = bytearray(0xFFFF + 1)
+    template[0x1000:0x1002] = (0xA9, 0x12)  # 1000: LDA #$12
+    write_memory(mpu._memory, 0x2000, (0x55,))
+    mpu.registers.FLAGS = 0xFF
+    mpu.step()
+
+    mpu.reset(memory_template=bytes(template))
+    assert mpu._memory[0x1000] == 0xA9
+    assert mpu._memory[0x2000] == 0x00
+    assert mpu.registers.FLAGS == 0x00
+    assert mpu.elapsed_cycles == 0
+
+
+def test_reset_memory_template_modified(mpu: MPU):
+    """Test a bytearray template changed in place between resets is not restored stale."""
+    template = bytearray(0xFFFF + 1)
+    mpu.reset(memory_template=template)
+    template[0x1000] = 0xA9
+    mpu.reset(memory_template=template)
+    assert mpu._memory[0x1000] == 0xA9
+
+    frozen = bytes(template)
+    mpu.reset(memory_template=frozen)
+    mpu._memory[0x1000] = 0x00
+    mpu.reset(memory_template=frozen)
+    assert mpu._memory[0x1000] == 0xA9
+
+
+def test_reset_memory_template_size(mpu: MPU):
+    """Test template size is checked."""
+    with pytest.raises(ValueError):
+        mpu.reset(memory_template=bytes(0x100))
+
+
+def test_reset_memory_template_events(mpu: MPU):
+    """Test power on reset drops scheduled events and pending interrupts."""
+    fired = []
+    template = bytes(mpu._memory)
+    write_memory(mpu._memory, 0x1000, (0x4C, 0x00, 0x10))  # 1000: JMP $1000
+    mpu.registers.PC = 0x1000
+    mpu.scheduler.post(5000, fired.append)
+    mpu.run(100)
+    mpu.set_irq(True, "device")
+    mpu.nmi()
+
+    mpu.reset(memory_template=template)
+    assert mpu.elapsed_cycles == 0
+    assert mpu.scheduler.next_cycle is None
+    assert mpu._pending_interrupts == 0
+    assert not mpu._irq_sources, "IRQ source kept."
+    mpu._memory[0x0000] = 0xEA  # 0000: NOP
+    mpu.step()
+    assert mpu.registers.PC == 0x0001, "Stale interrupt entered."
+    mpu.run(6000)
+    assert fired == [], "Stale event fired."
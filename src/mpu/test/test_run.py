@@ -0,0 +1,38 @@
+"""Test run loop."""
+import pytest
+from mpu.utils import StopReason
+from utils import write_memory
+from fixtures import *  # noqa
+from mpu.mpu6502 import MPU
+
+
+def test_run_cycles(mpu: MPU):
+    """Test run stops after cycle budget."""
+    write_memory(mpu._memory, 0x1000, (0x4C, 0x00, 0x10))  # 1000: JMP $1000
+    mpu.registers.PC = 0x1000
+    assert mpu.run(10) == StopReason.CYCLES
+    assert mpu.elapsed_cycles == 12, "Budget not rounded up to instruction boundary."
+    assert mpu.run(3) == StopReason.CYCLES
+    assert mpu.elapsed_cycles == 15
+
+
+def test_run_not_implemented(mpu: MPU):
+    """Test run stops on unmapped opcode."""
+    write_memory(mpu._memory, 0x1000, (0xEA, 0xFF))  # 1000: NOP, 1001: ???
+    mpu.registers.PC = 0x1000
+    assert mpu.run(100) == StopReason.NOT_IMPLEMENTED
+    assert mpu.elapsed_cycles == 2
+    assert mpu.registers.PC == 0x1001, "PC not rewound to the unmapped opcode."
+
+
+def test_run_other_not_implemented(mpu: MPU):
+    """Test run does not swallow NotImplementedError raised by device code."""
+    write_memory(mpu._memory, 0x1000, (0x4C, 0x00, 0x10))  # 1000: JMP $1000
+
+    def device(cycle: int) -> None:
+        raise NotImplementedError("Register not implemented!")
+
+    mpu.registers.PC = 0x1000
+    mpu.scheduler.post(6, device)
+    with pytest.raises(NotImplementedError):
+        mpu.run(100)
@@ -0,0 +1,77 @@
+"""Test cycle scheduler."""
+from mpu.scheduler import Scheduler
+from utils import write_memory
+from fixtures import *  # noqa
+from mpu.mpu6502 import MPU
+
+
+def test_scheduler_order():
+    """Test events fire in cycle and posting order."""
+    scheduler = Scheduler()
+    fired = []
+    scheduler.post(20, lambda cycle: fired.append(("b", cycle)))
+    scheduler.post(10, lambda cycle: fired.append(("a", cycle)))
+    scheduler.post(20, lambda cycle: fired.append(("c", cycle)))
+    assert scheduler.next_cycle == 10
+    assert scheduler.dispatch(9) == 0
+    assert scheduler.dispatch(25) == 3
+    assert fired == [("a", 10), ("b", 20), ("c", 20)]
+    assert scheduler.next_cycle is None
+
+
+def test_scheduler_cancel():
+    """Test cancelled events are skipped."""
+    scheduler = Scheduler()
+    fired = []
+    event = scheduler.post(10, fired.append)
+    scheduler.post(30, fired.append)
+    scheduler.cancel(event)
+    assert scheduler.next_cycle == 30
+    scheduler.dispatch(100)
+    assert fired == [30]
+
+
+def test_scheduler_restore():
+    """Test restoring a snapshot requeues dispatched and uncancels cancelled events."""
+    scheduler = Scheduler()
+    fired = []
+    event = scheduler.post(10, fired.append)
+    scheduler.post(30, fired.append)
+    snapshot = scheduler.snapshot()
+    scheduler.cancel(event)
+    scheduler.post(20, fired.append)
+    scheduler.dispatch(100)
+    assert fired == [20, 30]
+    scheduler.restore(snapshot)
+    assert len(scheduler) == 2
+    scheduler.dispatch(100)
+    assert fired == [20, 30, 10, 30]
+
+
+def test_run_dispatches_events(mpu: MPU):
+    """Test run dispatches events at instruction boundaries."""
+    write_memory(mpu._memory, 0x1000, (0x4C, 0x00, 0x10))  # 1000: JMP $1000
+    mpu.registers.PC = 0x1000
+    fired = []
+
+    def timer(cycle):
+        fired.append((cycle, mpu.elapsed_cycles))
+        if len(fired) < 3:
+            mpu.scheduler.post(cycle + 10, timer)
+
+    mpu.scheduler.post(10, timer)
+    mpu.run(100)
+    assert fired == [(10, 12), (20, 21), (30, 30)]
+    assert mpu.elapsed_cycles == 102
+
+
+def test_run_event_after_budget(mpu: MPU):
+    """Test events beyond the budget stay queued."""
+    write_memory(mpu._memory, 0x1000, (0x4C, 0x00, 0x10))  # 1000: JMP $1000
+    mpu.registers.PC = 0x1000
+    fired = []
+    mpu.scheduler.post(50, fired.append)
+    mpu.run(30)
+    assert fired == []
+    mpu.run(30)
+    assert fired == [50]
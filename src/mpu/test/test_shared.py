@@ -0,0 +1,110 @@
+"""Test shared memory bus."""
+import os
+import subprocess
+import sys
+import time
+import pytest
+import mpu.shared
+from mpu.shared import SharedMemoryBus, SharedMemoryView
+from utils import write_memory
+from mpu.mpu6502 import MPU
+
+
+@pytest.fixture
+def shared_mpu():
+    """MPU on shared memory running INX, STX $2000 in a loop."""
+    bus = SharedMemoryBus()
+    mpu = MPU(memory=bus, pc=0x1000)
+    write_memory(bus, 0x1000, (0xE8, 0x8E, 0x00, 0x20, 0x4C, 0x00, 0x10))
+    yield mpu
+    bus.close()
+
+
+def test_zero_copy_view(shared_mpu: MPU):
+    """Test observer sees memory writes without copying."""
+    view = SharedMemoryView(shared_mpu._memory.name)
+    try:
+        shared_mpu.run(100)
+        assert view.memory[0x2000] == shared_mpu._memory[0x2000] > 0
+        assert view.memory[0x1000] == 0xE8
+        assert view.memory.readonly
+        with pytest.raises(TypeError):
+            view.memory[0x2000] = 0
+    finally:
+        view.close()
+
+
+def test_published_registers(shared_mpu: MPU):
+    """Test registers are published at event boundaries."""
+    bus = shared_mpu._memory
+    view = SharedMemoryView(bus.name)
+    try:
+        bus.start_publishing(shared_mpu, interval_cycles=50)
+        registers, cycles = view.registers()
+        assert cycles == 0
+        assert registers.PC == 0x1000
+        shared_mpu.run(120)
+        registers, cycles = view.registers()
+        assert 100 <= cycles < 110
+        assert registers.SP == 0xFF
+        bus.publish(shared_mpu)
+        registers, cycles = view.registers()
+        assert cycles == shared_mpu.elapsed_cycles
+        assert registers == shared_mpu.registers
+    finally:
+        view.close()
+
+
+def test_stop_publishing(shared_mpu: MPU):
+    """Test publishing stops on stop_publishing() and close()."""
+    bus = shared_mpu._memory
+    view = SharedMemoryView(bus.name)
+    try:
+        bus.start_publishing(shared_mpu, interval_cycles=50)
+        bus.stop_publishing()
+        shared_mpu.run(120)
+        assert view.registers()[1] == 0
+        assert shared_mpu.scheduler.next_cycle is None
+    finally:
+        view.close()
+
+    other = MPU(memory=SharedMemoryBus(), pc=0x1000)
+    other._memory.start_publishing(other, interval_cycles=50)
+    with other.transaction() as tx:
+        other.run(120)
+    tx.rollback()  # Requeues the dispatched publish event
+    other._memory.close()
+    other.run(120)
+
+
+def test_clone_is_private(shared_mpu: MPU):
+    """Test clones do not write into the shared block."""
+    shared_mpu.run(20)
+    other = shared_mpu.clone()
+    other.run(20)
+    assert other._memory[0x2000] != shared_mpu._memory[0x2000]
+
+
+def test_attach_invalid():
+    """Test attaching to unknown block."""
+    with pytest.raises(FileNotFoundError):
+        SharedMemoryView("mpu-does-not-exist")
+
+
+def test_observer_exit_keeps_block(shared_mpu: MPU):
+    """Test an observer process exiting does not remove the block of the emulator."""
+    name = shared_mpu._memory.name
+    code = (
+        "from mpu.shared import SharedMemoryView\n"
+        f"view = SharedMemoryView({name!r})\n"
+        "assert view.memory[0x1000] == 0xE8\n"
+        "view.close()\n"
+    )
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(mpu.shared.__file__)))
+    subprocess.run([sys.executable, "-c", code], env=env, check=True, timeout=60)
+    # The resource tracker of the observer cleans up right after it exited
+    for _ in range(10):
+        time.sleep(0.05)
+        view = SharedMemoryView(name)
+        assert view.memory[0x1000] == 0xE8
+        view.close()
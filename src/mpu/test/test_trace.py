@@ -0,0 +1,84 @@
+"""Test binary instruction traces."""
+import pytest
+from fixtures import *  # noqa
+from mpu.trace import KIND_INSTRUCTION, KIND_IRQ, RECORD_SIZE, TraceBuffer
+from utils import write_memory
+from mpu.mpu6502 import MPU
+
+# 1000: LDA #$42
+# 1002: STA $2000
+# 1005: INX
+# 1006: JMP $1005
+PROGRAM = (0xA9, 0x42, 0x8D, 0x00, 0x20, 0xE8, 0x4C, 0x05, 0x10)
+
+
+def make_mpu(program=PROGRAM) -> MPU:
+    """Create MPU with program at $1000."""
+    mpu = MPU(memory=[0x00] * (0xFFFF + 1), pc=0x1000)
+    write_memory(mpu._memory, 0x1000, program)
+    return mpu
+
+
+def test_trace_records():
+    """Test records hold registers before each step and its cycles."""
+    mpu = make_mpu()
+    with TraceBuffer(mpu, capacity=16) as trace:
+        for _ in range(4):
+            mpu.step()
+    assert len(trace.buffer) == 16 * RECORD_SIZE
+    assert len(trace) == trace.count == 4
+    first, second, third, fourth = trace.records()
+    assert (first.pc, first.opcode, first.operand, first.cycles) == (0x1000, 0xA9, 0x42, 2)
+    assert first.A == 0x00
+    assert (second.pc, second.operand, second.A, second.cycles) == (0x1002, 0x2000, 0x42, 4)
+    assert (third.opcode, third.X, third.SP, third.kind) == (0xE8, 0x00, 0xFF, KIND_INSTRUCTION)
+    assert fourth.X == 0x01
+    assert sum(record.cycles for record in trace.records()) == mpu.elapsed_cycles
+
+
+def test_trace_ring():
+    """Test only the last capacity steps are kept, oldest first."""
+    mpu = make_mpu()
+    with TraceBuffer(mpu, capacity=5) as trace:
+        for _ in range(2 + 2 * 10):
+            mpu.step()
+    assert trace.count == 22
+    assert len(trace) == 5
+    records = trace.records()
+    assert [record.pc for record in records] == [0x1006, 0x1005, 0x1006, 0x1005, 0x1006]
+    assert [record.X for record in records[1::2]] == [8, 9]
+    assert [record.pc for record in trace.records(last=2)] == [0x1005, 0x1006]
+    trace.clear()
+    assert trace.records() == []
+
+
+def test_trace_lines():
+    """Test records decode to disassembly on demand, independent of current memory."""
+    mpu = make_mpu()
+    with TraceBuffer(mpu) as trace:
+        for _ in range(3):
+            mpu.step()
+    write_memory(mpu._memory, 0x1000, (0xEA, 0xEA))
+    lines = trace.lines()
+    assert lines[0].startswith("1000: LDA #$42 ")
+    assert lines[0].endswith("A=00 X=00 Y=00 SP=FF P=00 +2")
+    assert trace.lines(last=1, include_opcodes=True)[0].startswith("1005: E8       INX ")
+
+
+def test_trace_interrupts():
+    """Test interrupt entries are recorded."""
+    mpu = make_mpu()
+    write_memory(mpu._memory, mpu.MEM_VECTOR_IRQ_BRK, (0x05, 0x10))
+    with TraceBuffer(mpu) as trace:
+        mpu.step()
+        mpu.set_irq(True)
+        mpu.step()
+    record = trace.records()[-1]
+    assert (record.pc, record.kind, record.cycles) == (0x1002, KIND_IRQ, 7)
+    assert trace.lines()[-1].startswith("1002: IRQ ")
+
+
+def test_trace_invalid():
+    """Test invalid capacity."""
+    with pytest.raises(ValueError):
+        TraceBuffer(make_mpu(), capacity=0)
@@ -0,0 +1,72 @@
+"""Test streaming trace diff."""
+from fixtures import *  # noqa
+from mpu.tracediff import diff_traces, is_binary_trace
+from mpu.tracefile import TraceFileWriter, TraceRecorder
+from mpu.tracetext import TextTraceWriter
+from utils import write_memory
+from mpu.mpu6502 import MPU
+
+# 1000: LDX #$00
+# 1002: INX
+# 1003: STX $2000
+# 1006: LDA $2000
+# 1009: JMP $1002
+PROGRAM = (0xA2, 0x00, 0xE8, 0x8E, 0x00, 0x20, 0xAD, 0x00, 0x20, 0x4C, 0x02, 0x10)
+
+
+def record(path, steps, text=False, patch_at=None):
+    """Record steps of the program, optionally changing $2000 before step patch_at."""
+    mpu = MPU(memory=[0x00] * (0xFFFF + 1), pc=0x1000)
+    write_memory(mpu._memory, 0x1000, PROGRAM)
+    writer = TextTraceWriter(str(path)) if text else TraceFileWriter(str(path), 64)
+    with TraceRecorder(mpu, writer, buffer_records=50):
+        for step in range(steps):
+            if step == patch_at:
+                # Next STX writes to $2001 instead
+                mpu._memory[0x1004] = 0x01
+            mpu.step()
+    writer.close()
+    return str(path)
+
+
+def test_equal(tmp_path):
+    """Test equal traces."""
+    left = record(tmp_path / "left.bin", 500)
+    right = record(tmp_path / "right.bin", 500)
+    assert is_binary_trace(left)
+    assert diff_traces(left, right, chunk_records=100) is None
+
+
+def test_first_divergence(tmp_path):
+    """Test the exact first differing step is reported with both states."""
+    left = record(tmp_path / "left.bin", 1000)
+    right = record(tmp_path / "right.bin", 1000, patch_at=400)
+    divergence = diff_traces(left, right, chunk_records=64)
+    # Steps are LDX, then INX, STX, LDA, JMP repeated: step 402 is the next STX
+    assert divergence.index == 402
+    assert divergence.left.pc == divergence.right.pc == 0x1003
+    assert (divergence.left.operand, divergence.right.operand) == (0x2000, 0x2001)
+    assert divergence.left.X == divergence.right.X
+
+
+def test_length_mismatch(tmp_path):
+    """Test a trace ending early."""
+    left = record(tmp_path / "left.bin", 300)
+    right = record(tmp_path / "right.bin", 250)
+    divergence = diff_traces(left, right, chunk_records=100)
+    assert divergence.index == 250
+    assert divergence.left.pc != 0
+    assert divergence.right is None
+
+
+def test_text_traces(tmp_path):
+    """Test text traces and text against binary traces."""
+    left = record(tmp_path / "left.log", 300, text=True)
+    right = record(tmp_path / "right.log", 300, text=True, patch_at=100)
+    binary = record(tmp_path / "left.bin", 300)
+    assert not is_binary_trace(left)
+    assert diff_traces(left, binary, chunk_records=32) is None
+    divergence = diff_traces(binary, right, chunk_records=32)
+    assert divergence.index == 102
+    assert divergence.left.startswith("1003  8E 00 20  STX $2000 ")
+    assert divergence.left != divergence.right
@@ -0,0 +1,198 @@
+"""Test on-disk trace files."""
+import os
+import threading
+import pytest
+from fixtures import *  # noqa
+from mpu.trace import RECORD_SIZE, TraceBuffer
+from mpu.tracefile import (
+    BackgroundTraceWriter,
+    COMPRESSION_NONE,
+    COMPRESSION_ZLIB,
+    TraceFileReader,
+    TraceFileWriter,
+    TraceRecorder,
+)
+from utils import write_memory
+from mpu.mpu6502 import MPU
+
+# 1000: LDX #$00
+# 1002: INX
+# 1003: STX $2000
+# 1006: BNE $1002
+# 1008: JMP $1000
+PROGRAM = (0xA2, 0x00, 0xE8, 0x8E, 0x00, 0x20, 0xD0, 0xFA, 0x4C, 0x00, 0x10)
+
+
+def make_mpu() -> MPU:
+    """Create MPU with program at $1000."""
+    mpu = MPU(memory=[0x00] * (0xFFFF + 1), pc=0x1000)
+    write_memory(mpu._memory, 0x1000, PROGRAM)
+    return mpu
+
+
+def record(path, steps, compression=COMPRESSION_NONE, chunk_records=100, buffer_records=64):
+    """Record steps of the program to path, return in-memory trace of the same steps."""
+    mpu = make_mpu()
+    reference = make_mpu()
+    writer = TraceFileWriter(str(path), chunk_records, compression, mpu.elapsed_cycles)
+    recorder = TraceRecorder(mpu, writer, buffer_records).attach()
+    with TraceBuffer(reference, capacity=steps) as trace:
+        for _ in range(steps):
+            mpu.step()
+            reference.step()
+    recorder.close()
+    return trace, mpu
+
+
+@pytest.mark.parametrize("compression", [COMPRESSION_NONE, COMPRESSION_ZLIB])
+def test_roundtrip(tmp_path, compression):
+    """Test records read back match the recorded steps, across chunk boundaries."""
+    path = tmp_path / "trace.bin"
+    trace, mpu = record(path, 1000, compression)
+    with TraceFileReader(str(path)) as reader:
+        assert len(reader) == 1000
+        assert reader.chunks == 10
+        assert reader.records(0, 1000) == trace.records()
+        assert reader.records(95, 10) == trace.records()[95:105]
+        assert reader.records(990, 100) == trace.records()[990:]
+        assert reader.records(1000, 1) == []
+    if compression == COMPRESSION_ZLIB:
+        assert os.path.getsize(path) < 1000 * RECORD_SIZE
+
+
+def test_find_cycle(tmp_path):
+    """Test seeking by cycle."""
+    path = tmp_path / "trace.bin"
+    trace, mpu = record(path, 1000)
+    records = trace.records()
+    starts = [0]
+    for item in records:
+        starts.append(starts[-1] + item.cycles)
+    with TraceFileReader(str(path)) as reader:
+        for cycle in (0, 1, 2, 3, starts[500], starts[500] + 1, starts[-2]):
+            number = reader.find_cycle(cycle)
+            assert starts[number] <= cycle < starts[number + 1]
+        assert reader.find_cycle(mpu.elapsed_cycles) is None
+
+
+def test_unfinished_file(tmp_path):
+    """Test files without index are indexed from their chunk headers."""
+    path = tmp_path / "trace.bin"
+    mpu = make_mpu()
+    writer = TraceFileWriter(str(path), chunk_records=10)
+    with TraceRecorder(mpu, writer, buffer_records=8):
+        for _ in range(35):
+            mpu.step()
+    writer.flush()
+    with TraceFileReader(str(path)) as reader:
+        assert len(reader) == 35
+        assert reader.chunks == 4
+        assert [item.pc for item in reader.records(0, 3)] == [0x1000, 0x1002, 0x1003]
+    writer.close()
+
+
+def test_numpy(tmp_path):
+    """Test structured array access."""
+    numpy = pytest.importorskip("numpy")
+    path = tmp_path / "trace.bin"
+    trace, _ = record(path, 300)
+    with TraceFileReader(str(path)) as reader:
+        array = reader.numpy(50, 100)
+        assert len(array) == 100
+        assert array["pc"][0] == trace.records()[50].pc
+        assert numpy.sum(array["cycles"]) == sum(item.cycles for item in trace.records()[50:150])
+    # Closing with the array alive works, it does not refer to the mapped file
+    assert array["pc"][0] == trace.records()[50].pc
+
+
+def test_invalid(tmp_path):
+    """Test invalid files and data."""
+    path = tmp_path / "trace.bin"
+    path.write_bytes(bytes(64))
+    with pytest.raises(ValueError):
+        TraceFileReader(str(path))
+    with TraceFileWriter(str(path)) as writer:
+        with pytest.raises(ValueError):
+            writer.write(bytes(RECORD_SIZE + 1))
+
+
+class SlowWriter(TraceFileWriter):
+    """Trace file writer blocking every write until released."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.release = threading.Event()
+
+    def write(self, data) -> None:
+        assert self.release.wait(timeout=10)
+        super().write(data)
+
+
+@pytest.mark.parametrize("compression", [COMPRESSION_NONE, COMPRESSION_ZLIB])
+def test_background_writer(tmp_path, compression):
+    """Test background writing gives the same file content as writing directly."""
+    path = tmp_path / "trace.bin"
+    trace, _ = record(path, 1000, compression)
+    mpu = make_mpu()
+    writer = BackgroundTraceWriter(TraceFileWriter(str(path), 100, compression))
+    with TraceRecorder(mpu, writer, buffer_records=64):
+        for _ in range(1000):
+            mpu.step()
+    writer.close()
+    assert writer.buffers_written == 1000 // 64
+    assert writer.dropped_records == 0
+    with TraceFileReader(str(path)) as reader:
+        assert reader.records(0, 1000) == trace.records()
+
+
+def test_background_backpressure(tmp_path):
+    """Test recording waits for a free buffer while the disk falls behind."""
+    path = tmp_path / "trace.bin"
+    mpu = make_mpu()
+    slow = SlowWriter(str(path), 10)
+    writer = BackgroundTraceWriter(slow, buffers=2)
+    recorder = TraceRecorder(mpu, writer, buffer_records=8).attach()
+    for _ in range(8):
+        mpu.step()
+    assert writer.stalls == 0, "Second buffer was free."
+    threading.Timer(0.05, slow.release.set).start()
+    for _ in range(8 + 4):
+        mpu.step()
+    assert writer.stalls == 1
+    assert writer.stall_seconds > 0
+    recorder.close()
+    assert writer.dropped_records == 0
+    with TraceFileReader(str(path)) as reader:
+        assert len(reader) == 20
+
+
+def test_background_drop(tmp_path):
+    """Test records are dropped with counters while the disk falls behind."""
+    path = tmp_path / "trace.bin"
+    mpu = make_mpu()
+    slow = SlowWriter(str(path), 8)
+    writer = BackgroundTraceWriter(slow, buffers=2, drop=True)
+    recorder = TraceRecorder(mpu, writer, buffer_records=8).attach()
+    for _ in range(24):
+        mpu.step()
+    assert writer.stalls == 0
+    assert writer.dropped_records == 16
+    cycle = mpu.elapsed_cycles
+    slow.release.set()
+    for _ in range(4):
+        mpu.step()
+    recorder.close()
+    assert slow.cycle == mpu.elapsed_cycles, "Dropped cycles are skipped."
+    with TraceFileReader(str(path)) as reader:
+        assert len(reader) == 8 + 4
+        assert reader.chunk(1)[:2] == (8, cycle)
+        assert reader.find_cycle(cycle) == 8
+
+
+def test_background_error(tmp_path):
+    """Test errors of the writer thread are raised on the recording side."""
+    writer = BackgroundTraceWriter(TraceFileWriter(str(tmp_path / "trace.bin")))
+    writer.write(bytes(RECORD_SIZE + 1))
+    with pytest.raises(ValueError):
+        writer.flush()
+    writer.close()
@@ -0,0 +1,94 @@
+"""Test text trace formatting."""
+import pytest
+from fixtures import *  # noqa
+from mpu.trace import RECORD, TraceBuffer
+from mpu.tracefile import BackgroundTraceWriter, TraceRecorder
+from mpu.tracetext import TextTraceWriter, TraceFormatter
+from utils import write_memory
+from mpu.mpu6502 import MPU
+
+# 1000: LDX #$02
+# 1002: DEX
+# 1003: BNE $1002
+# 1005: STX $2000
+# 1008: JMP $1008
+PROGRAM = (0xA2, 0x02, 0xCA, 0xD0, 0xFD, 0x8E, 0x00, 0x20, 0x4C, 0x08, 0x10)
+LINES = [
+    "1000  A2 02     LDX #$02        A:00 X:00 Y:00 P:20 SP:FF  CYC:0",
+    "1002  CA        DEX             A:00 X:02 Y:00 P:20 SP:FF  CYC:2",
+    "1003  D0 FD     BNE $1002       A:00 X:01 Y:00 P:20 SP:FF  CYC:4",
+    "1002  CA        DEX             A:00 X:01 Y:00 P:20 SP:FF  CYC:7",
+    "1003  D0 FD     BNE $1002       A:00 X:00 Y:00 P:22 SP:FF  CYC:9",
+    "1005  8E 00 20  STX $2000       A:00 X:00 Y:00 P:22 SP:FF  CYC:11",
+    "1008  4C 08 10  JMP $1008       A:00 X:00 Y:00 P:22 SP:FF  CYC:15",
+]
+
+
+def make_mpu() -> MPU:
+    """Create MPU with program at $1000."""
+    mpu = MPU(memory=[0x00] * (0xFFFF + 1), pc=0x1000)
+    write_memory(mpu._memory, 0x1000, PROGRAM)
+    return mpu
+
+
+def trace_data(steps: int = len(LINES)) -> bytes:
+    """Return packed records of the first steps of the program."""
+    mpu = make_mpu()
+    with TraceBuffer(mpu, capacity=steps) as trace:
+        for _ in range(steps):
+            mpu.step()
+    return bytes(trace.buffer)
+
+
+def test_all_columns():
+    """Test default layout."""
+    assert TraceFormatter().lines(trace_data()) == LINES
+
+
+def test_reference_format():
+    """Test a line matches the reference log format with P bit 5 set and B clear."""
+    mpu = MPU(memory=[0x00] * (0xFFFF + 1), pc=0xC000)
+    write_memory(mpu._memory, 0xC000, (0x4C, 0xF5, 0xC5))  # C000: JMP $C5F5
+    mpu.registers.SP = 0xFD
+    mpu.registers.FLAGS = 0x04 | 0x10  # I and B
+    with TraceBuffer(mpu, capacity=1) as trace:
+        mpu.step()
+    line = "C000  4C F5 C5  JMP $C5F5       A:00 X:00 Y:00 P:24 SP:FD  CYC:7"
+    assert TraceFormatter().lines(bytes(trace.buffer), start_cycle=7) == [line]
+
+
+def test_columns():
+    """Test configurable column layout."""
+    formatter = TraceFormatter(["address", "disassembly"], separator=" ", widths={"disassembly": 0})
+    assert formatter.lines(trace_data())[:3] == ["1000 LDX #$02", "1002 DEX", "1003 BNE $1002"]
+    formatter = TraceFormatter(["cycles", "address"], separator="|")
+    assert formatter.lines(trace_data(), start_cycle=100)[1] == "CYC:102|1002"
+    with pytest.raises(ValueError):
+        TraceFormatter(["address", "flags"])
+    with pytest.raises(ValueError):
+        TraceFormatter([])
+
+
+def test_interrupt_and_unknown_opcode():
+    """Test interrupt entries and unimplemented opcodes."""
+    data = RECORD.pack(0x1000, 0, 0, 0, 0, 0, 0xFF, 0, 7, 1) + RECORD.pack(
+        0x1000, 0xFF, 0, 0, 0, 0, 0xFF, 0, 0, 0
+    )
+    first, second = TraceFormatter(["address", "bytes", "disassembly"]).lines(data)
+    assert first.split() == ["1000", "IRQ"]
+    assert second.split() == ["1000", "FF", "???"]
+
+
+@pytest.mark.parametrize("background", [False, True])
+def test_text_writer(tmp_path, background):
+    """Test recording a text trace, directly or from the background writer."""
+    path = tmp_path / "trace.log"
+    mpu = make_mpu()
+    writer = TextTraceWriter(str(path), start_cycle=mpu.elapsed_cycles)
+    if background:
+        writer = BackgroundTraceWriter(writer)
+    with TraceRecorder(mpu, writer, buffer_records=4):
+        for _ in range(len(LINES)):
+            mpu.step()
+    writer.close()
+    assert path.read_text().splitlines() == LINES
@@ -0,0 +1,134 @@
+"""Test transactional execution."""
+import pytest
+from mpu.bus import MemoryBus
+from mpu.via import VIA, IRQ_T1
+from utils import write_memory
+from fixtures import *  # noqa
+from mpu.mpu6502 import MPU
+
+
+@pytest.fixture
+def program(mpu: MPU) -> MPU:
+    """MPU with a program writing memory and stack."""
+    write_memory(
+        mpu._memory,
+        0x1000,
+        (
+            0xE8,               # 1000: INX
+            0x8E, 0x00, 0x20,   # 1001: STX $2000
+            0x48,               # 1004: PHA
+            0x4C, 0x00, 0x10,   # 1005: JMP $1000
+        ),
+    )  # fmt: skip
+    mpu.registers.PC = 0x1000
+    return mpu
+
+
+def test_rollback(program: MPU):
+    """Test rollback restores memory, registers and cycles."""
+    program._memory[0x2000] = 0x99
+    with program.transaction() as tx:
+        program.run(50)
+    assert program._memory[0x2000] != 0x99
+    assert tx.writes > 0
+    tx.rollback()
+    assert program._memory[0x2000] == 0x99
+    assert all(program._memory[0x0100 + x] == 0 for x in range(0x100)), "Stack not restored."
+    assert program.registers.PC == 0x1000
+    assert program.registers.X == 0x00
+    assert program.registers.SP == 0xFF
+    assert program.elapsed_cycles == 0
+
+
+def test_rollback_keeps_registers(program: MPU):
+    """Test registers are restored in place, references stay valid."""
+    registers = program.registers
+    with program.transaction() as tx:
+        program.run(50)
+    tx.rollback()
+    assert program.registers is registers
+    assert registers.PC == 0x1000
+    assert registers.X == 0x00
+
+
+def test_rollback_events(program: MPU):
+    """Test rollback requeues events dispatched during the transaction and interrupts."""
+    fired = []
+
+    def event(cycle: int) -> None:
+        fired.append(cycle)
+        program.set_irq(True, "device")
+
+    program.registers.FLAGS |= 0x04  # Keep IRQ masked
+    program.scheduler.post(100, event)
+    with program.transaction() as tx:
+        program.run(200)
+        program.scheduler.post(300, event)
+    assert fired == [100]
+    tx.rollback()
+    assert program.elapsed_cycles == 0
+    assert program.scheduler.next_cycle == 100
+    assert len(program.scheduler) == 1, "Event posted in the transaction kept."
+    assert not program._pending_interrupts and not program._irq_sources
+    program.run(200)
+    assert fired == [100, 100], "Event not dispatched again."
+
+
+def test_commit(program: MPU):
+    """Test commit keeps changes and stops journaling."""
+    with program.transaction() as tx:
+        program.run(10)
+    tx.commit()
+    assert program._memory[0x2000] == 0x01
+    assert program._journal is None
+    with pytest.raises(RuntimeError):
+        tx.rollback()
+
+
+def test_no_recording_after_exit(program: MPU):
+    """Test writes after the with block are not journaled."""
+    with program.transaction() as tx:
+        program.step()
+    writes = tx.writes
+    program.run(10)
+    assert tx.writes == writes
+
+
+def test_rollback_on_exception(program: MPU):
+    """Test exceptions inside the block roll back."""
+    with pytest.raises(ZeroDivisionError):
+        with program.transaction():
+            program.run(10)
+            1 / 0
+    assert program._memory[0x2000] == 0x00
+    assert program.registers.PC == 0x1000
+
+
+def test_nested(program: MPU):
+    """Test nested transactions are rejected."""
+    with program.transaction():
+        with pytest.raises(RuntimeError):
+            program.transaction()
+
+
+def test_device_writes_not_journaled():
+    """Test writes to a device inside a transaction do not read its registers."""
+    mpu = MPU(memory=MemoryBus(), pc=0x1000)
+    via = VIA(mpu)
+    mpu._memory.map_device(0x6000, via)
+    write_memory(
+        mpu._memory,
+        0x1000,
+        (
+            0x8D, 0x04, 0x60,   # 1000: STA $6004 (T1C-L, reading it clears IFR T1)
+            0x8D, 0x00, 0x20,   # 1003: STA $2000
+        ),
+    )  # fmt: skip
+    via._ifr = IRQ_T1
+    with mpu.transaction() as tx:
+        mpu.step()
+        mpu.step()
+    assert via._ifr == IRQ_T1
+    assert tx.writes == 1
+    tx.rollback()
+    assert via._ifr == IRQ_T1
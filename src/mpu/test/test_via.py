@@ -0,0 +1,158 @@
+"""Test 6522 VIA."""
+import pytest
+from mpu.bus import MemoryBus
+from mpu.via import VIA, IRQ_T1, IRQ_T2, IRQ_ANY
+from utils import write_memory
+from mpu.mpu6502 import MPU
+
+VIA_BASE = 0x6000
+
+
+@pytest.fixture
+def via_mpu() -> MPU:
+    """MPU looping at $1000 with a VIA at $6000 and RTI as IRQ handler at $2000."""
+    mpu = MPU(memory=MemoryBus(), pc=0x1000)
+    mpu.via = VIA(mpu)
+    mpu._memory.map_device(VIA_BASE, mpu.via)
+    write_memory(mpu._memory, MPU.MEM_VECTOR_IRQ_BRK, (0x00, 0x20))
+    write_memory(mpu._memory, 0x1000, (0x4C, 0x00, 0x10))  # 1000: JMP $1000
+    write_memory(mpu._memory, 0x2000, (0x40,))  # 2000: RTI
+    return mpu
+
+
+def test_ports(via_mpu: MPU):
+    """Test port input/output with data direction."""
+    memory = via_mpu._memory
+    via_mpu.via.input_b = 0b1010_1010
+    memory[VIA_BASE + 0x2] = 0x0F  # DDRB: low nibble output
+    memory[VIA_BASE + 0x0] = 0xFF
+    assert memory[VIA_BASE + 0x0] == 0b1010_1111
+    assert via_mpu.via.output_b == 0x0F
+    assert memory[VIA_BASE + 0x12] == 0x0F, "Registers not mirrored."
+
+
+def test_t1_one_shot(via_mpu: MPU):
+    """Test T1 one-shot counts down and flags underflow once."""
+    memory = via_mpu._memory
+    memory[VIA_BASE + 0x4] = 0x64
+    memory[VIA_BASE + 0x5] = 0x00  # T1 = 100, starts
+    via_mpu.run(51)
+    assert via_mpu.via.timer1() == 100 - via_mpu.elapsed_cycles
+    assert memory[VIA_BASE + 0xD] & IRQ_T1 == 0
+    via_mpu.run(60)
+    assert memory[VIA_BASE + 0xD] == IRQ_T1, "Underflow not flagged (or IRQ_ANY while masked)."
+    memory[VIA_BASE + 0x4]  # Read T1C-L clears flag
+    assert memory[VIA_BASE + 0xD] == 0
+    via_mpu.run(0x10000)
+    assert memory[VIA_BASE + 0xD] == 0, "One-shot flagged twice."
+
+
+def test_t1_free_run_irq(via_mpu: MPU):
+    """Test T1 free-run raises an IRQ every period."""
+    memory = via_mpu._memory
+    entries = []
+    original = via_mpu._service_interrupt
+
+    def service():
+        serviced = original()
+        if serviced:
+            entries.append(via_mpu.elapsed_cycles)
+            memory[VIA_BASE + 0x4]  # Acknowledge
+        return serviced
+
+    via_mpu._service_interrupt = service
+    memory[VIA_BASE + 0xB] = 0x40  # ACR: T1 free-run
+    memory[VIA_BASE + 0xE] = IRQ_ANY | IRQ_T1
+    memory[VIA_BASE + 0x4] = 98
+    memory[VIA_BASE + 0x5] = 0x00  # Period 100 cycles
+    via_mpu.run(1000)
+    assert len(entries) == 10
+    assert all(b - a == 100 for a, b in zip(entries, entries[1:])), "Period drifts."
+    assert len(via_mpu.scheduler) == 1, "Events pile up."
+
+
+def test_t1_free_run_lazy(via_mpu: MPU):
+    """Test masked free running timer schedules no events but flags underflows."""
+    memory = via_mpu._memory
+    memory[VIA_BASE + 0xB] = 0x40
+    memory[VIA_BASE + 0x4] = 98
+    memory[VIA_BASE + 0x5] = 0x00
+    assert len(via_mpu.scheduler) == 0
+    via_mpu.run(1000)
+    assert memory[VIA_BASE + 0xD] == IRQ_T1
+    assert via_mpu.via.timer1() == 98 - (via_mpu.elapsed_cycles % 100)
+    # Enabling the interrupt raises IRQ for the pending flag
+    memory[VIA_BASE + 0xE] = IRQ_ANY | IRQ_T1
+    assert memory[VIA_BASE + 0xD] == IRQ_ANY | IRQ_T1
+    assert via_mpu._pending_interrupts == MPU.INTERRUPT_IRQ
+
+
+def test_t2_and_ier(via_mpu: MPU):
+    """Test T2 one-shot IRQ and IER set/clear."""
+    memory = via_mpu._memory
+    memory[VIA_BASE + 0xE] = IRQ_ANY | IRQ_T1 | IRQ_T2
+    memory[VIA_BASE + 0xE] = IRQ_T1  # Clear T1 enable
+    assert memory[VIA_BASE + 0xE] == IRQ_ANY | IRQ_T2
+    memory[VIA_BASE + 0x8] = 0x32
+    memory[VIA_BASE + 0x9] = 0x00  # T2 = 50
+    via_mpu.run(50)
+    assert via_mpu.registers.PC == 0x1000
+    via_mpu.run(10)
+    assert via_mpu._pending_interrupts == MPU.INTERRUPT_IRQ
+    assert memory[0x01FF] == 0x10, "IRQ not serviced."
+    memory[VIA_BASE + 0xD] = IRQ_T2  # Clear flag by writing IFR
+    assert via_mpu._pending_interrupts == 0
+
+
+def test_clone(via_mpu: MPU):
+    """Test a cloned MPU gets its own VIA, timers keep running in both."""
+    memory = via_mpu._memory
+    memory[VIA_BASE + 0xE] = IRQ_ANY | IRQ_T1
+    memory[VIA_BASE + 0x4] = 100
+    memory[VIA_BASE + 0x5] = 0x00  # T1 = 100
+    with pytest.raises(TypeError):
+        memory.clone()
+    other = via_mpu.clone()
+    via = other._memory._pages[VIA_BASE >> 8]
+    assert via is not via_mpu.via
+    assert via.timer1() == via_mpu.via.timer1()
+    assert len(other.scheduler) == 1
+
+    other.run(50)
+    other._memory[VIA_BASE + 0x4] = 0x10
+    other._memory[VIA_BASE + 0x5] = 0x00  # Restart T1 in the clone only
+    other.run(60)
+    assert via._ifr & IRQ_T1
+    assert via_mpu.elapsed_cycles == 0
+    assert memory[VIA_BASE + 0xD] == 0, "Clone changed IFR of the parent."
+    assert via_mpu.via.timer1() == 100
+    via_mpu.run(110)
+    assert memory[0x01FF] == 0x10, "Parent IRQ not serviced."
+
+
+def test_reset_memory_template(via_mpu: MPU):
+    """Test power on reset clears VIA registers, interrupts and expiry events."""
+    memory = via_mpu._memory
+    template = bytes(memory[0x0000:0x6000]) + bytes(0x100) + bytes(memory[0x6100:0x10000])
+    memory[VIA_BASE + 0xE] = IRQ_ANY | IRQ_T1
+    memory[VIA_BASE + 0x4] = 0x64
+    memory[VIA_BASE + 0x5] = 0x00  # T1 = 100, starts
+    via_mpu.registers.FLAGS |= 0x04  # Keep IRQ masked
+    via_mpu.run(200)
+    assert via_mpu._pending_interrupts
+
+    via_mpu.reset(memory_template=template)
+    assert memory[VIA_BASE + 0xE] == IRQ_ANY
+    assert memory[VIA_BASE + 0xD] == 0
+    assert not via_mpu._pending_interrupts
+    assert via_mpu.scheduler.next_cycle is None
+
+
+def test_slice_write_skips_device(via_mpu: MPU):
+    """Test bulk writes over the mapped page do not write VIA registers."""
+    memory = via_mpu._memory
+    memory[0x5F00:0x6200] = bytes([0xFF]) * 0x300
+    assert memory[0x5FFF] == 0xFF and memory[0x6100] == 0xFF
+    assert memory[VIA_BASE + 0xE] == IRQ_ANY
+    assert memory[VIA_BASE + 0x2] == 0x00
+    assert via_mpu.scheduler.next_cycle is None
@@ -0,0 +1,175 @@
+"""Compact binary instruction traces."""
+import struct
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+from .instrument import Instrument, StepHooks
+from .utils import DecodedInstruction
+
+# Trace record: PC, opcode, operand, A, X, Y, SP, FLAGS (all before the step), cycles the
+# step took and kind of step. Interrupt entries are recorded with opcode and operand 0.
+RECORD = struct.Struct("<HBHBBBBBBB")
+RECORD_SIZE = RECORD.size
+
+# Record kinds
+KIND_INSTRUCTION = 0
+KIND_IRQ = 1
+KIND_NMI = 2
+
+
+@dataclass
+class TraceRecord:
+    """Single decoded trace record."""
+
+    pc: int
+    opcode: int
+    operand: int
+    A: int
+    X: int
+    Y: int
+    SP: int
+    FLAGS: int
+    cycles: int
+    kind: int = KIND_INSTRUCTION
+
+    def instruction(self, instructions) -> DecodedInstruction:
+        """Return decoded instruction using an instruction table (MPU._instructions)."""
+        template = instructions[self.opcode]
+        instruction = DecodedInstruction(**template.__dict__)
+        instruction.address = self.pc
+        instruction.operand = self.operand if template.bytes > 1 else None
+        return instruction
+
+    def print(self, instructions, include_opcodes: bool = False) -> str:
+        """Return record disassembled (as DecodedInstruction does) followed by registers."""
+        if self.kind == KIND_INSTRUCTION:
+            try:
+                text = self.instruction(instructions).print(include_opcodes)
+            except NotImplementedError:
+                text = f"{self.pc:04X}: {instructions[self.opcode].mnemonic}"
+        else:
+            text = f"{self.pc:04X}: {'IRQ' if self.kind == KIND_IRQ else 'NMI'}"
+        return (
+            f"{text:<32} A={self.A:02X} X={self.X:02X} Y={self.Y:02X} SP={self.SP:02X}"
+            f" P={self.FLAGS:02X} +{self.cycles}"
+        )
+
+
+def iter_records(buffer, start: int = 0, count: Optional[int] = None) -> Iterator[TraceRecord]:
+    """Yield records packed in buffer, starting at record start."""
+    if count is None:
+        count = len(buffer) // RECORD_SIZE - start
+    for fields in RECORD.iter_unpack(
+        memoryview(buffer)[start * RECORD_SIZE : (start + count) * RECORD_SIZE]
+    ):
+        yield TraceRecord(*fields)
+
+
+class TraceBuffer(Instrument):
+    """
+    Record the last capacity steps of an MPU into a preallocated ring buffer.
+
+    Each step is packed into a RECORD_SIZE byte record, nothing is decoded or formatted
+    while running. records() and lines() decode on demand, disassembling from the recorded
+    opcode and operand, so the text is right even if the code was modified since.
+    """
+
+    def __init__(self, mpu, capacity: int = 65536) -> None:
+        """Initialize buffer for mpu (not attached yet)."""
+        if capacity <= 0:
+            raise ValueError(f"Invalid trace capacity {capacity}")
+        super().__init__(mpu)
+        self.capacity = capacity
+        self.buffer = bytearray(capacity * RECORD_SIZE)
+        self.count = 0  # Steps recorded, including the ones overwritten
+
+    def __len__(self) -> int:
+        """Return number of records held."""
+        return min(self.count, self.capacity)
+
+    def clear(self) -> None:
+        """Drop all records."""
+        self.count = 0
+
+    def _hooks(self) -> StepHooks:
+        """Return hooks recording the step."""
+        mpu = self._mpu
+        pack_into = RECORD.pack_into
+        buffer = self.buffer
+        capacity = self.capacity
+        last = capacity - 1
+        interrupt_cycles = mpu.INTERRUPT_CYCLES
+        state = (0, 0, 0, 0, 0, 0)  # PC, A, X, Y, SP, FLAGS before the instruction
+
+        def record(opcode, operand, pc, a, x, y, sp, flags, cycles, kind) -> None:
+            nonlocal buffer
+            index = self.count
+            position = index % capacity
+            pack_into(
+                buffer,
+                position * RECORD_SIZE,
+                pc,
+                opcode,
+                operand,
+                a,
+                x,
+                y,
+                sp,
+                flags,
+                cycles,
+                kind,
+            )
+            self.count = index + 1
+            if position == last:
+                buffer = self._full()
+
+        def before(instruction) -> None:
+            nonlocal state
+            registers = mpu._registers
+            state = (
+                registers.PC,
+                registers.A,
+                registers.X,
+                registers.Y,
+                registers.SP,
+                registers.FLAGS & 0xFF,
+            )
+
+        def after(instruction, cycles: int) -> None:
+            record(instruction.opcode, instruction.operand or 0, *state, cycles, KIND_INSTRUCTION)
+
+        def interrupt(nmi: bool, pc: int, sp: int, flags: int, start: int) -> None:
+            registers = mpu._registers
+            record(
+                0,
+                0,
+                pc,
+                registers.A,
+                registers.X,
+                registers.Y,
+                sp,
+                flags & 0xFF,
+                interrupt_cycles,
+                KIND_NMI if nmi else KIND_IRQ,
+            )
+
+        return StepHooks(before=before, after=after, interrupt=interrupt)
+
+    def _full(self) -> bytearray:
+        """Handle a full buffer (its last record was written), return the buffer to go on with."""
+        return self.buffer
+
+    def records(self, last: Optional[int] = None) -> List[TraceRecord]:
+        """Return the last records held (all by default), oldest first."""
+        held = len(self)
+        last = held if last is None else min(last, held)
+        first = self.count - last
+        start = first % self.capacity
+        records = list(iter_records(self.buffer, start, min(last, self.capacity - start)))
+        if len(records) < last:
+            records += iter_records(self.buffer, 0, last - len(records))
+        return records
+
+    def lines(self, last: Optional[int] = None, include_opcodes: bool = False) -> List[str]:
+        """Return the last records held as disassembly with registers, oldest first."""
+        instructions = self._mpu._instructions
+        return [record.print(instructions, include_opcodes) for record in self.records(last)]
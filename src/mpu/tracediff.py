@@ -0,0 +1,116 @@
+"""Locate the first divergence between two traces of arbitrary size."""
+from dataclasses import dataclass
+from itertools import islice, zip_longest
+from typing import Iterator, List, Optional, Union
+from .trace import RECORD, RECORD_SIZE, TraceRecord
+from .tracefile import TraceFileReader, record_cycles
+from .tracetext import TraceFormatter
+
+_MAGIC = b"M65T"
+
+
+@dataclass
+class TraceDivergence:
+    """First differing step of two traces. A side is None if its trace ended before."""
+
+    index: int
+    left: Union[TraceRecord, str, None]
+    right: Union[TraceRecord, str, None]
+
+
+def is_binary_trace(path: str) -> bool:
+    """Return True if path is a binary trace file (and not a text trace)."""
+    with open(path, "rb") as file:
+        return file.read(len(_MAGIC)) == _MAGIC
+
+
+def _binary_chunks(reader: TraceFileReader, chunk_records: int) -> Iterator[bytes]:
+    """Yield packed records chunk by chunk."""
+    for start in range(0, len(reader), chunk_records):
+        yield bytes(reader.read(start, chunk_records))
+
+
+def _rendered_chunks(
+    reader: TraceFileReader, chunk_records: int, formatter: TraceFormatter
+) -> Iterator[List[str]]:
+    """Yield records rendered as text lines chunk by chunk."""
+    cycle = reader.chunk(0)[1] if reader.chunks else 0
+    for data in _binary_chunks(reader, chunk_records):
+        yield formatter.lines(data, cycle)
+        cycle += record_cycles(data)
+
+
+def _text_chunks(path: str, chunk_records: int) -> Iterator[List[str]]:
+    """Yield lines chunk by chunk."""
+    with open(path, "r") as file:
+        while True:
+            lines = [line.rstrip("\n") for line in islice(file, chunk_records)]
+            if not lines:
+                return
+            yield lines
+
+
+def _items(chunk) -> list:
+    """Split chunk into comparable steps."""
+    if isinstance(chunk, bytes):
+        return [chunk[start : start + RECORD_SIZE] for start in range(0, len(chunk), RECORD_SIZE)]
+    return chunk
+
+
+def _steps(chunk) -> int:
+    """Return number of steps in chunk."""
+    return len(chunk) // RECORD_SIZE if isinstance(chunk, bytes) else len(chunk)
+
+
+def _decode(item) -> Union[TraceRecord, str, None]:
+    """Return step as record (binary) or line (text)."""
+    if isinstance(item, bytes):
+        return TraceRecord(*RECORD.unpack(item))
+    return item
+
+
+def diff_traces(
+    left: str,
+    right: str,
+    chunk_records: int = 65536,
+    formatter: Optional[TraceFormatter] = None,
+) -> Optional[TraceDivergence]:
+    """
+    Return the first divergence between two trace files, None if they are equal.
+
+    Both traces are streamed in chunks of chunk_records steps, so memory use does not
+    depend on their size. Whole chunks are compared first, only a differing chunk is
+    compared step by step. Binary trace files and text traces can be mixed, binary ones
+    are then rendered with formatter (default layout of TraceFormatter) to compare lines.
+    """
+    paths = (left, right)
+    binary = [is_binary_trace(path) for path in paths]
+    readers = [TraceFileReader(path) if flag else None for path, flag in zip(paths, binary)]
+    chunks = []
+    try:
+        for path, reader in zip(paths, readers):
+            if reader is None:
+                chunks.append(_text_chunks(path, chunk_records))
+            elif all(binary):
+                chunks.append(_binary_chunks(reader, chunk_records))
+            else:
+                formatter = formatter or TraceFormatter()
+                chunks.append(_rendered_chunks(reader, chunk_records, formatter))
+
+        index = 0
+        for left_chunk, right_chunk in zip_longest(*chunks):
+            if left_chunk == right_chunk:
+                index += _steps(left_chunk)
+                continue
+            left_items = _items(left_chunk) if left_chunk is not None else []
+            right_items = _items(right_chunk) if right_chunk is not None else []
+            for offset, (left_item, right_item) in enumerate(zip_longest(left_items, right_items)):
+                if left_item != right_item:
+                    return TraceDivergence(index + offset, _decode(left_item), _decode(right_item))
+        return None
+    finally:
+        for chunk in chunks:
+            chunk.close()
+        for reader in readers:
+            if reader is not None:
+                reader.close()
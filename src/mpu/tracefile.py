@@ -0,0 +1,444 @@
+"""Seekable on-disk trace files.
+
+Layout (little endian):
+
+    file header   magic "M65T", version, record size, records per chunk
+    chunk         chunk header (compression, record count, stored size, first record
+                  number, first cycle) followed by the records, optionally zlib compressed
+    ...
+    index         (first record number, first cycle, file offset) of every chunk
+    footer        index offset, number of chunks, magic "M65I"
+
+Records are trace.RECORD structures. The index is written on close, files of a run that
+did not finish are indexed by walking the chunk headers instead.
+"""
+import mmap
+import queue
+import struct
+import threading
+import time
+import zlib
+from bisect import bisect_right
+from itertools import accumulate
+from typing import List, Optional, Tuple
+from .trace import RECORD_SIZE, TraceBuffer, TraceRecord, iter_records
+
+VERSION = 1
+_MAGIC = b"M65T"
+_INDEX_MAGIC = b"M65I"
+_FILE_HEADER = struct.Struct("<4sHHI4x")
+_CHUNK_HEADER = struct.Struct("<B3xIIQQ4x")
+_INDEX_ENTRY = struct.Struct("<QQQ")
+_FOOTER = struct.Struct("<QI4s")
+
+# Chunk compression
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+
+# Offset of the cycles field within a record
+_CYCLES_OFFSET = 10
+
+# NumPy dtype matching trace.RECORD
+RECORD_DTYPE = [
+    ("pc", "<u2"),
+    ("opcode", "u1"),
+    ("operand", "<u2"),
+    ("A", "u1"),
+    ("X", "u1"),
+    ("Y", "u1"),
+    ("SP", "u1"),
+    ("FLAGS", "u1"),
+    ("cycles", "u1"),
+    ("kind", "u1"),
+]
+
+
+def record_cycles(data) -> int:
+    """Return sum of the cycles of the records in data."""
+    return sum(memoryview(data)[_CYCLES_OFFSET::RECORD_SIZE])
+
+
+class TraceFileWriter:
+    """Append packed trace records to a trace file, chunk by chunk."""
+
+    def __init__(
+        self,
+        path: str,
+        chunk_records: int = 65536,
+        compression: int = COMPRESSION_NONE,
+        start_cycle: int = 0,
+    ) -> None:
+        """Create trace file. start_cycle is the elapsed cycles before the first record."""
+        if chunk_records <= 0:
+            raise ValueError(f"Invalid chunk size {chunk_records}")
+        self.chunk_records = chunk_records
+        self.compression = compression
+        self.records = 0  # Records written to chunks so far
+        self.cycle = start_cycle  # Elapsed cycles after the last record written
+        self._index: List[Tuple[int, int, int]] = []
+        self._pending = bytearray()
+        self._file = open(path, "wb")
+        self._file.write(_FILE_HEADER.pack(_MAGIC, VERSION, RECORD_SIZE, chunk_records))
+
+    def __enter__(self) -> "TraceFileWriter":
+        """Return writer."""
+        return self
+
+    def __exit__(self, *args) -> None:
+        """Close writer."""
+        self.close()
+
+    def write(self, data) -> None:
+        """Append packed records, full chunks are written right away."""
+        if len(data) % RECORD_SIZE:
+            raise ValueError(f"Trace data of {len(data)} bytes is no multiple of records!")
+        self._pending += data
+        chunk_size = self.chunk_records * RECORD_SIZE
+        if len(self._pending) >= chunk_size:
+            view = memoryview(self._pending)
+            offset = 0
+            while len(view) - offset >= chunk_size:
+                self._write_chunk(view[offset : offset + chunk_size])
+                offset += chunk_size
+            view.release()
+            del self._pending[:offset]
+
+    def _write_chunk(self, data) -> None:
+        """Write a single chunk."""
+        count = len(data) // RECORD_SIZE
+        stored = zlib.compress(data) if self.compression == COMPRESSION_ZLIB else data
+        self._index.append((self.records, self.cycle, self._file.tell()))
+        self._file.write(
+            _CHUNK_HEADER.pack(self.compression, count, len(stored), self.records, self.cycle)
+        )
+        self._file.write(stored)
+        self.records += count
+        self.cycle += record_cycles(data)
+
+    def skip(self, cycles: int) -> None:
+        """Account for cycles of records which were dropped instead of written."""
+        if self._pending:
+            self._write_chunk(self._pending)
+            self._pending = bytearray()
+        self.cycle += cycles
+
+    def flush(self) -> None:
+        """Write pending records as a (short) chunk and flush the file."""
+        if self._pending:
+            self._write_chunk(self._pending)
+            self._pending = bytearray()
+        self._file.flush()
+
+    def close(self) -> None:
+        """Write pending records, the index and the footer."""
+        if self._file.closed:
+            return
+        self.flush()
+        index_offset = self._file.tell()
+        for entry in self._index:
+            self._file.write(_INDEX_ENTRY.pack(*entry))
+        self._file.write(_FOOTER.pack(index_offset, len(self._index), _INDEX_MAGIC))
+        self._file.close()
+
+
+class TraceRecorder(TraceBuffer):
+    """
+    Record every step of an MPU to a trace file.
+
+    Steps are packed into a buffer of buffer_records records like TraceBuffer does, which is
+    handed to the writer (a TraceFileWriter or BackgroundTraceWriter) whenever it is full
+    and on detach(). The writer should start at the elapsed cycles of the MPU; steps run
+    while detached are missing from the trace.
+    """
+
+    def __init__(self, mpu, writer, buffer_records: int = 65536) -> None:
+        """Initialize recorder for mpu (not attached yet)."""
+        super().__init__(mpu, buffer_records)
+        self.writer = writer
+        self._written = 0  # Records handed to the writer
+
+    def _hand_over(self, start: int, stop: int) -> None:
+        """Pass records start...stop of the buffer to the writer."""
+        self.writer.write(memoryview(self.buffer)[start * RECORD_SIZE : stop * RECORD_SIZE])
+
+    def _full(self) -> bytearray:
+        """Write buffer, continue with the same one or the one the writer hands back."""
+        start = self._written % self.capacity
+        self._written = self.count
+        submit = getattr(self.writer, "submit", None)
+        if submit is None:
+            self._hand_over(start, self.capacity)
+        else:
+            self.buffer = submit(self.buffer, start, self.capacity)
+        return self.buffer
+
+    def detach(self) -> None:
+        """Stop recording, recorded steps are passed to the writer."""
+        super().detach()
+        if self.count > self._written:
+            self._hand_over(self._written % self.capacity, self.count % self.capacity)
+            self._written = self.count
+
+    def close(self) -> None:
+        """Stop recording and close the writer."""
+        self.detach()
+        self.writer.close()
+
+
+# Work items of the background writer thread
+_WRITE_BUFFER = 0  # Buffer owned by the writer, returned to the free pool when written
+_WRITE_DATA = 1  # Private copy of records
+_SKIP = 2  # Cycles of dropped records
+_FLUSH = 3  # Flush file, then set event
+
+
+class BackgroundTraceWriter:
+    """
+    Write trace data to a TraceFileWriter (compressing it there) on a background thread.
+
+    TraceRecorder submits full record buffers without copying and continues with a free
+    buffer from a pool of buffers (3: one being filled, up to two queued or being written).
+    When none is free because the disk falls behind, submit() either blocks until a buffer
+    was written (backpressure, counted in stalls) or, if drop is set, keeps the recorder on
+    its current buffer and drops its records (counted in dropped_records). Cycles of dropped
+    records are skipped in the file, so cycle positions stay right.
+
+    Errors of the writer thread are raised by the next call from the recording side.
+    """
+
+    def __init__(self, writer: TraceFileWriter, buffers: int = 3, drop: bool = False) -> None:
+        """Start writer thread."""
+        if buffers < 2:
+            raise ValueError(f"At least 2 buffers needed, got {buffers}")
+        self.writer = writer
+        self.buffers = buffers
+        self.drop = drop
+        self.stalls = 0
+        self.stall_seconds = 0.0
+        self.dropped_records = 0
+        self.buffers_written = 0
+        self._allocated = 1  # The one the recorder fills
+        self._free: "queue.SimpleQueue[bytearray]" = queue.SimpleQueue()
+        self._work: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> "BackgroundTraceWriter":
+        """Return writer."""
+        return self
+
+    def __exit__(self, *args) -> None:
+        """Close writer."""
+        self.close()
+
+    def _run(self) -> None:
+        """Writer thread: work through queued items until None."""
+        while True:
+            item = self._work.get()
+            if item is None:
+                return
+            kind = item[0]
+            try:
+                if self._error is None:
+                    if kind == _WRITE_BUFFER:
+                        _, buffer, start, stop = item
+                        self.writer.write(
+                            memoryview(buffer)[start * RECORD_SIZE : stop * RECORD_SIZE]
+                        )
+                        self.buffers_written += 1
+                    elif kind == _WRITE_DATA:
+                        self.writer.write(item[1])
+                    elif kind == _SKIP:
+                        self.writer.skip(item[1])
+                    elif kind == _FLUSH:
+                        self.writer.flush()
+            except BaseException as error:  # Passed to the recording side
+                self._error = error
+            finally:
+                if kind == _WRITE_BUFFER:
+                    self._free.put(item[1])
+                elif kind == _FLUSH:
+                    item[1].set()
+
+    def _check(self) -> None:
+        """Raise error of the writer thread."""
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def submit(self, buffer: bytearray, start: int, stop: int) -> bytearray:
+        """Queue records start...stop of buffer for writing, return buffer to fill next."""
+        self._check()
+        try:
+            free = self._free.get_nowait()
+        except queue.Empty:
+            if self._allocated < self.buffers:
+                self._allocated += 1
+                free = bytearray(len(buffer))
+            elif self.drop:
+                self.dropped_records += stop - start
+                cycles = record_cycles(memoryview(buffer)[start * RECORD_SIZE : stop * RECORD_SIZE])
+                self._work.put((_SKIP, cycles))
+                return buffer
+            else:
+                started = time.perf_counter()
+                free = self._free.get()
+                self.stalls += 1
+                self.stall_seconds += time.perf_counter() - started
+        self._work.put((_WRITE_BUFFER, buffer, start, stop))
+        return free
+
+    def write(self, data) -> None:
+        """Queue a copy of packed records for writing."""
+        self._check()
+        self._work.put((_WRITE_DATA, bytes(data)))
+
+    def flush(self) -> None:
+        """Wait until everything queued is written and flush the file."""
+        done = threading.Event()
+        self._work.put((_FLUSH, done))
+        done.wait()
+        self._check()
+
+    def close(self) -> None:
+        """Write everything queued, stop the thread and close the file."""
+        if not self._thread.is_alive():
+            return
+        self._work.put(None)
+        self._thread.join()
+        try:
+            self._check()
+        finally:
+            self.writer.close()
+
+
+class TraceFileReader:
+    """
+    Random access to a trace file through mmap.
+
+    Only the chunks covering a requested range are read (and decompressed).
+    """
+
+    def __init__(self, path: str) -> None:
+        """Open trace file."""
+        with open(path, "rb") as file:
+            self._mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size, self.chunk_records = _FILE_HEADER.unpack_from(self._mapped, 0)
+        if magic != _MAGIC or version != VERSION or record_size != RECORD_SIZE:
+            self._mapped.close()
+            raise ValueError(f"{path} is no trace file of version {VERSION}!")
+        self._index = self._read_index() or self._scan_chunks()
+        self._first_records = [entry[0] for entry in self._index]
+        self._first_cycles = [entry[1] for entry in self._index]
+        self._records = 0
+        if self._index:
+            _, count, _, first, _ = _CHUNK_HEADER.unpack_from(self._mapped, self._index[-1][2])
+            self._records = first + count
+
+    def _read_index(self) -> Optional[List[Tuple[int, int, int]]]:
+        """Return index from the footer, None if there is none."""
+        mapped = self._mapped
+        if len(mapped) < _FILE_HEADER.size + _FOOTER.size:
+            return None
+        offset, count, magic = _FOOTER.unpack_from(mapped, len(mapped) - _FOOTER.size)
+        if magic != _INDEX_MAGIC:
+            return None
+        return [
+            _INDEX_ENTRY.unpack_from(mapped, offset + number * _INDEX_ENTRY.size)
+            for number in range(count)
+        ]
+
+    def _scan_chunks(self) -> List[Tuple[int, int, int]]:
+        """Return index built from the chunk headers (file without footer)."""
+        mapped = self._mapped
+        index = []
+        offset = _FILE_HEADER.size
+        while offset + _CHUNK_HEADER.size <= len(mapped):
+            _, _, stored, first, cycle = _CHUNK_HEADER.unpack_from(mapped, offset)
+            if offset + _CHUNK_HEADER.size + stored > len(mapped):
+                break  # Chunk cut off
+            index.append((first, cycle, offset))
+            offset += _CHUNK_HEADER.size + stored
+        return index
+
+    def __enter__(self) -> "TraceFileReader":
+        """Return reader."""
+        return self
+
+    def __exit__(self, *args) -> None:
+        """Close reader."""
+        self.close()
+
+    def close(self) -> None:
+        """Unmap file."""
+        self._mapped.close()
+
+    def __len__(self) -> int:
+        """Return number of records."""
+        return self._records
+
+    @property
+    def chunks(self) -> int:
+        """Property getter for number of chunks."""
+        return len(self._index)
+
+    def chunk(self, number: int):
+        """Return (first record number, first cycle, records) of a chunk."""
+        offset = self._index[number][2]
+        compression, count, stored, first, cycle = _CHUNK_HEADER.unpack_from(self._mapped, offset)
+        start = offset + _CHUNK_HEADER.size
+        data = memoryview(self._mapped)[start : start + stored]
+        if compression == COMPRESSION_ZLIB:
+            data = zlib.decompress(data)
+        elif compression != COMPRESSION_NONE:
+            raise ValueError(f"Unknown chunk compression {compression}")
+        return first, cycle, data
+
+    def read(self, start: int, count: int):
+        """
+        Return packed records start...start+count (clipped to the trace).
+
+        Ranges within an uncompressed chunk are returned as view on the mapped file without
+        copying, release them before closing the reader.
+        """
+        stop = min(start + count, self._records)
+        if start < 0 or start >= stop:
+            return b""
+        number = bisect_right(self._first_records, start) - 1
+        first, _, data = self.chunk(number)
+        if stop - first <= len(data) // RECORD_SIZE:
+            # Within one chunk, uncompressed chunks are not copied
+            return data[(start - first) * RECORD_SIZE : (stop - first) * RECORD_SIZE]
+        parts = bytearray(data[(start - first) * RECORD_SIZE :])
+        while first + len(data) // RECORD_SIZE < stop:
+            number += 1
+            first, _, data = self.chunk(number)
+            parts += data[: (stop - first) * RECORD_SIZE]
+        return parts
+
+    def records(self, start: int, count: int) -> List[TraceRecord]:
+        """Return records start...start+count decoded."""
+        return list(iter_records(self.read(start, count)))
+
+    def numpy(self, start: int, count: int):
+        """
+        Return records start...start+count as NumPy structured array (requires numpy).
+
+        The array is a copy, so it stays valid after closing the reader.
+        """
+        import numpy
+
+        return numpy.frombuffer(self.read(start, count), dtype=numpy.dtype(RECORD_DTYPE)).copy()
+
+    def find_cycle(self, cycle: int) -> Optional[int]:
+        """Return number of the record executing at cycle, None if beyond the trace."""
+        number = bisect_right(self._first_cycles, cycle) - 1
+        if number < 0:
+            return None
+        first, start, data = self.chunk(number)
+        ends = accumulate(memoryview(data)[_CYCLES_OFFSET::RECORD_SIZE], initial=start)
+        for offset, end in enumerate(ends):
+            if end > cycle and offset:
+                return first + offset - 1
+        return None
@@ -0,0 +1,177 @@
+"""Fast text rendering of binary traces in the column layout of common 6502 logs."""
+from typing import Dict, List, Optional, Sequence
+from .mpu6502 import MPU
+from .trace import KIND_IRQ, KIND_NMI, RECORD, RECORD_SIZE
+from .tracefile import record_cycles
+from .utils import AddressMode, Flag
+
+# Positional fields available to line templates
+#   0 PC, 1 opcode, 2 operand low byte, 3 operand high byte, 4 operand, 5 A, 6 X, 7 Y,
+#   8 SP, 9 P, 10 cycle at start of the step, 11 branch target
+_OPERANDS = {
+    AddressMode.NONE: "",
+    AddressMode.IMPLIED: "",
+    AddressMode.ACCUMULATOR: " A",
+    AddressMode.IMMEDIATE: " #${2:02X}",
+    AddressMode.ZEROPAGE: " ${2:02X}",
+    AddressMode.ZEROPAGE_X: " ${2:02X},X",
+    AddressMode.ZEROPAGE_Y: " ${2:02X},Y",
+    AddressMode.ABSOLUTE: " ${4:04X}",
+    AddressMode.ABSOLUTE_X: " ${4:04X},X",
+    AddressMode.ABSOLUTE_Y: " ${4:04X},Y",
+    AddressMode.INDIRECT: " (${4:04X})",
+    AddressMode.INDIRECT_X: " (${2:02X},X)",
+    AddressMode.INDIRECT_Y: " (${2:02X}),Y",
+    AddressMode.BRANCH: " ${11:04X}",
+}
+_BYTES = {1: "{1:02X}", 2: "{1:02X} {2:02X}", 3: "{1:02X} {2:02X} {3:02X}"}
+_SAMPLE = (0,) * 12
+
+# P as shown by reference logs: bit 5 always reads 1, B exists only in pushed copies
+_P_SET = 0b0010_0000
+_P_KEEP = 0xFF & ~Flag.BREAK.value
+
+COLUMNS = ("address", "bytes", "disassembly", "registers", "cycles")
+
+
+class TraceFormatter:
+    """
+    Render trace records as text lines.
+
+    A line with all columns looks like:
+
+        C000  4C F5 C5  JMP $C5F5       A:00 X:00 Y:00 P:24 SP:FD  CYC:7
+
+    A line template is prepared per opcode up front, so a line costs a single format call.
+    Branches show their target address and P is shown like reference logs do (bit 5 set, B
+    clear). Columns are padded to fixed widths (except the last one) and joined by
+    separator.
+    """
+
+    def __init__(
+        self,
+        columns: Sequence[str] = COLUMNS,
+        separator: str = "  ",
+        widths: Optional[Dict[str, int]] = None,
+        instructions=MPU._instructions,
+    ) -> None:
+        """Prepare templates for columns (see COLUMNS)."""
+        unknown = set(columns) - set(COLUMNS)
+        if unknown or not columns:
+            raise ValueError(f"Invalid trace columns {list(columns)}")
+        self.columns = tuple(columns)
+        self.widths = {"bytes": 8, "disassembly": 14}
+        self.widths.update(widths or {})
+        self._separator = separator
+        self._templates: List[str] = [
+            self._template(
+                _BYTES[instruction.bytes],
+                instruction.mnemonic + _OPERANDS[instruction.address_mode],
+            )
+            for instruction in instructions
+        ]
+        self._interrupts = {
+            KIND_IRQ: self._template("", "IRQ"),
+            KIND_NMI: self._template("", "NMI"),
+        }
+
+    def _template(self, code: str, disassembly: str) -> str:
+        """Return line template of an instruction."""
+        texts = {
+            "address": "{0:04X}",
+            "bytes": code,
+            "disassembly": disassembly,
+            "registers": "A:{5:02X} X:{6:02X} Y:{7:02X} P:{9:02X} SP:{8:02X}",
+            "cycles": "CYC:{10}",
+        }
+        parts = []
+        for number, column in enumerate(self.columns):
+            text = texts[column]
+            if number < len(self.columns) - 1 and column in self.widths:
+                # Pad by the rendered length, all fields have fixed widths except cycles
+                text += " " * max(0, self.widths[column] - len(text.format(*_SAMPLE)))
+            parts.append(text)
+        return self._separator.join(parts)
+
+    def lines(self, data, start_cycle: int = 0) -> List[str]:
+        """Return lines of packed records, start_cycle is the cycle of the first one."""
+        templates = self._templates
+        interrupts = self._interrupts
+        cycle = start_cycle
+        lines = []
+        append = lines.append
+        for pc, opcode, operand, a, x, y, sp, flags, cycles, kind in RECORD.iter_unpack(data):
+            low = operand & 0xFF
+            template = interrupts[kind] if kind else templates[opcode]
+            append(
+                template.format(
+                    pc,
+                    opcode,
+                    low,
+                    operand >> 8,
+                    operand,
+                    a,
+                    x,
+                    y,
+                    sp,
+                    (flags & _P_KEEP) | _P_SET,
+                    cycle,
+                    (pc + 2 + (low ^ 0x80) - 0x80) & 0xFFFF,
+                )
+            )
+            cycle += cycles
+        return lines
+
+
+class TextTraceWriter:
+    """
+    Write packed trace records as text file.
+
+    Takes the place of a TraceFileWriter (for TraceRecorder or BackgroundTraceWriter).
+    Every write() call formats its records as one batch and hands it to a large buffered
+    file in a single call.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        formatter: Optional[TraceFormatter] = None,
+        start_cycle: int = 0,
+        buffer_size: int = 1 << 20,
+    ) -> None:
+        """Create text file. start_cycle is the elapsed cycles before the first record."""
+        self.formatter = formatter or TraceFormatter()
+        self.cycle = start_cycle
+        self.records = 0
+        self._file = open(path, "w", buffering=buffer_size)
+
+    def __enter__(self) -> "TextTraceWriter":
+        """Return writer."""
+        return self
+
+    def __exit__(self, *args) -> None:
+        """Close writer."""
+        self.close()
+
+    def write(self, data) -> None:
+        """Append packed records."""
+        if len(data) % RECORD_SIZE:
+            raise ValueError(f"Trace data of {len(data)} bytes is no multiple of records!")
+        if not data:
+            return
+        lines = self.formatter.lines(data, self.cycle)
+        self._file.write("\n".join(lines) + "\n")
+        self.records += len(lines)
+        self.cycle += record_cycles(data)
+
+    def skip(self, cycles: int) -> None:
+        """Account for cycles of records which were dropped instead of written."""
+        self.cycle += cycles
+
+    def flush(self) -> None:
+        """Flush file."""
+        self._file.flush()
+
+    def close(self) -> None:
+        """Close file."""
+        self._file.close()
@@ -0,0 +1,85 @@
+"""Transactional execution with write journal."""
+from dataclasses import replace
+from typing import List, Tuple
+
+
+class Transaction:
+    """
+    Undo journal for speculative execution.
+
+    While recording, every memory write of the MPU appends (address, old byte) to the
+    journal. Rolling back replays the journal backwards and restores registers, elapsed
+    cycles, scheduled events and pending interrupts, so its cost is proportional to the
+    number of writes and events, not to memory size. Writes to memory mapped devices are
+    neither journaled nor undone, journaling them would read device registers with their
+    side effects.
+
+    Usage:
+        with mpu.transaction() as tx:
+            mpu.run(1000)
+        tx.rollback()  # or tx.commit()
+    """
+
+    def __init__(self, mpu) -> None:
+        """Start recording."""
+        if mpu._journal is not None:
+            raise RuntimeError("Nested transactions are not supported!")
+        self._mpu = mpu
+        self._registers = replace(mpu.registers)
+        self._elapsed_cycles = mpu.elapsed_cycles
+        self._events = mpu._scheduler.snapshot()
+        self._pending_interrupts = mpu._pending_interrupts
+        self._irq_sources = set(mpu._irq_sources)
+        self._journal: List[Tuple[int, int]] = []
+        self._finished = False
+        mpu._journal = self._journal
+
+    def __enter__(self) -> "Transaction":
+        """Enter context."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        """Stop recording. Roll back if the block raised."""
+        self._stop()
+        if exc_type is not None and not self._finished:
+            self.rollback()
+        return False
+
+    @property
+    def writes(self) -> int:
+        """Property getter for number of journaled writes."""
+        return len(self._journal)
+
+    def _stop(self) -> None:
+        """Stop recording writes."""
+        if self._mpu._journal is self._journal:
+            self._mpu._journal = None
+
+    def commit(self) -> None:
+        """Keep all changes."""
+        if self._finished:
+            raise RuntimeError("Transaction already finished!")
+        self._stop()
+        self._finished = True
+        self._journal.clear()
+
+    def rollback(self) -> None:
+        """Undo all changes since the transaction started."""
+        if self._finished:
+            raise RuntimeError("Transaction already finished!")
+        self._stop()
+        self._finished = True
+        mpu = self._mpu
+        memory = mpu._memory
+        for address, value in reversed(self._journal):
+            memory[address] = value
+        self._journal.clear()
+        # Restored in place, references to mpu.registers held elsewhere stay valid
+        registers, saved = mpu._registers, self._registers
+        registers.A, registers.X, registers.Y = saved.A, saved.X, saved.Y
+        registers.SP, registers.PC, registers.FLAGS = saved.SP, saved.PC, saved.FLAGS
+        mpu._elapsed_cycles = self._elapsed_cycles
+        mpu._scheduler.restore(self._events)
+        mpu._pending_interrupts = self._pending_interrupts
+        mpu._irq_sources.clear()
+        mpu._irq_sources.update(self._irq_sources)
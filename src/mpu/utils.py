@@ -23,6 +23,23 @@ class AddressMode(Enum):
     INDIRECT_Y = auto()
 
 
+class StopReason(Enum):
+    """Reasons for the run loop to return."""
+
+    CYCLES = auto()
+    NOT_IMPLEMENTED = auto()
+
+
+class OpcodeNotImplemented(NotImplementedError):
+    """Raised when executing an unmapped opcode."""
+
+    def __init__(self, opcode: int, address: int) -> None:
+        """Initialize error for opcode at address."""
+        super().__init__(f"Opcode {opcode:02X} at {address:04X} not implemented!")
+        self.opcode = opcode
+        self.address = address
+
+
 @dataclass
 class Instruction:
     """Define a single instruction."""
@@ -0,0 +1,285 @@
+"""6522 VIA (Versatile Interface Adapter)."""
+from typing import Optional
+from .scheduler import Event
+
+# Register offsets (mirrored every 16 bytes of the mapped page)
+REG_ORB = 0x0
+REG_ORA = 0x1
+REG_DDRB = 0x2
+REG_DDRA = 0x3
+REG_T1C_L = 0x4
+REG_T1C_H = 0x5
+REG_T1L_L = 0x6
+REG_T1L_H = 0x7
+REG_T2C_L = 0x8
+REG_T2C_H = 0x9
+REG_SR = 0xA
+REG_ACR = 0xB
+REG_PCR = 0xC
+REG_IFR = 0xD
+REG_IER = 0xE
+REG_ORA_NH = 0xF
+
+# Interrupt flag bits
+IRQ_T2 = 0b0010_0000
+IRQ_T1 = 0b0100_0000
+IRQ_ANY = 0b1000_0000
+
+# ACR bit selecting T1 free-run mode
+ACR_T1_FREE_RUN = 0b0100_0000
+
+
+class _Timer:
+    """Down counter evaluated in closed form from the cycle it was loaded at."""
+
+    __slots__ = ("loaded_at", "value", "period", "next_underflow", "event")
+
+    def __init__(self) -> None:
+        self.loaded_at = 0
+        self.value = 0xFFFF
+        self.period = 0  # 0 => one-shot
+        self.next_underflow: Optional[int] = None
+        self.event: Optional[Event] = None
+
+    def load(self, cycle: int, value: int, free_run: bool) -> None:
+        """Start counting down from value."""
+        self.loaded_at = cycle
+        self.value = value
+        # Counts value...0, $FFFF. In free-run mode it is reloaded from the latch 2 cycles
+        # after reaching 0.
+        self.period = value + 2 if free_run else 0
+        self.next_underflow = cycle + value + 1
+
+    def copy(self) -> "_Timer":
+        """Return copy without expiry event."""
+        other = _Timer()
+        other.loaded_at = self.loaded_at
+        other.value = self.value
+        other.period = self.period
+        other.next_underflow = self.next_underflow
+        return other
+
+    def counter(self, cycle: int) -> int:
+        """Counter value at cycle."""
+        elapsed = cycle - self.loaded_at
+        if self.period:
+            elapsed %= self.period
+            if elapsed > self.value:
+                return 0xFFFF
+        return (self.value - elapsed) & 0xFFFF
+
+    def catch_up(self, cycle: int) -> bool:
+        """Return True if the timer underflowed since the last call."""
+        if self.next_underflow is None or cycle < self.next_underflow:
+            return False
+        if self.period:
+            # Skip all underflows up to cycle in one go
+            missed = (cycle - self.next_underflow) // self.period + 1
+            self.next_underflow += missed * self.period
+        else:
+            self.next_underflow = None
+        return True
+
+
+class VIA:
+    """
+    6522 VIA with timers T1 and T2, I/O ports and interrupt logic.
+
+    Timers are not ticked. Each one remembers the cycle it was loaded at and counter values,
+    underflows and interrupt flags are computed in closed form whenever a register is
+    accessed or a scheduled expiry event fires. Expiry events are only scheduled for timer
+    interrupts enabled in IER, so a free running timer with masked interrupt costs nothing.
+
+    Register accesses are timed at the start of the accessing instruction. Latch writes take
+    effect on the next T1C-H write. Shift register, handshaking and T2 pulse counting are
+    not emulated.
+    """
+
+    def __init__(self, mpu) -> None:
+        """Initialize VIA raising interrupts on mpu."""
+        self._mpu = mpu
+        self._t1 = _Timer()
+        self._t2 = _Timer()
+        self._t1_latch = 0xFFFF
+        self._t2_latch_low = 0xFF
+        self._ifr = 0
+        self._ier = 0
+        self._acr = 0
+        self._pcr = 0
+        self._sr = 0
+        self._orb = self._ora = 0
+        self._ddrb = self._ddra = 0
+        # Levels driven by external hardware on input pins
+        self.input_a = 0xFF
+        self.input_b = 0xFF
+
+    def clone(self, mpu) -> "VIA":
+        """Return copy of the VIA raising interrupts on mpu (a clone of its MPU)."""
+        other = VIA(mpu)
+        other._t1 = self._t1.copy()
+        other._t2 = self._t2.copy()
+        other._t1_latch = self._t1_latch
+        other._t2_latch_low = self._t2_latch_low
+        other._ifr = self._ifr
+        other._ier = self._ier
+        other._acr = self._acr
+        other._pcr = self._pcr
+        other._sr = self._sr
+        other._orb, other._ora = self._orb, self._ora
+        other._ddrb, other._ddra = self._ddrb, self._ddra
+        other.input_a = self.input_a
+        other.input_b = self.input_b
+        other._update_irq()
+        other._schedule(other._t1, IRQ_T1)
+        other._schedule(other._t2, IRQ_T2)
+        return other
+
+    def reset(self) -> None:
+        """
+        Clear all registers except latches and SR (RES line).
+
+        Timers count down from $FFFF again. Expiry events are not cancelled, the MPU drops
+        all of them on a power on reset.
+        """
+        self._t1 = _Timer()
+        self._t2 = _Timer()
+        self._ifr = self._ier = self._acr = self._pcr = 0
+        self._orb = self._ora = 0
+        self._ddrb = self._ddra = 0
+        self._update_irq()
+
+    @property
+    def output_a(self) -> int:
+        """Property getter for levels driven on port A output pins."""
+        return self._ora & self._ddra
+
+    @property
+    def output_b(self) -> int:
+        """Property getter for levels driven on port B output pins."""
+        return self._orb & self._ddrb
+
+    def timer1(self) -> int:
+        """Return current T1 counter value."""
+        return self._t1.counter(self._mpu.elapsed_cycles)
+
+    def timer2(self) -> int:
+        """Return current T2 counter value."""
+        return self._t2.counter(self._mpu.elapsed_cycles)
+
+    def _catch_up(self, cycle: int) -> None:
+        """Raise interrupt flags for all timer underflows up to cycle."""
+        if self._t1.catch_up(cycle):
+            self._ifr |= IRQ_T1
+        if self._t2.catch_up(cycle):
+            self._ifr |= IRQ_T2
+
+    def _update_irq(self) -> None:
+        """Drive MPU IRQ line from IFR and IER."""
+        self._mpu.set_irq((self._ifr & self._ier & 0x7F) != 0, self)
+
+    def _schedule(self, timer: _Timer, mask: int) -> None:
+        """(Re)schedule expiry event of a timer if its interrupt is enabled."""
+        if timer.event is not None:
+            self._mpu.scheduler.cancel(timer.event)
+            timer.event = None
+        if timer.next_underflow is not None and self._ier & mask:
+
+            def expire(cycle: int) -> None:
+                timer.event = None
+                self._catch_up(cycle)
+                self._update_irq()
+                self._schedule(timer, mask)
+
+            timer.event = self._mpu.scheduler.post(timer.next_underflow, expire)
+
+    def _clear_flags(self, mask: int) -> None:
+        """Clear interrupt flags and update IRQ line."""
+        self._ifr &= ~mask
+        self._update_irq()
+
+    def __getitem__(self, offset: int) -> int:
+        """Read register."""
+        register = offset & 0x0F
+        cycle = self._mpu.elapsed_cycles
+        self._catch_up(cycle)
+        if register == REG_ORB:
+            return (self._orb & self._ddrb) | (self.input_b & ~self._ddrb & 0xFF)
+        elif register in (REG_ORA, REG_ORA_NH):
+            return (self._ora & self._ddra) | (self.input_a & ~self._ddra & 0xFF)
+        elif register == REG_DDRB:
+            return self._ddrb
+        elif register == REG_DDRA:
+            return self._ddra
+        elif register == REG_T1C_L:
+            value = self._t1.counter(cycle) & 0xFF
+            self._clear_flags(IRQ_T1)
+            return value
+        elif register == REG_T1C_H:
+            return self._t1.counter(cycle) >> 8
+        elif register == REG_T1L_L:
+            return self._t1_latch & 0xFF
+        elif register == REG_T1L_H:
+            return self._t1_latch >> 8
+        elif register == REG_T2C_L:
+            value = self._t2.counter(cycle) & 0xFF
+            self._clear_flags(IRQ_T2)
+            return value
+        elif register == REG_T2C_H:
+            return self._t2.counter(cycle) >> 8
+        elif register == REG_SR:
+            return self._sr
+        elif register == REG_ACR:
+            return self._acr
+        elif register == REG_PCR:
+            return self._pcr
+        elif register == REG_IFR:
+            self._update_irq()
+            return self._ifr | (IRQ_ANY if self._ifr & self._ier & 0x7F else 0)
+        # REG_IER
+        return self._ier | IRQ_ANY
+
+    def __setitem__(self, offset: int, value: int) -> None:
+        """Write register."""
+        register = offset & 0x0F
+        cycle = self._mpu.elapsed_cycles
+        self._catch_up(cycle)
+        if register == REG_ORB:
+            self._orb = value
+        elif register in (REG_ORA, REG_ORA_NH):
+            self._ora = value
+        elif register == REG_DDRB:
+            self._ddrb = value
+        elif register == REG_DDRA:
+            self._ddra = value
+        elif register in (REG_T1C_L, REG_T1L_L):
+            self._t1_latch = (self._t1_latch & 0xFF00) | value
+        elif register == REG_T1C_H:
+            self._t1_latch = (self._t1_latch & 0x00FF) | (value << 8)
+            self._t1.load(cycle, self._t1_latch, (self._acr & ACR_T1_FREE_RUN) != 0)
+            self._clear_flags(IRQ_T1)
+            self._schedule(self._t1, IRQ_T1)
+        elif register == REG_T1L_H:
+            self._t1_latch = (self._t1_latch & 0x00FF) | (value << 8)
+            self._clear_flags(IRQ_T1)
+        elif register == REG_T2C_L:
+            self._t2_latch_low = value
+        elif register == REG_T2C_H:
+            self._t2.load(cycle, (value << 8) | self._t2_latch_low, False)
+            self._clear_flags(IRQ_T2)
+            self._schedule(self._t2, IRQ_T2)
+        elif register == REG_SR:
+            self._sr = value
+        elif register == REG_ACR:
+            self._acr = value
+        elif register == REG_PCR:
+            self._pcr = value
+        elif register == REG_IFR:
+            self._clear_flags(value & 0x7F)
+        elif register == REG_IER:
+            if value & IRQ_ANY:
+                self._ier |= value & 0x7F
+            else:
+                self._ier &= ~value & 0x7F
+            self._update_irq()
+            self._schedule(self._t1, IRQ_T1)
+            self._schedule(self._t2, IRQ_T2)